@@ -0,0 +1,313 @@
+"""Stores doing their work in threads of their own.
+
+An L{AsyncStore} runs every call to its L{Store} in a dedicated thread,
+one at a time, and returns a future for its outcome rather than blocking
+the caller.  An event loop may then drive many stores at once, for
+instance with C{asyncio.wrap_future()} where C{concurrent.futures} is
+available.
+"""
+
+from itertools import islice
+from Queue import Queue
+import threading
+import sys
+
+from storm.store import Store, ResultSet
+
+try:
+    from concurrent.futures import Future
+except ImportError:
+    Future = None
+
+
+__all__ = ["AsyncStore", "AsyncResultSet", "Future"]
+
+
+if Future is None:
+
+    class Future(object):
+        """The outcome of a call made in the thread of an L{AsyncStore}.
+
+        This implements the parts of C{concurrent.futures.Future} used by
+        L{AsyncStore}, which uses the real thing when it's available.
+        """
+
+        def __init__(self):
+            self._condition = threading.Condition()
+            self._done = False
+            self._result = None
+            self._exc_info = None
+            self._callbacks = []
+
+        def done(self):
+            """Return whether the call has finished."""
+            return self._done
+
+        def result(self):
+            """Wait for the call to finish, and return its result.
+
+            If the call raised an exception, it's raised again here.
+            """
+            self._wait()
+            if self._exc_info is not None:
+                raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+            return self._result
+
+        def exception(self):
+            """Wait for the call to finish, and return its exception."""
+            self._wait()
+            if self._exc_info is not None:
+                return self._exc_info[1]
+            return None
+
+        def add_done_callback(self, function):
+            """Call C{function} with this future once the call finishes.
+
+            The function is called right away if the call has finished
+            already, and in the thread of the store otherwise.
+            """
+            self._condition.acquire()
+            try:
+                if not self._done:
+                    self._callbacks.append(function)
+                    return
+            finally:
+                self._condition.release()
+            function(self)
+
+        def set_result(self, result):
+            self._finish(result, None)
+
+        def set_exception(self, exception):
+            self._finish(None, (type(exception), exception, None))
+
+        def set_exception_info(self, exception, traceback):
+            self._finish(None, (type(exception), exception, traceback))
+
+        def _wait(self):
+            self._condition.acquire()
+            try:
+                while not self._done:
+                    self._condition.wait()
+            finally:
+                self._condition.release()
+
+        def _finish(self, result, exc_info):
+            self._condition.acquire()
+            try:
+                self._result = result
+                self._exc_info = exc_info
+                self._done = True
+                self._condition.notifyAll()
+                callbacks = self._callbacks
+                self._callbacks = []
+            finally:
+                self._condition.release()
+            for function in callbacks:
+                function(self)
+
+
+def run_calls(queue):
+    """Run the calls put in C{queue}, one at a time, until None is put.
+
+    Calls are put as C{(future, function, args, kwargs)} tuples, and the
+    outcome of each of them is set in its L{Future}.  This is the loop
+    of the threads of L{AsyncStore} and L{storm.parallel.ParallelStores}.
+    """
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        future, function, args, kwargs = item
+        try:
+            result = function(*args, **kwargs)
+        except:
+            exc_info = sys.exc_info()
+            if hasattr(future, "set_exception_info"):
+                future.set_exception_info(exc_info[1], exc_info[2])
+            else:
+                future.set_exception(exc_info[1])
+        else:
+            future.set_result(result)
+
+
+class AsyncStore(object):
+    """A store doing its work in a thread of its own.
+
+    Calls to the underlying L{Store} are queued and run one at a time in
+    a thread dedicated to it, so the store is still only used by one
+    thread.  Methods return a L{Future} for the outcome of each call.
+
+    Objects returned may be read from other threads once loaded, but
+    changes to them, as well as anything touching the store, like
+    resolving references, should be done in the thread of the store
+    with L{run}.
+    """
+
+    def __init__(self, database, **kwargs):
+        """
+        @param database: The L{Database} instance to use.
+        @param kwargs: Other arguments for L{Store}.
+        """
+        # Connecting is lazy, so the store is only really used in its
+        # thread, even if it's created in this one.
+        self._store = Store(database, **kwargs)
+        self._queue = Queue()
+        self._thread = threading.Thread(target=run_calls,
+                                        args=(self._queue,),
+                                        name="AsyncStore")
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def run(self, function, *args, **kwargs):
+        """Call C{function(store, *args, **kwargs)} in the store's thread.
+
+        @return: A L{Future} for the result of C{function}.
+        """
+        future = Future()
+        self._queue.put((future, function, (self._store,) + args, kwargs))
+        return future
+
+    def close(self):
+        """Close the store and stop its thread once queued calls are done.
+        """
+        future = self.run(Store.close)
+        self._queue.put(None)
+        return future
+
+    def execute(self, statement, params=None, noresult=False):
+        """Execute a statement, as L{Store.execute} does.
+
+        @return: A L{Future} for a list of all rows of the result, or for
+            None if C{noresult} is true.
+        """
+        def execute(store):
+            result = store.execute(statement, params, noresult)
+            if result is not None:
+                return result.get_all()
+        return self.run(execute)
+
+    def get(self, cls, key):
+        """Get an object of C{cls} by its primary key, as L{Store.get} does.
+        """
+        return self.run(Store.get, cls, key)
+
+    def find(self, cls_spec, *args, **kwargs):
+        """Find objects, as L{Store.find} does.
+
+        @return: An L{AsyncResultSet}, whose methods return futures.
+        """
+        return AsyncResultSet(self, self.run(Store.find, cls_spec,
+                                             *args, **kwargs))
+
+    def add(self, obj):
+        """Add an object to the store, as L{Store.add} does."""
+        return self.run(Store.add, obj)
+
+    def remove(self, obj):
+        """Remove an object from the store, as L{Store.remove} does."""
+        return self.run(Store.remove, obj)
+
+    def flush(self):
+        """Flush pending changes, as L{Store.flush} does."""
+        return self.run(Store.flush)
+
+    def commit(self):
+        """Commit the store's transaction, as L{Store.commit} does."""
+        return self.run(Store.commit)
+
+    def rollback(self):
+        """Roll back the store's transaction, as L{Store.rollback} does."""
+        return self.run(Store.rollback)
+
+
+class AsyncResultSet(object):
+    """A L{ResultSet} used through the thread of an L{AsyncStore}."""
+
+    def __init__(self, async_store, future):
+        self._async_store = async_store
+        self._future = future
+
+    def _run(self, function, *args, **kwargs):
+        # Calls are run in order, so the result set is ready by then.
+        future = self._future
+        return self._async_store.run(
+            lambda store: function(future.result(), *args, **kwargs))
+
+    def config(self, *args, **kwargs):
+        """Configure the result set, as L{ResultSet.config} does.
+
+        Errors are raised by the futures of later calls.
+
+        @return: This result set.
+        """
+        self._future = self._run(ResultSet.config, *args, **kwargs)
+        return self
+
+    def order_by(self, *args):
+        """Order the result set, as L{ResultSet.order_by} does.
+
+        Errors are raised by the futures of later calls.
+
+        @return: This result set.
+        """
+        self._future = self._run(ResultSet.order_by, *args)
+        return self
+
+    def all(self):
+        """Return a L{Future} for a list of all results."""
+        return self._run(list)
+
+    def chunks(self, size=100):
+        """Iterate over futures for the results, C{size} of them at a time.
+
+        Each future is for a C{(results, has_more)} tuple, with a list of
+        at most C{size} results, as they're fetched from the database,
+        and whether more results follow.  Futures are returned without
+        waiting for the previous ones, and the iteration doesn't end:
+        the caller should stop once C{has_more} is false, after which
+        futures are for empty lists.
+        """
+        iterator = self._run(iter)
+        # The next result, fetched ahead to know if there are more.
+        next_results = []
+        def fetch_chunk(store):
+            results = iterator.result()
+            chunk = next_results + list(islice(results,
+                                               size - len(next_results)))
+            next_results[:] = islice(results, 1)
+            return chunk, bool(next_results)
+        while True:
+            yield self._async_store.run(fetch_chunk)
+
+    def one(self):
+        """Return a L{Future} for the result of L{ResultSet.one}."""
+        return self._run(ResultSet.one)
+
+    def first(self):
+        """Return a L{Future} for the result of L{ResultSet.first}."""
+        return self._run(ResultSet.first)
+
+    def last(self):
+        """Return a L{Future} for the result of L{ResultSet.last}."""
+        return self._run(ResultSet.last)
+
+    def any(self):
+        """Return a L{Future} for the result of L{ResultSet.any}."""
+        return self._run(ResultSet.any)
+
+    def is_empty(self):
+        """Return a L{Future} for the result of L{ResultSet.is_empty}."""
+        return self._run(ResultSet.is_empty)
+
+    def count(self, *args, **kwargs):
+        """Return a L{Future} for the result of L{ResultSet.count}."""
+        return self._run(ResultSet.count, *args, **kwargs)
+
+    def remove(self):
+        """Return a L{Future} for the result of L{ResultSet.remove}."""
+        return self._run(ResultSet.remove)
+
+    def set(self, *args, **kwargs):
+        """Return a L{Future} for the result of L{ResultSet.set}."""
+        return self._run(ResultSet.set, *args, **kwargs)
@@ -101,6 +101,7 @@ static PyObject *Undef = NULL;
 static PyObject *LazyValue = NULL;
 static PyObject *raise_none_error = NULL;
 static PyObject *get_cls_info = NULL;
+static PyObject *CompactVariables = NULL;
 static PyObject *EventSystem = NULL;
 static PyObject *SQLRaw = NULL;
 static PyObject *SQLToken = NULL;
@@ -148,6 +149,7 @@ typedef struct {
     PyObject *__obj_ref;
     PyObject *__obj_ref_callback;
     PyObject *cls_info;
+    PyObject *__cls_event;
     PyObject *event;
     PyObject *variables;
     PyObject *primary_vars;
@@ -200,6 +202,10 @@ initialize_globals(void)
     if (!get_cls_info)
         return 0;
 
+    CompactVariables = PyObject_GetAttrString(module, "CompactVariables");
+    if (!CompactVariables)
+        return 0;
+
     Py_DECREF(module);
 
     /* Import objects from storm.event module */
@@ -1813,11 +1819,95 @@ statichere PyTypeObject Compile_Type = {
 };
 
 
+static PyObject *
+ObjectInfo_emit(ObjectInfoObject *self, PyObject *all_args)
+{
+    PyObject *cls_args, *res;
+    Py_ssize_t i;
+
+    if (PyTuple_GET_SIZE(all_args) == 0) {
+        PyErr_SetString(PyExc_TypeError, "Invalid number of arguments");
+        return NULL;
+    }
+
+    /* self.cls_info.event.emit(name, self, *args) */
+    cls_args = PyTuple_New(PyTuple_GET_SIZE(all_args) + 1);
+    if (!cls_args)
+        return NULL;
+    for (i = 0; i != PyTuple_GET_SIZE(all_args); i++) {
+        PyObject *item = PyTuple_GET_ITEM(all_args, i);
+        Py_INCREF(item);
+        PyTuple_SET_ITEM(cls_args, i ? i + 1 : 0, item);
+    }
+    Py_INCREF(self);
+    PyTuple_SET_ITEM(cls_args, 1, (PyObject *)self);
+    if (PyObject_TypeCheck(self->__cls_event, &EventSystem_Type)) {
+        res = EventSystem_emit((EventSystemObject *)self->__cls_event,
+                               cls_args);
+    } else {
+        PyObject *emit = PyObject_GetAttrString(self->__cls_event, "emit");
+        res = emit ? PyObject_Call(emit, cls_args, NULL) : NULL;
+        Py_XDECREF(emit);
+    }
+    Py_DECREF(cls_args);
+    if (!res)
+        return NULL;
+    Py_DECREF(res);
+
+    /* if self._event is not None:
+           self._event.emit(name, *args) */
+    if (self->event)
+        return EventSystem_emit((EventSystemObject *)self->event, all_args);
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+ObjectInfo__get_event(ObjectInfoObject *self, void *closure)
+{
+    /* if self._event is None:
+           self._event = EventSystem(self) */
+    if (!self->event) {
+        self->event = PyObject_CallFunctionObjArgs(EventSystem, self, NULL);
+        if (!self->event)
+            return NULL;
+    }
+    Py_INCREF(self->event);
+    return self->event;
+}
+
+static PyObject *
+ObjectInfo_hook(ObjectInfoObject *self, PyObject *args)
+{
+    /* self.event.hook(name, callback, *data) */
+    PyObject *event = ObjectInfo__get_event(self, NULL);
+    PyObject *res;
+    if (!event)
+        return NULL;
+    res = EventSystem_hook((EventSystemObject *)event, args);
+    Py_DECREF(event);
+    return res;
+}
+
+static PyObject *
+ObjectInfo_unhook(ObjectInfoObject *self, PyObject *args)
+{
+    /* if self._event is not None:
+           self._event.unhook(name, callback, *data) */
+    if (self->event)
+        return EventSystem_unhook((EventSystemObject *)self->event, args);
+    Py_RETURN_NONE;
+}
+
 static PyObject *
 ObjectInfo__emit_object_deleted(ObjectInfoObject *self, PyObject *args)
 {
-    /* self.event.emit("object-deleted") */
-    return PyObject_CallMethod(self->event, "emit", "s", "object-deleted");
+    /* self.emit("object-deleted") */
+    PyObject *res, *emit_args = Py_BuildValue("(s)", "object-deleted");
+    if (!emit_args)
+        return NULL;
+    res = ObjectInfo_emit(self, emit_args);
+    Py_DECREF(emit_args);
+    return res;
 }
 
 static PyMethodDef ObjectInfo_deleted_callback =
@@ -1832,6 +1922,7 @@ ObjectInfo_init(ObjectInfoObject *self, PyObject *args)
     PyObject *factory_kwargs = NULL;
     PyObject *columns = NULL;
     PyObject *primary_key = NULL;
+    PyObject *compact;
     PyObject *obj;
     Py_ssize_t i;
 
@@ -1857,42 +1948,58 @@ ObjectInfo_init(ObjectInfoObject *self, PyObject *args)
     CATCH(NULL,
           self->__obj_ref = PyWeakref_NewRef(obj, self->__obj_ref_callback));
 
-    /* self.event = event = EventSystem(self) */
-    CATCH(NULL,
-          self->event = PyObject_CallFunctionObjArgs(EventSystem, self, NULL));
-
-    /* self->variables = variables = {} */
-    CATCH(NULL, self->variables = PyDict_New());
-
-    CATCH(NULL, self_get_obj = PyObject_GetAttrString((PyObject *)self,
-                                                      "get_obj"));
-    CATCH(NULL, factory_kwargs = PyDict_New());
-    CATCH(-1, PyDict_SetItemString(factory_kwargs, "event", self->event));
-    CATCH(-1, PyDict_SetItemString(factory_kwargs, "validator_object_factory",
-                                   self_get_obj));
-
-    /* for column in self.cls_info.columns: */
-    CATCH(NULL, columns = PyObject_GetAttrString(self->cls_info, "columns"));
-    for (i = 0; i != PyTuple_GET_SIZE(columns); i++) {
-        /*
-           variables[column] = \
-               column.variable_factory(column=column,
-                                       event=event,
-                                       validator_object_factory=self.get_obj)
-        */
-        PyObject *column = PyTuple_GET_ITEM(columns, i);
-        PyObject *variable, *factory;
-        CATCH(-1, PyDict_SetItemString(factory_kwargs, "column", column));
-        CATCH(NULL, factory = PyObject_GetAttrString(column,
-                                                     "variable_factory"));
-        variable = PyObject_Call(factory, empty_args, factory_kwargs);
-        Py_DECREF(factory);
-        CATCH(NULL, variable);
-        if (PyDict_SetItem(self->variables, column, variable) == -1) {
+    CATCH(NULL, self->__cls_event = PyObject_GetAttrString(self->cls_info,
+                                                           "event"));
+
+    /* if self.cls_info.compact: */
+    CATCH(NULL, compact = PyObject_GetAttrString(self->cls_info, "compact"));
+    i = PyObject_IsTrue(compact);
+    Py_DECREF(compact);
+    CATCH(-1, i);
+    if (i) {
+        /* self.variables = variables = CompactVariables(self) */
+        CATCH(NULL, self->variables =
+                        PyObject_CallFunctionObjArgs(CompactVariables,
+                                                     self, NULL));
+    } else {
+        /* self->variables = variables = {} */
+        CATCH(NULL, self->variables = PyDict_New());
+
+        CATCH(NULL, self_get_obj = PyObject_GetAttrString((PyObject *)self,
+                                                          "get_obj"));
+        CATCH(NULL, factory_kwargs = PyDict_New());
+        /* Variables emit their events through the object info, so that
+           an event system is only created for objects hooked directly. */
+        CATCH(-1, PyDict_SetItemString(factory_kwargs, "event",
+                                       (PyObject *)self));
+        CATCH(-1, PyDict_SetItemString(factory_kwargs,
+                                       "validator_object_factory",
+                                       self_get_obj));
+
+        /* for column in self.cls_info.columns: */
+        CATCH(NULL, columns = PyObject_GetAttrString(self->cls_info,
+                                                     "columns"));
+        for (i = 0; i != PyTuple_GET_SIZE(columns); i++) {
+            /*
+               variables[column] = \
+                   column.variable_factory(
+                       column=column, event=self,
+                       validator_object_factory=self.get_obj)
+            */
+            PyObject *column = PyTuple_GET_ITEM(columns, i);
+            PyObject *variable, *factory;
+            CATCH(-1, PyDict_SetItemString(factory_kwargs, "column", column));
+            CATCH(NULL, factory = PyObject_GetAttrString(column,
+                                                         "variable_factory"));
+            variable = PyObject_Call(factory, empty_args, factory_kwargs);
+            Py_DECREF(factory);
+            CATCH(NULL, variable);
+            if (PyDict_SetItem(self->variables, column, variable) == -1) {
+                Py_DECREF(variable);
+                goto error;
+            }
             Py_DECREF(variable);
-            goto error;
         }
-        Py_DECREF(variable);
     }
 
     /* self.primary_vars = tuple(variables[column]
@@ -1905,15 +2012,16 @@ ObjectInfo_init(ObjectInfoObject *self, PyObject *args)
           self->primary_vars = PyTuple_New(PyTuple_GET_SIZE(primary_key)));
     for (i = 0; i != PyTuple_GET_SIZE(primary_key); i++) {
         PyObject *column = PyTuple_GET_ITEM(primary_key, i);
-        PyObject *variable = PyDict_GetItem(self->variables, column);
-        Py_INCREF(variable);
+        /* Variables of compact objects are built when looked up. */
+        PyObject *variable = PyObject_GetItem(self->variables, column);
+        CATCH(NULL, variable);
         PyTuple_SET_ITEM(self->primary_vars, i, variable);
     }
 
-    Py_DECREF(self_get_obj);
+    Py_XDECREF(self_get_obj);
     Py_DECREF(empty_args);
-    Py_DECREF(factory_kwargs);
-    Py_DECREF(columns);
+    Py_XDECREF(factory_kwargs);
+    Py_XDECREF(columns);
     Py_DECREF(primary_key);
     return 0;
 
@@ -1982,6 +2090,7 @@ ObjectInfo_traverse(ObjectInfoObject *self, visitproc visit, void *arg)
     Py_VISIT(self->__obj_ref);
     Py_VISIT(self->__obj_ref_callback);
     Py_VISIT(self->cls_info);
+    Py_VISIT(self->__cls_event);
     Py_VISIT(self->event);
     Py_VISIT(self->variables);
     Py_VISIT(self->primary_vars);
@@ -1994,6 +2103,7 @@ ObjectInfo_clear(ObjectInfoObject *self)
     Py_CLEAR(self->__obj_ref);
     Py_CLEAR(self->__obj_ref_callback);
     Py_CLEAR(self->cls_info);
+    Py_CLEAR(self->__cls_event);
     Py_CLEAR(self->event);
     Py_CLEAR(self->variables);
     Py_CLEAR(self->primary_vars);
@@ -2028,6 +2138,7 @@ ObjectInfo_dealloc(ObjectInfoObject *self)
     Py_CLEAR(self->__obj_ref);
     Py_CLEAR(self->__obj_ref_callback);
     Py_CLEAR(self->cls_info);
+    Py_CLEAR(self->__cls_event);
     Py_CLEAR(self->event);
     Py_CLEAR(self->variables);
     Py_CLEAR(self->primary_vars);
@@ -2040,13 +2151,15 @@ static PyMethodDef ObjectInfo_methods[] = {
     {"get_obj", (PyCFunction)ObjectInfo_get_obj, METH_NOARGS, NULL},
     {"set_obj", (PyCFunction)ObjectInfo_set_obj, METH_VARARGS, NULL},
     {"checkpoint", (PyCFunction)ObjectInfo_checkpoint, METH_VARARGS, NULL},
+    {"hook", (PyCFunction)ObjectInfo_hook, METH_VARARGS, NULL},
+    {"unhook", (PyCFunction)ObjectInfo_unhook, METH_VARARGS, NULL},
+    {"emit", (PyCFunction)ObjectInfo_emit, METH_VARARGS, NULL},
     {NULL, NULL}
 };
 
 #define OFFSETOF(x) offsetof(ObjectInfoObject, x)
 static PyMemberDef ObjectInfo_members[] = {
     {"cls_info", T_OBJECT, OFFSETOF(cls_info), 0, 0},
-    {"event", T_OBJECT, OFFSETOF(event), 0, 0},
     {"variables", T_OBJECT, OFFSETOF(variables), 0, 0},
     {"primary_vars", T_OBJECT, OFFSETOF(primary_vars), 0, 0},
     {NULL}
@@ -2056,6 +2169,7 @@ static PyMemberDef ObjectInfo_members[] = {
 static PyGetSetDef ObjectInfo_getset[] = {
     {"__storm_object_info__", (getter)ObjectInfo__storm_object_info__,
         NULL, NULL},
+    {"event", (getter)ObjectInfo__get_event, NULL, NULL},
     {NULL}
 };
 
@@ -25,18 +25,25 @@ This is the common code for database support; specific databases are
 supported in modules in L{storm.databases}.
 """
 
-from storm.expr import Expr, State, compile
+from time import time
+import threading
+import csv
+import re
+
+from storm.expr import (
+    Expr, State, Insert, Select, SetExpr, SQLRaw, Undef, compile)
 from storm.tracer import trace
 from storm.variables import Variable
 from storm.exceptions import (
     ClosedError, ConnectionBlockedError, DatabaseError, DisconnectionError,
-    Error)
+    Error, PoolTimeoutError)
 from storm.uri import URI
 import storm
 
 
-__all__ = ["Database", "Connection", "Result",
-           "convert_param_marks", "create_database", "register_scheme"]
+__all__ = ["Database", "Connection", "Result", "ConnectionPool",
+           "convert_param_marks", "CompiledQuery", "is_read_statement",
+           "create_database", "register_scheme"]
 
 
 STATE_CONNECTED = 1
@@ -168,11 +175,16 @@ class Connection(object):
     @cvar param_mark: The dbapi paramstyle that the database backend expects.
     @type compile: L{storm.expr.Compile}
     @cvar compile: The compiler to use for connections of this type.
+    @ivar pipelined: If true, statements executed with C{noresult} are
+        queued, and sent together right before the next statement whose
+        result is needed, or at commit.  Errors raised by queued
+        statements are then raised by that statement or commit.
     """
 
     result_factory = Result
     param_mark = "?"
     compile = compile
+    pipelined = False
 
     _blocked = False
     _closed = False
@@ -181,7 +193,11 @@ class Connection(object):
     def __init__(self, database, event=None):
         self._database = database # Ensures deallocation order.
         self._event = event
-        self._raw_connection = self._database.raw_connect()
+        # The raw connection is opened, or borrowed from the pool of the
+        # database, once a statement is executed.
+        self._raw_connection = None
+        self._state = STATE_RECONNECT
+        self._pipeline = []
 
     def __del__(self):
         """Close the connection."""
@@ -218,15 +234,15 @@ class Connection(object):
             Reconnection happens automatically on rollback.
 
         @return: The result of C{self.result_factory}, or None if
-            C{noresult} is True.
+            C{noresult} is True or the statement is a bulk L{Insert}
+            with primary variables to be filled.
         """
-        if self._closed:
-            raise ClosedError("Connection is closed")
-        if self._blocked:
-            raise ConnectionBlockedError("Access to connection is blocked")
-        self._ensure_connected()
-        if self._event:
-            self._event.emit("register-transaction")
+        self._prepare_execution()
+        if (isinstance(statement, Insert) and
+            statement.values is not Undef and
+            statement.primary_variables is not Undef):
+            self._execute_bulk_insert(statement)
+            return None
         if isinstance(statement, Expr):
             if params is not None:
                 raise ValueError("Can't pass parameters with expressions")
@@ -234,46 +250,237 @@ class Connection(object):
             statement = self.compile(statement, state)
             params = state.parameters
         statement = convert_param_marks(statement, "?", self.param_mark)
+        if noresult and self.pipelined:
+            if params:
+                # Variables may change before the statement is sent.
+                params = [param.get(to_db=True)
+                          if isinstance(param, Variable) else param
+                          for param in params]
+            self._pipeline.append((statement, params))
+            return None
+        self.flush_pipeline()
         raw_cursor = self.raw_execute(statement, params)
         if noresult:
             self._check_disconnect(raw_cursor.close)
             return None
         return self.result_factory(self, raw_cursor)
 
+    def execute_many(self, statement, seq_of_params):
+        """Execute a statement once for each set of parameters.
+
+        The statement is compiled once, and executed for all sets of
+        parameters as a single batch, as fast as the backend allows.
+
+        @type statement: L{Expr} or C{str}
+        @param statement: The statement to execute.  It will be compiled
+            if necessary, but expressions can't have parameters of their
+            own; use C{SQLRaw("?")} for the values given by
+            C{seq_of_params}.
+        @param seq_of_params: An iterable with a sequence of values or
+            variables for each execution of the statement.
+
+        @raise ConnectionBlockedError: Raised if access to the connection
+            has been blocked with L{block_access}.
+        @raise DisconnectionError: Raised when the connection is lost.
+            Reconnection happens automatically on rollback.
+        """
+        self._prepare_execution()
+        if isinstance(statement, Expr):
+            state = State()
+            statement = self.compile(statement, state)
+            if state.parameters:
+                raise ValueError("Can't execute many times expressions with "
+                                 "parameters of their own")
+        statement = convert_param_marks(statement, "?", self.param_mark)
+        self.flush_pipeline()
+        raw_cursor = self.raw_execute_many(statement, seq_of_params)
+        self._check_disconnect(raw_cursor.close)
+
+    def copy_in(self, table, columns, rows):
+        """Insert many rows into a table, as fast as the backend allows.
+
+        By default, this executes an INSERT statement for all rows with a
+        single C{executemany()} call.  Backends with their own bulk
+        loading mechanisms override this.
+
+        @param table: The table to insert rows into.
+        @param columns: A sequence of columns of the table.
+        @param rows: An iterable with a sequence of values or variables
+            for C{columns} for each row.
+        """
+        self._prepare_execution()
+        self.flush_pipeline()
+        insert = Insert(tuple(columns), table,
+                        values=[(SQLRaw("?"),) * len(columns)])
+        statement = convert_param_marks(self.compile(insert), "?",
+                                        self.param_mark)
+        self._check_disconnect(self.raw_execute_many(statement, rows).close)
+
+    def copy_out(self, statement, fileobj, format="csv", params=None):
+        """Write the rows of a query to a file, as fast as the backend allows.
+
+        By default, this executes the query and writes the rows as they're
+        fetched, in chunks of the cursor's C{arraysize}.  Values aren't
+        converted by variables, and unicode values are written as UTF-8.
+        Backends able to export query results by themselves override
+        this.
+
+        @type statement: L{Expr} or C{str}
+        @param statement: The query whose rows are written.  It will be
+            compiled if necessary.
+        @param fileobj: The file object rows are written to.
+        @param format: The format rows are written in.  Only C{"csv"}
+            is supported, with NULL values written as empty fields.
+        @param params: Parameters for a C{str} statement.
+        """
+        if format != "csv":
+            raise ValueError("Unsupported copy format: %r" % (format,))
+        result = self.execute(statement, params)
+        writer = csv.writer(fileobj, lineterminator="\n")
+        writer.writerows([value.encode("UTF-8")
+                          if isinstance(value, unicode) else value
+                          for value in row]
+                         for row in result)
+
+    def flush_pipeline(self):
+        """Send the statements queued when L{pipelined} is true.
+
+        By default, statements are executed one after the other.
+        Backends able to send several statements in a single round trip
+        override L{_raw_execute_pipeline}.
+        """
+        if self._pipeline:
+            pipeline = self._pipeline
+            self._pipeline = []
+            self._raw_execute_pipeline(pipeline)
+
+    def _raw_execute_pipeline(self, pipeline):
+        """Execute a list of C{(statement, params)} queued statements."""
+        for statement, params in pipeline:
+            raw_cursor = self.raw_execute(statement, params)
+            self._check_disconnect(raw_cursor.close)
+
+    def _prepare_execution(self):
+        """Check that statements may be executed and register the transaction.
+        """
+        if self._closed:
+            raise ClosedError("Connection is closed")
+        if self._blocked:
+            raise ConnectionBlockedError("Access to connection is blocked")
+        self._ensure_connected()
+        if self._event:
+            self._event.emit("register-transaction")
+
+    def _execute_bulk_insert(self, insert):
+        """Insert the rows of a bulk insert, filling its primary variables.
+
+        Rows are inserted one at a time, and the insert identity of each
+        of them is used to retrieve primary keys generated by the
+        database.  Backends able to return the primary keys of all rows
+        inserted by a single statement override L{execute} instead.
+        """
+        columns = tuple(insert.map)
+        for row, primary_variables in zip(insert.values,
+                                          insert.primary_variables):
+            row_insert = Insert(dict(zip(columns, row)), insert.table,
+                                insert.default_table, insert.primary_columns,
+                                primary_variables)
+            result = self.execute(row_insert)
+            for variable in primary_variables:
+                if not variable.is_defined():
+                    where = result.get_insert_identity(
+                        insert.primary_columns, primary_variables)
+                    result = self.execute(
+                        Select(insert.primary_columns, where))
+                    for variable, value in zip(primary_variables,
+                                               result.get_one()):
+                        result.set_variable(variable, value)
+                    break
+
     def close(self):
-        """Close the connection if it is not already closed."""
+        """Close the connection if it is not already closed.
+
+        A raw connection borrowed from a pool is given back to it rather
+        than closed.
+        """
         if not self._closed:
             self._closed = True
-            if self._raw_connection is not None:
+            self._pipeline = []
+            if self._database.pool is not None:
+                self._release_raw_connection()
+            elif self._raw_connection is not None:
                 self._raw_connection.close()
                 self._raw_connection = None
 
     def commit(self):
         """Commit the connection.
 
+        A raw connection borrowed from a pool is given back to it once
+        committed.
+
         @raise ConnectionBlockedError: Raised if access to the connection
             has been blocked with L{block_access}.
         @raise DisconnectionError: Raised when the connection is lost.
             Reconnection happens automatically on rollback.
 
         """
+        if self._state == STATE_RECONNECT and not self._blocked:
+            # Nothing was executed since the raw connection was released.
+            return
         self._ensure_connected()
+        self.flush_pipeline()
+        self._raw_commit()
+        self._release_raw_connection()
+
+    def _raw_commit(self):
+        """Commit the raw connection."""
         self._check_disconnect(self._raw_connection.commit)
 
     def rollback(self):
-        """Rollback the connection."""
+        """Rollback the connection.
+
+        A raw connection borrowed from a pool is given back to it once
+        rolled back.  Queued statements are dropped.
+        """
+        self._pipeline = []
         if self._state == STATE_CONNECTED:
             try:
                 self._raw_connection.rollback()
             except Error, exc:
                 if self.is_disconnection_error(exc):
-                    self._raw_connection = None
+                    self._release_raw_connection(discard=True)
                     self._state = STATE_RECONNECT
                 else:
                     raise
+            else:
+                self._release_raw_connection()
         else:
             self._state = STATE_RECONNECT
 
+    def _release_raw_connection(self, discard=False):
+        """Give the raw connection back to the pool of the database.
+
+        Without a pool, the raw connection is kept for the next
+        transaction, unless it's discarded.
+
+        @param discard: If true, the raw connection is unusable, and is
+            dropped instead of being reused.
+        """
+        raw_connection = self._raw_connection
+        pool = self._database.pool
+        if pool is None:
+            if discard:
+                self._raw_connection = None
+            return
+        self._raw_connection = None
+        if raw_connection is None:
+            return
+        if discard:
+            pool.discard(raw_connection)
+        else:
+            pool.checkin(raw_connection)
+            self._state = STATE_RECONNECT
+
     @staticmethod
     def to_database(params):
         """Convert some parameters into values acceptable to a database backend.
@@ -330,6 +537,49 @@ class Connection(object):
                 statement, params or ())
         return raw_cursor
 
+    def raw_execute_many(self, statement, params_list):
+        """Execute a raw statement once for each set of parameters.
+
+        This is like L{raw_execute}, but all sets of parameters are
+        executed as a batch by L{_raw_execute_many}.  Tracers get
+        C{connection_raw_execute_many} events with the number of sets of
+        parameters in the batch, rather than C{connection_raw_execute}
+        ones.
+
+        It's acceptable to override this method in subclasses, but it
+        is not intended to be called externally.
+
+        @return: The dbapi cursor object, as fetched from L{build_raw_cursor}.
+        """
+        raw_cursor = self._check_disconnect(self.build_raw_cursor)
+        params_list = [tuple(self.to_database(params))
+                       for params in params_list]
+        batch_size = len(params_list)
+        self._check_disconnect(
+            trace, "connection_raw_execute_many", self, raw_cursor,
+            statement, batch_size)
+        try:
+            self._check_disconnect(self._raw_execute_many, raw_cursor,
+                                   statement, params_list)
+        except Exception, error:
+            self._check_disconnect(
+                trace, "connection_raw_execute_many_error", self, raw_cursor,
+                statement, batch_size, error)
+            raise
+        else:
+            self._check_disconnect(
+                trace, "connection_raw_execute_many_success", self,
+                raw_cursor, statement, batch_size)
+        return raw_cursor
+
+    def _raw_execute_many(self, raw_cursor, statement, params_list):
+        """Execute a batch of sets of parameters with C{raw_cursor}.
+
+        By default, this uses the C{executemany()} method of the cursor.
+        Backends with faster ways to run batches override this.
+        """
+        raw_cursor.executemany(statement, params_list)
+
     def _ensure_connected(self):
         """Ensure that we are connected to the database.
 
@@ -344,7 +594,10 @@ class Connection(object):
             raise DisconnectionError("Already disconnected")
         elif self._state == STATE_RECONNECT:
             try:
-                self._raw_connection = self._database.raw_connect()
+                if self._database.pool is not None:
+                    self._raw_connection = self._database.pool.checkout()
+                else:
+                    self._raw_connection = self._database.raw_connect()
             except DatabaseError, exc:
                 self._state = STATE_DISCONNECTED
                 self._raw_connection = None
@@ -367,7 +620,7 @@ class Connection(object):
         except Error, exc:
             if self.is_disconnection_error(exc):
                 self._state = STATE_DISCONNECTED
-                self._raw_connection = None
+                self._release_raw_connection(discard=True)
                 raise DisconnectionError(str(exc))
             else:
                 raise
@@ -379,6 +632,213 @@ class Connection(object):
         changes in primary variables before an insert happens.
         """
 
+    def prepare_write(self):
+        """Prepare for statements changing the database.
+
+        Stores call this before the statements flushing an object,
+        including queries resolving values to be inserted, so that
+        connections sending statements to several databases, like
+        L{storm.replication.ReplicatedConnection}, send them to the one
+        taking changes.  By default, nothing is done.
+        """
+
+
+class ConnectionPool(object):
+    """A pool of raw connections to a database.
+
+    Once a pool is set as the L{Database.pool} of a database, its
+    connections borrow a raw connection from the pool when they execute
+    a statement, and give it back when the transaction is committed or
+    rolled back.  Many connections which are idle most of the time, like
+    the ones of stores kept by each thread, may then share a few raw
+    connections.
+
+    @ivar max_size: The maximum number of raw connections open at once,
+        or None for no limit.  Checking out a raw connection blocks while
+        all of them are in use.
+    @ivar min_idle: The number of raw connections opened when the pool
+        is created, and reopened when discarded, so that they're ready
+        for use.
+    @ivar max_lifetime: The number of seconds after which raw connections
+        are closed rather than reused, or None to reuse them forever.
+    @ivar check: Whether idle raw connections are checked to be alive
+        with a C{SELECT 1} before being checked out.
+    @ivar timeout: The number of seconds to wait for a raw connection
+        when all of them are in use, before raising L{PoolTimeoutError}.
+    """
+
+    def __init__(self, database, max_size=None, min_idle=0,
+                 max_lifetime=None, check=True, timeout=30):
+        self._database = database
+        self.max_size = max_size
+        self.min_idle = min_idle
+        self.max_lifetime = max_lifetime
+        self.check = check
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._idle = []
+        self._created = {}
+        self._size = 0
+        self._closed = False
+        self.fill()
+
+    @property
+    def size(self):
+        """The number of raw connections open, whether idle or in use."""
+        return self._size
+
+    @property
+    def idle_size(self):
+        """The number of idle raw connections."""
+        return len(self._idle)
+
+    def fill(self):
+        """Open raw connections until C{min_idle} of them are idle."""
+        while True:
+            self._condition.acquire()
+            try:
+                if (self._closed or len(self._idle) >= self.min_idle or
+                    (self.max_size is not None and
+                     self._size >= self.max_size)):
+                    return
+                self._size += 1
+            finally:
+                self._condition.release()
+            raw_connection = self._connect()
+            self._condition.acquire()
+            try:
+                self._idle.append(raw_connection)
+                self._condition.notify()
+            finally:
+                self._condition.release()
+
+    def checkout(self):
+        """Borrow a raw connection from the pool.
+
+        Idle raw connections are reused, most recently used first, unless
+        they're too old or aren't alive anymore.  A new raw connection is
+        opened if none is idle.
+
+        @raise PoolTimeoutError: Raised if all raw connections are in use
+            and none is given back in C{timeout} seconds.
+        """
+        while True:
+            raw_connection = self._take()
+            if raw_connection is None:
+                return self._connect()
+            if not self._is_expired(raw_connection) and (
+                not self.check or self._is_alive(raw_connection)):
+                return raw_connection
+            self.discard(raw_connection)
+
+    def checkin(self, raw_connection):
+        """Give back a raw connection, rolling back any transaction in it.
+        """
+        try:
+            raw_connection.rollback()
+        except Error:
+            self.discard(raw_connection)
+            return
+        if self._closed or self._is_expired(raw_connection):
+            self.discard(raw_connection)
+            return
+        self._condition.acquire()
+        try:
+            self._idle.append(raw_connection)
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def discard(self, raw_connection):
+        """Close a raw connection which was checked out of the pool."""
+        self._condition.acquire()
+        try:
+            self._size -= 1
+            del self._created[id(raw_connection)]
+            self._condition.notify()
+        finally:
+            self._condition.release()
+        try:
+            raw_connection.close()
+        except Error:
+            pass
+        try:
+            self.fill()
+        except Error:
+            # The next checkout will try to connect again.
+            pass
+
+    def close(self):
+        """Close idle raw connections, and others once given back."""
+        self._condition.acquire()
+        try:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+        finally:
+            self._condition.release()
+        for raw_connection in idle:
+            self.discard(raw_connection)
+
+    def _take(self):
+        """Take an idle raw connection, or reserve room for a new one.
+
+        @return: An idle raw connection, or None if a new one may be
+            opened.
+        """
+        deadline = None
+        self._condition.acquire()
+        try:
+            while (not self._idle and self.max_size is not None and
+                   self._size >= self.max_size):
+                if deadline is None:
+                    deadline = time() + self.timeout
+                remaining = deadline - time()
+                if remaining <= 0:
+                    raise PoolTimeoutError("All %d connections of the pool "
+                                           "are in use" % self._size)
+                self._condition.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+            return None
+        finally:
+            self._condition.release()
+
+    def _connect(self):
+        """Open a raw connection in room reserved for it."""
+        try:
+            raw_connection = self._raw_connect()
+        except:
+            self._condition.acquire()
+            try:
+                self._size -= 1
+                self._condition.notify()
+            finally:
+                self._condition.release()
+            raise
+        self._created[id(raw_connection)] = time()
+        return raw_connection
+
+    def _raw_connect(self):
+        return self._database.raw_connect_pooled()
+
+    def _is_expired(self, raw_connection):
+        return (self.max_lifetime is not None and
+                time() - self._created[id(raw_connection)] >=
+                self.max_lifetime)
+
+    def _is_alive(self, raw_connection):
+        try:
+            raw_cursor = raw_connection.cursor()
+            raw_cursor.execute("SELECT 1")
+            raw_cursor.fetchall()
+            raw_cursor.close()
+            raw_connection.rollback()
+        except Error:
+            return False
+        return True
+
 
 class Database(object):
     """A database that can be connected to.
@@ -387,9 +847,12 @@ class Database(object):
 
     @cvar connection_factory: A callable which will take this database
         and should return an instance of L{Connection}.
+    @ivar pool: The L{ConnectionPool} which connections borrow raw
+        connections from, or None if each connection has its own.
     """
 
     connection_factory = Connection
+    pool = None
 
     def connect(self, event=None):
         """Create a connection to the database.
@@ -415,6 +878,18 @@ class Database(object):
         """
         raise NotImplementedError
 
+    def raw_connect_pooled(self):
+        """Create a raw database connection for a L{ConnectionPool}.
+
+        Raw connections of a pool are used by connections of any thread,
+        one at a time.  By default, this is the same as L{raw_connect},
+        but backends whose raw connections are tied to the thread that
+        opened them override it.
+
+        @return: A DB-API connection object.
+        """
+        return self.raw_connect()
+
 
 def convert_param_marks(statement, from_param_mark, to_param_mark):
     # TODO: Add support for $foo$bar$foo$ literals.
@@ -426,6 +901,38 @@ def convert_param_marks(statement, from_param_mark, to_param_mark):
     return "'".join(tokens)
 
 
+_read_statement = re.compile(
+    r"\s*SELECT\b(?!.*\b(?:FOR\s+(?:UPDATE|SHARE)|INTO)\b)", re.I | re.S)
+
+
+class CompiledQuery(unicode):
+    """SQL compiled from a L{Select} or set expression.
+
+    Stores mark the statements they compile once and execute many times
+    with this class, so that L{is_read_statement} knows they only read
+    the database.
+    """
+
+
+def is_read_statement(statement, raw=True):
+    """Return whether a statement only reads the database.
+
+    Queries built with L{Select} or set expressions do, and so do raw
+    SELECT statements which neither lock rows nor store their results
+    with INTO.  Raw statements calling functions which change the
+    database, like C{SELECT nextval('seq')}, can't be told apart, so
+    connections sending reads elsewhere should only trust raw
+    statements when told to.
+
+    @param raw: If false, raw statements are never considered reads.
+    """
+    if isinstance(statement, (Select, SetExpr, CompiledQuery)):
+        return True
+    if raw and isinstance(statement, basestring):
+        return _read_statement.match(statement) is not None
+    return False
+
+
 _database_schemes = {}
 
 def register_scheme(scheme, factory):
@@ -448,6 +955,11 @@ def create_database(uri):
           with supplied user credentials, using postgres.
         - "anything:..." Where 'anything' has previously been registered
           with L{register_scheme}.
+
+        The C{pool_size}, C{pool_min_idle}, C{pool_max_lifetime},
+        C{pool_check} and C{pool_timeout} options set up a
+        L{ConnectionPool} for the database, as in
+        "postgres:test?pool_size=10".
     """
     if isinstance(uri, basestring):
         uri = URI(uri)
@@ -457,4 +969,29 @@ def create_database(uri):
         module = __import__("%s.databases.%s" % (storm.__name__, uri.scheme),
                             None, None, [""])
         factory = module.create_from_uri
-    return factory(uri)
+    database = factory(uri)
+    pool_options = dict((option[5:], value)
+                        for option, value in uri.options.iteritems()
+                        if option.startswith("pool_"))
+    if pool_options:
+        database.pool = _create_pool(database, pool_options)
+    return database
+
+
+def _create_pool(database, options):
+    """Create a L{ConnectionPool} from the C{pool_*} options of a URI."""
+    kwargs = {}
+    for option, value in options.iteritems():
+        if option == "size":
+            kwargs["max_size"] = int(value)
+        elif option == "min_idle":
+            kwargs["min_idle"] = int(value)
+        elif option == "max_lifetime":
+            kwargs["max_lifetime"] = float(value)
+        elif option == "timeout":
+            kwargs["timeout"] = float(value)
+        elif option == "check":
+            kwargs["check"] = value.lower() not in ("0", "false", "no")
+        else:
+            raise ValueError("Unknown pool option: pool_%s" % (option,))
+    return ConnectionPool(database, **kwargs)
@@ -19,6 +19,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 from datetime import datetime, date, time, timedelta
+from decimal import Decimal
 from distutils.version import LooseVersion
 
 from storm.databases import dummy
@@ -38,43 +39,30 @@ try:
 except ImportError:
     psycopg2 = dummy
 
+# execute_batch() is only available in psycopg2 2.7 or greater.
+try:
+    from psycopg2.extras import execute_batch
+except ImportError:
+    execute_batch = None
+
 from storm.expr import (
     Undef, Expr, SetExpr, Select, Insert, Alias, And, Eq, FuncExpr, SQLRaw,
-    Sequence, Like, SQLToken, COLUMN, COLUMN_NAME, COLUMN_PREFIX, TABLE,
-    compile, compile_select, compile_insert, compile_set_expr, compile_like,
-    compile_sql_token)
+    Sequence, Like, SQLToken, Returning, State, COLUMN, COLUMN_NAME,
+    COLUMN_PREFIX, TABLE, compile, compile_select, compile_insert,
+    compile_set_expr, compile_like, compile_sql_token)
 from storm.variables import Variable, ListVariable
-from storm.database import Database, Connection, Result
+from storm.database import Database, Connection, Result, convert_param_marks
 from storm.exceptions import (
-    install_exceptions, DatabaseError, DatabaseModuleError, InterfaceError,
-    OperationalError, ProgrammingError, TimeoutError)
-from storm.tracer import TimeoutTracer
+    install_exceptions, Error, DatabaseError, DatabaseModuleError,
+    DisconnectionError, InterfaceError, OperationalError, ProgrammingError,
+    TimeoutError)
+from storm.tracer import TimeoutTracer, trace
 
 
 install_exceptions(psycopg2)
 compile = compile.create_child()
 
 
-class Returning(Expr):
-    """Appends the "RETURNING <primary_columns>" suffix to an INSERT.
-
-    This is only supported in PostgreSQL 8.2+.
-    """
-
-    def __init__(self, insert):
-        self.insert = insert
-
-@compile.when(Returning)
-def compile_returning(compile, expr, state):
-    state.push("context", COLUMN)
-    columns = compile(expr.insert.primary_columns, state)
-    state.pop()
-    state.push("precedence", 0)
-    insert = compile(expr.insert, state)
-    state.pop()
-    return "%s RETURNING %s" % (insert, columns)
-
-
 class currval(FuncExpr):
 
     name = "currval"
@@ -177,7 +165,8 @@ def compile_set_expr_postgres(compile, expr, state):
 def compile_insert_postgres(compile, insert, state):
     # PostgreSQL fails with INSERT INTO table VALUES (), so we transform
     # that to INSERT INTO table (id) VALUES (DEFAULT).
-    if not insert.map and insert.primary_columns is not Undef:
+    if (not insert.map and insert.values is Undef and
+        insert.primary_columns is not Undef):
         insert.map.update(dict.fromkeys(insert.primary_columns,
                                         SQLRaw("DEFAULT")))
     return compile_insert(compile, insert, state)
@@ -203,6 +192,93 @@ def compile_sql_token_postgres(compile, expr, state):
     return compile_sql_token(compile, expr, state)
 
 
+def copy_format(value):
+    """Return the text format of COPY for a value or variable.
+
+    @raise TypeError: Raised for values of unsupported types.
+    """
+    text = _copy_text(value)
+    if text is None:
+        return "\\N"
+    return (text.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _copy_text(value):
+    """Return the text PostgreSQL reads a value from, or None for NULL."""
+    if isinstance(value, Variable):
+        value = value.get(to_db=True)
+    if value is None:
+        return None
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, str):
+        # Escaped bytea octets.
+        return "".join(["\\%03o" % ord(char) for char in value])
+    if isinstance(value, unicode):
+        return value.encode("UTF-8")
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return "{%s}" % ",".join([_copy_array_element(item)
+                                  for item in value])
+    if isinstance(value, timedelta):
+        return "%d days %d.%06d seconds" % (value.days, value.seconds,
+                                             value.microseconds)
+    if isinstance(value, (int, long, Decimal, datetime, date, time)):
+        return str(value)
+    raise TypeError("Can't copy values of type %s" % type(value).__name__)
+
+
+def _copy_array_element(value):
+    """Return the text of an element of an array literal."""
+    if isinstance(value, Variable):
+        value = value.get(to_db=True)
+    text = _copy_text(value)
+    if text is None:
+        return "NULL"
+    if isinstance(value, (list, tuple)):
+        return text
+    return '"%s"' % text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class CopyInFile(object):
+    """File-like object reading rows in the text format of COPY.
+
+    Rows are formatted as they're read, so they may be generated while
+    being sent to the database rather than kept in memory.
+    """
+
+    def __init__(self, rows):
+        self._lines = ("\t".join([copy_format(value) for value in row]) + "\n"
+                       for row in rows)
+        self._buffer = ""
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        if size < 0 or length < size:
+            for line in self._lines:
+                chunks.append(line)
+                length += len(line)
+                if 0 <= size <= length:
+                    break
+        data = "".join(chunks)
+        if size < 0:
+            self._buffer = ""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+    def readline(self, size=-1):
+        if self._buffer:
+            line, self._buffer = self._buffer, ""
+            return line
+        return next(self._lines, "")
+
+
 class PostgresResult(Result):
 
     def get_insert_identity(self, primary_key, primary_variables):
@@ -222,6 +298,7 @@ class PostgresConnection(Connection):
     result_factory = PostgresResult
     param_mark = "%s"
     compile = compile
+    batch_page_size = 100
 
     def execute(self, statement, params=None, noresult=False):
         """Execute a statement with the given parameters.
@@ -230,8 +307,31 @@ class PostgresConnection(Connection):
         for automatic retrieval of inserted primary keys to link
         in-memory objects with their specific rows.
         """
+        if isinstance(statement, Insert) and self._database._version is None:
+            # The server version is found out when connecting.
+            self._prepare_execution()
+        if (isinstance(statement, Insert) and
+            self._database._version >= 80200 and
+            statement.map and statement.values is not Undef and
+            statement.primary_variables is not Undef and
+            statement.primary_columns is not Undef):
+
+            # Bulk inserts get the primary keys of all rows back at once.
+            # The order of rows returned isn't documented by PostgreSQL,
+            # but its executor inserts the rows of a VALUES list, and
+            # returns them, in the order they're given, which is relied
+            # upon to match rows with their primary variables.  SQLite
+            # documents that order as arbitrary, and inserts rows one at
+            # a time instead.
+            result = Connection.execute(self, Returning(statement), params)
+            for variables, values in zip(statement.primary_variables, result):
+                for variable, value in zip(variables, values):
+                    result.set_variable(variable, value)
+            return None
+
         if (isinstance(statement, Insert) and
             self._database._version >= 80200 and
+            statement.values is Undef and
             statement.primary_variables is not Undef and
             statement.primary_columns is not Undef):
 
@@ -248,6 +348,112 @@ class PostgresConnection(Connection):
 
         return Connection.execute(self, statement, params, noresult)
 
+    def copy_in(self, table, columns, rows):
+        """Insert many rows into a table with a C{COPY ... FROM STDIN}.
+
+        Rows are streamed to the server in the text format of COPY as
+        they're taken from C{rows}.  Tracers see the COPY statement as
+        any other statement, with an empty sequence of parameters.
+        """
+        self._prepare_execution()
+        state = State()
+        state.push("context", COLUMN_NAME)
+        columns = self.compile(tuple(columns), state, token=True)
+        state.context = TABLE
+        table = self.compile(table, state, token=True)
+        state.pop()
+        self.flush_pipeline()
+        statement = "COPY %s (%s) FROM STDIN" % (table, columns)
+        if type(statement) is unicode:
+            statement = statement.encode("UTF-8")
+        raw_cursor = self._check_disconnect(self.build_raw_cursor)
+        self._raw_copy(raw_cursor, statement, CopyInFile(rows))
+
+    def copy_out(self, statement, fileobj, format="csv", params=None):
+        """Write the rows of a query to a file with a C{COPY ... TO STDOUT}.
+
+        The server formats rows by itself, and they're streamed to
+        C{fileobj} without going through the cursor.  Parameters are
+        interpolated into the statement by psycopg2, since C{COPY}
+        doesn't take any.
+        """
+        if format != "csv":
+            raise ValueError("Unsupported copy format: %r" % (format,))
+        self._prepare_execution()
+        self.flush_pipeline()
+        if isinstance(statement, Expr):
+            if params is not None:
+                raise ValueError("Can't pass parameters with expressions")
+            state = State()
+            statement = self.compile(statement, state)
+            params = state.parameters
+        if type(statement) is unicode:
+            statement = statement.encode("UTF-8")
+        raw_cursor = self._check_disconnect(self.build_raw_cursor)
+        if params:
+            statement = convert_param_marks(statement, "?", "%s")
+            statement = self._check_disconnect(
+                raw_cursor.mogrify, statement, tuple(self.to_database(params)))
+        statement = "COPY (%s) TO STDOUT WITH CSV" % statement
+        self._raw_copy(raw_cursor, statement, fileobj)
+
+    def _raw_execute_pipeline(self, pipeline):
+        """Send queued statements to the server in a single round trip.
+
+        Parameters are interpolated by psycopg2, and statements are
+        joined into a single query, run within a savepoint.  If that
+        fails, the savepoint is rolled back and the statements are
+        executed one after the other, so that the error is raised, and
+        traced, by the statement causing it.  Errors which don't happen
+        again, like deadlocks, are thus not raised at all.
+        """
+        if len(pipeline) == 1:
+            return Connection._raw_execute_pipeline(self, pipeline)
+        raw_cursor = self._check_disconnect(self.build_raw_cursor)
+        statements = ["SAVEPOINT storm_pipeline"]
+        for statement, params in pipeline:
+            if type(statement) is unicode:
+                statement = statement.encode("UTF-8")
+            if params:
+                statement = self._check_disconnect(
+                    raw_cursor.mogrify, statement,
+                    tuple(self.to_database(params)))
+            statements.append(statement)
+        statements.append("RELEASE SAVEPOINT storm_pipeline")
+        self._check_disconnect(raw_cursor.close)
+        try:
+            raw_cursor = self.raw_execute(";\n".join(statements), None)
+        except DisconnectionError:
+            raise
+        except Error:
+            raw_cursor = self.raw_execute(
+                "ROLLBACK TO SAVEPOINT storm_pipeline", None)
+            self._check_disconnect(raw_cursor.close)
+            Connection._raw_execute_pipeline(self, pipeline)
+        else:
+            self._check_disconnect(raw_cursor.close)
+
+    def _raw_copy(self, raw_cursor, statement, fileobj):
+        """Run a C{COPY} statement reading from or writing to C{fileobj}.
+
+        Tracers see the statement as any other, with an empty sequence
+        of parameters.
+        """
+        self._check_disconnect(
+            trace, "connection_raw_execute", self, raw_cursor, statement, ())
+        try:
+            self._check_disconnect(raw_cursor.copy_expert, statement, fileobj)
+        except Exception, error:
+            self._check_disconnect(
+                trace, "connection_raw_execute_error", self, raw_cursor,
+                statement, (), error)
+            raise
+        else:
+            self._check_disconnect(
+                trace, "connection_raw_execute_success", self, raw_cursor,
+                statement, ())
+        self._check_disconnect(raw_cursor.close)
+
     def raw_execute(self, statement, params):
         """
         Like L{Connection.raw_execute}, but encode the statement to
@@ -258,6 +464,28 @@ class PostgresConnection(Connection):
             statement = statement.encode("UTF-8")
         return Connection.raw_execute(self, statement, params)
 
+    def raw_execute_many(self, statement, params_list):
+        """
+        Like L{Connection.raw_execute_many}, but encode the statement to
+        UTF-8 if it is unicode.
+        """
+        if type(statement) is unicode:
+            statement = statement.encode("UTF-8")
+        return Connection.raw_execute_many(self, statement, params_list)
+
+    def _raw_execute_many(self, raw_cursor, statement, params_list):
+        """Execute a batch with C{execute_batch()}, if psycopg2 has it.
+
+        Its C{executemany()} does a round trip to the server for each set
+        of parameters, while C{execute_batch()} sends many of them in a
+        single round trip.
+        """
+        if execute_batch is None:
+            raw_cursor.executemany(statement, params_list)
+        else:
+            execute_batch(raw_cursor, statement, params_list,
+                          page_size=self.batch_page_size)
+
     def to_database(self, params):
         """
         Like L{Connection.to_database}, but this converts datetime
@@ -21,6 +21,7 @@
 from datetime import datetime, date, time, timedelta
 from time import sleep, time as now
 import sys
+import threading
 
 from storm.databases import dummy
 
@@ -33,11 +34,12 @@ except ImportError:
         sqlite = dummy
 
 from storm.variables import Variable, RawStrVariable
-from storm.database import Database, Connection, Result
-from storm.exceptions import install_exceptions, DatabaseModuleError
+from storm.database import (
+    Database, Connection, ConnectionPool, Result, is_read_statement)
+from storm.exceptions import install_exceptions, DatabaseModuleError, Error
 from storm.expr import (
     Insert, Select, SELECT, Undef, SQLRaw, Union, Except, Intersect,
-    compile, compile_insert, compile_select)
+    Returning, compile, compile_insert, compile_select)
 
 
 install_exceptions(sqlite)
@@ -101,6 +103,10 @@ class SQLiteConnection(Connection):
     result_factory = SQLiteResult
     compile = compile
     _in_transaction = False
+    _writing = False
+    _reader = None
+    _use_reader = False
+    _read_version = None
 
     @staticmethod
     def to_database(params):
@@ -119,16 +125,131 @@ class SQLiteConnection(Connection):
             else:
                 yield param
 
-    def commit(self):
-        self._ensure_connected()
+    def _execute_bulk_insert(self, insert):
+        """Insert the rows of a bulk insert, filling its primary variables.
+
+        With SQLite 3.35+, each row is inserted with a RETURNING clause,
+        rather than being selected again for its primary key.  Rows are
+        still inserted one at a time, since SQLite documents the order
+        of the rows returned for a multi-row insert as arbitrary, while
+        PostgreSQL connections rely on rows being returned in order.
+        """
+        if sqlite.sqlite_version_info < (3, 35, 0):
+            return Connection._execute_bulk_insert(self, insert)
+        columns = tuple(insert.map)
+        for row, primary_variables in zip(insert.values,
+                                          insert.primary_variables):
+            row_insert = Insert(dict(zip(columns, row)), insert.table,
+                                insert.default_table, insert.primary_columns)
+            result = self.execute(Returning(row_insert))
+            for variable, value in zip(primary_variables, result.get_one()):
+                result.set_variable(variable, value)
+
+    def _raw_commit(self):
         # See story at the end to understand why we do COMMIT manually.
         if self._in_transaction:
             self.raw_execute("COMMIT", _end=True)
+        self._end_transaction()
 
     def rollback(self):
-        # See story at the end to understand why we do ROLLBACK manually.
-        if self._in_transaction:
-            self.raw_execute("ROLLBACK", _end=True)
+        self._pipeline = []
+        try:
+            # See story at the end to understand why we do ROLLBACK
+            # manually.
+            if self._in_transaction:
+                self.raw_execute("ROLLBACK", _end=True)
+        finally:
+            self._end_transaction()
+        self._release_raw_connection()
+
+    def close(self):
+        if not self._closed:
+            self._end_transaction()
+        Connection.close(self)
+
+    def build_raw_cursor(self):
+        if self._use_reader:
+            return self._reader.cursor()
+        return Connection.build_raw_cursor(self)
+
+    def _begin(self):
+        """Begin a transaction in the raw connection.
+
+        With readers, writers take turns for their transactions, rather
+        than retrying statements while the database is locked.
+        """
+        readers = self._database._readers
+        if readers is None:
+            # See story at the end to understand why we do BEGIN manually.
+            self._raw_connection.execute("BEGIN")
+        else:
+            self._database._acquire_writer()
+            try:
+                self._raw_connection.execute("BEGIN IMMEDIATE")
+                if (self._reader is not None and
+                    self._get_data_version() != self._read_version):
+                    # Queries of the transaction were made on a snapshot
+                    # which is now stale, so writing could lose the
+                    # changes committed meanwhile.  SQLite fails the same
+                    # way when a read transaction can't start writing.
+                    self._raw_connection.execute("ROLLBACK")
+                    raise sqlite.OperationalError("database is locked")
+            except:
+                self._database._release_writer()
+                raise
+            self._writing = True
+        self._in_transaction = True
+
+    def _get_data_version(self):
+        """Return a number changing when other connections commit."""
+        row = self._raw_connection.execute("PRAGMA data_version").fetchone()
+        return row and row[0]
+
+    def _end_transaction(self):
+        """Give back the reader and the turn to write, if taken."""
+        if self._reader is not None:
+            reader = self._reader
+            self._reader = None
+            self._read_version = None
+            try:
+                reader.execute("ROLLBACK")
+            except Error:
+                self._database._readers.discard(reader)
+            else:
+                self._database._readers.checkin(reader)
+        if self._writing:
+            self._writing = False
+            self._database._release_writer()
+
+    def _raw_execute_read(self, statement, params):
+        """Execute a query with a reader, in a transaction of its own.
+
+        The reader is kept until the transaction ends, so that queries
+        see the same snapshot of the database.  The data version seen by
+        the writer is taken first, so that writing later in the
+        transaction fails if other connections committed meanwhile.
+        """
+        if self._reader is None:
+            self._read_version = self._get_data_version()
+            reader = self._database._readers.checkout()
+            try:
+                reader.execute("BEGIN")
+            except:
+                self._database._readers.discard(reader)
+                raise
+            self._reader = reader
+        self._use_reader = True
+        try:
+            return Connection.raw_execute(self, statement, params)
+        finally:
+            self._use_reader = False
+
+    def raw_execute_many(self, statement, params_list):
+        """Like L{Connection.raw_execute_many}, in the current transaction.
+        """
+        if not self._in_transaction:
+            self._begin()
+        return Connection.raw_execute_many(self, statement, params_list)
 
     def raw_execute(self, statement, params=None, _end=False):
         """Execute a raw statement with the given parameters.
@@ -140,10 +261,11 @@ class SQLiteConnection(Connection):
         """
         if _end:
             self._in_transaction = False
+        elif (self._database._readers is not None and
+              not self._in_transaction and is_read_statement(statement)):
+            return self._raw_execute_read(statement, params)
         elif not self._in_transaction:
-            # See story at the end to understand why we do BEGIN manually.
-            self._in_transaction = True
-            self._raw_connection.execute("BEGIN")
+            self._begin()
 
         # Remember the time at which we started the operation.  If pysqlite
         # handles the timeout correctly, we won't retry the operation, because
@@ -169,25 +291,140 @@ class SQLiteConnection(Connection):
 
 
 class SQLite(Database):
+    """A SQLite database.
+
+    Besides C{timeout}, in seconds, URIs may have options setting the
+    following pragmas on every connection, in this order:
+
+     - C{page_size}: The page size of a new database, in bytes.
+     - C{journal_mode}: One of C{DELETE}, C{TRUNCATE}, C{PERSIST},
+       C{MEMORY}, C{WAL} or C{OFF}.  C{WAL} lets readers go on while a
+       transaction writes, and makes commits cheaper.
+     - C{synchronous}: One of C{OFF}, C{NORMAL}, C{FULL} or C{EXTRA}.
+     - C{cache_size}: The number of pages cached, or if negative, the
+       size of the cache in KiB.
+     - C{mmap_size}: The number of bytes of the database read through
+       memory mapping.
+     - C{temp_store}: One of C{DEFAULT}, C{FILE} or C{MEMORY}.
+     - C{busy_timeout}: The time to wait for locks, in milliseconds.
+       It replaces C{timeout} when that isn't given.
+
+    With a C{readers} option, queries made outside of write transactions
+    are executed by a pool of at most that many read-only connections,
+    shared by all connections of the database, which are then only used
+    to write.  Writers take turns, waiting up to C{timeout} for the
+    transaction of the previous one to end.  This is meant to be used
+    with C{journal_mode=WAL}, so that threads may read concurrently, and
+    while a transaction writes.  As with a single connection in WAL
+    mode, a transaction which reads and then writes fails with
+    C{OperationalError} if other connections committed changes since
+    its first query, rather than writing over them.  It should be rolled
+    back and retried.
+
+    For instance::
+
+        sqlite:/var/lib/app.db?journal_mode=WAL&synchronous=NORMAL
+    """
 
     connection_factory = SQLiteConnection
 
+    _pragma_values = {
+        "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL",
+                         "OFF"),
+        "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA", "0", "1", "2",
+                        "3"),
+        "temp_store": ("DEFAULT", "FILE", "MEMORY", "0", "1", "2"),
+        }
+    _pragma_order = ["page_size", "journal_mode", "synchronous", "cache_size",
+                     "mmap_size", "temp_store", "busy_timeout"]
+
     def __init__(self, uri):
         if sqlite is dummy:
             raise DatabaseModuleError("'pysqlite2' module not found")
         self._filename = uri.database or ":memory:"
-        self._timeout = float(uri.options.get("timeout", 5))
-        self._synchronous = uri.options.get("synchronous")
-
-    def raw_connect(self):
+        self._pragmas = []
+        for name in self._pragma_order:
+            value = uri.options.get(name)
+            if value is not None:
+                self._pragmas.append((name, self._get_pragma_value(name,
+                                                                   value)))
+        if "timeout" not in uri.options and "busy_timeout" in uri.options:
+            self._timeout = int(uri.options["busy_timeout"]) / 1000.0
+        else:
+            self._timeout = float(uri.options.get("timeout", 5))
+        self._readers = None
+        if "readers" in uri.options:
+            if self._filename == ":memory:":
+                raise ValueError("Readers can't share in-memory databases")
+            self._readers = SQLiteReaderPool(
+                self, max_size=int(uri.options["readers"]), check=False,
+                timeout=self._timeout)
+            self._writer_condition = threading.Condition()
+            self._writer_busy = False
+
+    def _get_pragma_value(self, name, value):
+        """Check the value of a pragma given as a URI option."""
+        if name not in self._pragma_values:
+            try:
+                return int(value)
+            except ValueError:
+                raise ValueError("Invalid %s: %r" % (name, value))
+        if value.upper() not in self._pragma_values[name]:
+            raise ValueError("Invalid %s: %r" % (name, value))
+        return value
+
+    def raw_connect(self, **kwargs):
         # See the story at the end to understand why we set isolation_level.
         raw_connection = sqlite.connect(self._filename, timeout=self._timeout,
-                                        isolation_level=None)
-        if self._synchronous is not None:
-            raw_connection.execute("PRAGMA synchronous = %s" %
-                                   (self._synchronous,))
+                                        isolation_level=None, **kwargs)
+        for name, value in self._pragmas:
+            raw_connection.execute("PRAGMA %s = %s" % (name, value))
         return raw_connection
 
+    def raw_connect_pooled(self):
+        """Open a raw connection usable by any thread, for a pool.
+
+        Pooled raw connections are given to connections of any thread,
+        one at a time, so they aren't tied to the thread opening them.
+        """
+        return self.raw_connect(check_same_thread=False)
+
+    def raw_connect_reader(self):
+        """Open a read-only raw connection for the pool of readers."""
+        raw_connection = self.raw_connect_pooled()
+        raw_connection.execute("PRAGMA query_only = ON")
+        return raw_connection
+
+    def _acquire_writer(self):
+        """Wait for the turn to write, for up to C{timeout} seconds."""
+        deadline = now() + self._timeout
+        self._writer_condition.acquire()
+        try:
+            while self._writer_busy:
+                remaining = deadline - now()
+                if remaining <= 0:
+                    raise sqlite.OperationalError("database is locked")
+                self._writer_condition.wait(remaining)
+            self._writer_busy = True
+        finally:
+            self._writer_condition.release()
+
+    def _release_writer(self):
+        """Give the turn to write to the next writer."""
+        self._writer_condition.acquire()
+        try:
+            self._writer_busy = False
+            self._writer_condition.notify()
+        finally:
+            self._writer_condition.release()
+
+
+class SQLiteReaderPool(ConnectionPool):
+    """A pool of read-only connections to a SQLite database."""
+
+    def _raw_connect(self):
+        return self._database.raw_connect_reader()
+
 
 create_from_uri = SQLite
 
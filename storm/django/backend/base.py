@@ -18,7 +18,10 @@ class StormDatabaseWrapperMixin(object):
     def _get_connection(self):
         if self._store is None:
             self._store = get_store(settings.DATABASE_NAME)
-        return self._store._connection._raw_connection
+        connection = self._store._connection
+        # The raw connection is only opened once needed.
+        connection._ensure_connected()
+        return connection._raw_connection
 
     def _set_connection(self, connection):
         # Ignore attempts to set the connection.
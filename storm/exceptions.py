@@ -81,6 +81,9 @@ class UnorderedError(StoreError):
 class LostObjectError(StoreError):
     pass
 
+class ReadOnlyObjectError(StoreError):
+    pass
+
 
 class Error(StormError):
     pass
@@ -136,6 +139,10 @@ class ConnectionBlockedError(StormError):
     """Raised when an attempt is made to use a blocked connection."""
 
 
+class PoolTimeoutError(StormError):
+    """Raised when no raw connection of a pool is available in time."""
+
+
 def install_exceptions(module):
     for exception in (Error, Warning, DatabaseError, InternalError,
                       OperationalError, ProgrammingError, IntegrityError,
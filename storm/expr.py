@@ -697,7 +697,8 @@ def compile_select(compile, select, state):
 class Insert(Expr):
     """Expression representing an insert statement.
 
-    @ivar map: Dictionary mapping columns to values.
+    @ivar map: Dictionary mapping columns to values, or a sequence of
+        columns for a bulk insert.
     @ivar table: Table where the row should be inserted.
     @ivar default_table: Table to use if no table is explicitly provided, and
         no tables may be inferred from provided columns.
@@ -706,18 +707,24 @@ class Insert(Expr):
         to process the insertion of rows.
     @ivar primary_variables: Tuple of variables with values for the primary
         key of the table where the row will be inserted.  This is a hint used
-        by backends to process the insertion of rows.
+        by backends to process the insertion of rows.  For bulk inserts,
+        a sequence of such tuples, one for each row, which backends fill
+        with the primary key of the inserted rows.
+    @ivar values: Sequence of tuples of values, one for each row, for a
+        bulk insert of the columns in C{map}.
     """
     __slots__ = ("map", "table", "default_table", "primary_columns",
-                 "primary_variables")
+                 "primary_variables", "values")
 
     def __init__(self, map, table=Undef, default_table=Undef,
-                 primary_columns=Undef, primary_variables=Undef):
+                 primary_columns=Undef, primary_variables=Undef,
+                 values=Undef):
         self.map = map
         self.table = table
         self.default_table = default_table
         self.primary_columns = primary_columns
         self.primary_variables = primary_variables
+        self.values = values
 
 @compile.when(Insert)
 def compile_insert(compile, insert, state):
@@ -726,12 +733,37 @@ def compile_insert(compile, insert, state):
     state.context = TABLE
     table = build_tables(compile, insert.table, insert.default_table, state)
     state.context = EXPR
-    values = compile(tuple(insert.map.itervalues()), state)
+    if insert.values is Undef:
+        values = compile(tuple(insert.map.itervalues()), state)
+    else:
+        values = "), (".join(compile(tuple(row), state)
+                             for row in insert.values)
     state.pop()
     return "".join(["INSERT INTO ", table, " (", columns,
                     ") VALUES (", values, ")"])
 
 
+class Returning(Expr):
+    """Appends the "RETURNING <primary_columns>" suffix to an INSERT.
+
+    This is only supported by some backends, such as PostgreSQL 8.2+
+    and SQLite 3.35+.
+    """
+
+    def __init__(self, insert):
+        self.insert = insert
+
+@compile.when(Returning)
+def compile_returning(compile, expr, state):
+    state.push("context", COLUMN)
+    columns = compile(expr.insert.primary_columns, state)
+    state.pop()
+    state.push("precedence", 0)
+    insert = compile(expr.insert, state)
+    state.pop()
+    return "%s RETURNING %s" % (insert, columns)
+
+
 class Update(Expr):
     __slots__ = ("map", "where", "table", "default_table")
 
@@ -24,11 +24,12 @@ from storm.exceptions import ClassInfoError
 from storm.expr import Expr, FromExpr, Column, Desc, TABLE
 from storm.expr import SQLToken, CompileError, compile
 from storm.event import EventSystem
+from storm.variables import LazyValue, MutableValueVariable
 from storm import Undef, has_cextensions
 
 
 __all__ = ["get_obj_info", "set_obj_info", "get_cls_info",
-           "ClassInfo", "ObjectInfo", "ClassAlias"]
+           "ClassInfo", "ObjectInfo", "CompactVariables", "ClassAlias", "Row"]
 
 
 def get_obj_info(obj):
@@ -61,6 +62,20 @@ class ClassInfo(dict):
     @ivar columns: Tuple of column properties found in the class.
     @ivar primary_key: Tuple of column properties used to form the primary key
     @ivar primary_key_pos: Position of primary_key items in the columns tuple.
+    @ivar column_idx: Position of columns in the columns tuple, keyed by
+        the id() of the column.
+    @ivar compact: True if the class has a true C{__storm_compact__}
+        attribute, in which case its objects keep the values of their
+        columns in L{CompactVariables}.
+    @ivar converters: For compact classes, variables converting the
+        values kept by L{CompactVariables}, one per column, or None for
+        columns with mutable values, which always need a variable of
+        their own.  None for other classes.
+    @ivar event: Event system shared by all objects of the class.  Events
+        emitted by an object are emitted here too, with the L{ObjectInfo}
+        of the object as the first argument.
+    @ivar row_class: L{Row} subclass with one slot per column, used to
+        represent rows of the class without building objects.
     """
 
     def __init__(self, cls):
@@ -69,6 +84,7 @@ class ClassInfo(dict):
             raise ClassInfoError("%s.__storm_table__ missing" % repr(cls))
 
         self.cls = cls
+        self.event = EventSystem(self)
 
         if isinstance(self.table, basestring):
             self.table = SQLToken(self.table)
@@ -120,6 +136,19 @@ class ClassInfo(dict):
                                     enumerate(self.primary_key))
         self.primary_key_pos = tuple(id_positions[id(column)]
                                      for column in self.primary_key)
+        self.column_idx = id_positions
+
+        self.compact = bool(getattr(cls, "__storm_compact__", False))
+        if self.compact:
+            converters = []
+            for column in self.columns:
+                converter = column.variable_factory(column=column)
+                if isinstance(converter, MutableValueVariable):
+                    converter = None
+                converters.append(converter)
+            self.converters = tuple(converters)
+        else:
+            self.converters = None
 
 
         __order__ = getattr(cls, "__storm_order__", None)
@@ -139,6 +168,15 @@ class ClassInfo(dict):
                     prop = item
                 self.default_order.append(prop)
 
+    @property
+    def row_class(self):
+        row_class = self.__dict__.get("_row_class")
+        if row_class is None:
+            row_class = type(self.cls.__name__ + "Row", (Row,),
+                             {"__slots__": tuple(sorted(self.attributes))})
+            self._row_class = row_class
+        return row_class
+
     def __eq__(self, other):
         return self is other
 
@@ -146,6 +184,37 @@ class ClassInfo(dict):
         return self is not other
 
 
+class Row(object):
+    """Lightweight record holding the column values of a row.
+
+    Subclasses are built by L{ClassInfo.row_class}, with one slot per
+    column attribute of the class, in the order of L{ClassInfo.columns}.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for attr, value in zip(self.__slots__, values):
+            setattr(self, attr, value)
+
+    def __iter__(self):
+        return (getattr(self, attr) for attr in self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__,
+                           ", ".join("%s=%r" % (attr, getattr(self, attr))
+                                     for attr in self.__slots__))
+
+
 class ObjectInfo(dict):
 
     __hash__ = object.__hash__
@@ -153,6 +222,8 @@ class ObjectInfo(dict):
     # For get_obj_info(), an ObjectInfo is its own obj_info.
     __storm_object_info__ = property(lambda self:self)
 
+    _event = None
+
     def __init__(self, obj):
         # FASTPATH This method is part of the fast path.  Be careful when
         #          changing it (try to profile any changes).
@@ -163,14 +234,17 @@ class ObjectInfo(dict):
 
         self.set_obj(obj)
 
-        self.event = event = EventSystem(self)
-        self.variables = variables = {}
-
-        for column in self.cls_info.columns:
-            variables[column] = \
-                column.variable_factory(column=column,
-                                        event=event,
-                                        validator_object_factory=self.get_obj)
+        if self.cls_info.compact:
+            self.variables = variables = CompactVariables(self)
+        else:
+            # Variables emit their events through the object info, so that
+            # an event system is only created for objects hooked directly.
+            self.variables = variables = {}
+
+            for column in self.cls_info.columns:
+                variables[column] = column.variable_factory(
+                    column=column, event=self,
+                    validator_object_factory=self.get_obj)
  
         self.primary_vars = tuple(variables[column]
                                   for column in self.cls_info.primary_key)
@@ -187,14 +261,147 @@ class ObjectInfo(dict):
     def get_obj(self):
         return self._ref()
 
+    @property
+    def event(self):
+        """Event system with the callbacks hooked into this object only.
+
+        It's created when first used.
+        """
+        if self._event is None:
+            self._event = EventSystem(self)
+        return self._event
+
+    def hook(self, name, callback, *data):
+        self.event.hook(name, callback, *data)
+
+    def unhook(self, name, callback, *data):
+        if self._event is not None:
+            self._event.unhook(name, callback, *data)
+
+    def emit(self, name, *args):
+        """Emit an event for this object.
+
+        Callbacks hooked into the L{ClassInfo} event system are called
+        with this object info as the first argument, and then callbacks
+        hooked into this object, if any.
+        """
+        self.cls_info.event.emit(name, self, *args)
+        if self._event is not None:
+            self._event.emit(name, *args)
+
     def _emit_object_deleted(self, obj_ref):
-        self.event.emit("object-deleted")
+        self.emit("object-deleted")
 
     def checkpoint(self):
         for variable in self.variables.itervalues():
             variable.checkpoint()
 
 
+class CompactVariables(dict):
+    """Variables of an object whose class has C{__storm_compact__} set.
+
+    Values loaded from the database are kept in a list ordered like the
+    columns of the class, rather than in a variable per column.  A
+    variable is built when a column is looked up, as when a property is
+    set, and replaces the value from then on.  Properties read values
+    which have no variable with L{get_value}.
+
+    Values are kept as set by L{set_state}: the internal value of a
+    variable, a lazy value, or Undef for columns which were never set,
+    whose variables must be built with their default values.
+    """
+
+    __slots__ = ("_obj_info", "_states")
+
+    def __init__(self, obj_info):
+        self._obj_info = obj_info
+        self._states = None
+
+    def __missing__(self, column):
+        obj_info = self._obj_info
+        variable = column.variable_factory(
+            column=column, event=obj_info,
+            validator_object_factory=obj_info.get_obj)
+        state = self.get_state(column)
+        if state is not Undef:
+            if isinstance(state, LazyValue):
+                variable.set_state((state, Undef))
+            else:
+                variable.set_state((Undef, state))
+            variable.checkpoint()
+        self[column] = variable
+        return variable
+
+    def _get_position(self, column):
+        position = self._obj_info.cls_info.column_idx.get(id(column))
+        if position is None:
+            raise KeyError(column)
+        return position
+
+    def get_state(self, column):
+        """Return the value kept for a column without a variable."""
+        if self._states is None:
+            self._get_position(column)
+            return Undef
+        return self._states[self._get_position(column)]
+
+    def set_state(self, column, state):
+        """Keep the value of a column without building a variable.
+
+        @param state: The internal value of a variable of the column,
+            as converted by the converters of L{ClassInfo}, or a lazy
+            value.
+        """
+        position = self._get_position(column)
+        if self._states is None:
+            self._states = [Undef] * len(self._obj_info.cls_info.columns)
+        self._states[position] = state
+
+    def get_value(self, column):
+        """Return the value of a column, as its variable would.
+
+        No variable is built for values which were loaded, unless the
+        column has mutable values.  Lazy values are resolved by a
+        variable first.
+        """
+        # FASTPATH This method is part of the fast path of properties.
+        states = self._states
+        if states is not None:
+            cls_info = self._obj_info.cls_info
+            position = cls_info.column_idx.get(id(column))
+            if position is not None:
+                converter = cls_info.converters[position]
+                state = states[position]
+                if converter is not None and state is not Undef:
+                    if state is None:
+                        return None
+                    if isinstance(state, LazyValue):
+                        return self._resolve_lazy_value(column, state)
+                    return converter.parse_get(state, False)
+        return self[column].get()
+
+    def _resolve_lazy_value(self, column, state):
+        """Return the value of a column set to a lazy value.
+
+        The store may resolve the value without building a variable
+        for the column.  Otherwise, the variable which was used to
+        resolve it is kept.
+        """
+        obj_info = self._obj_info
+        variable = column.variable_factory(
+            column=column, event=obj_info,
+            validator_object_factory=obj_info.get_obj)
+        variable.set_state((state, Undef))
+        variable.checkpoint()
+        value = variable.get()
+        if column in self:
+            return self[column].get()
+        if self.get_state(column) is not state:
+            return self.get_value(column)
+        self[column] = variable
+        return value
+
+
 if has_cextensions:
     from storm.cextensions import ObjectInfo, get_obj_info
 
@@ -0,0 +1,232 @@
+"""Running the same query in several stores at once.
+
+Dashboards and reports often need the same query run against many
+databases, like every store of L{ZStorm.iterstores}, and running them one
+after the other adds up their latencies.  L{ParallelStores} run them
+concurrently instead::
+
+    stores = ParallelStores([store for name, store in zstorm.iterstores()])
+    result = stores.find(Order, Order.status == u"open")
+    total = result.sum(Order.amount)
+    latest = list(result.order_by(Desc(Order.created))[:10])
+
+Each store is only ever used by a single worker thread, so it must not
+be used by other threads meanwhile.
+"""
+
+from Queue import Queue
+import threading
+
+from storm.asynchronous import Future, run_calls
+from storm.exceptions import FeatureError
+from storm.sharding import merge_results
+
+
+__all__ = ["ParallelStores", "ParallelResultSet"]
+
+
+class ParallelStores(object):
+    """Stores whose queries run concurrently, in a pool of threads.
+
+    Each store is bound to one worker thread of the pool, which runs all
+    the calls made with it, one at a time.  Stores may thus be used by
+    several queries in turn, even with databases whose connections may
+    only be used by the thread which opened them.
+
+    @ivar stores: The list of L{Store}s.
+    """
+
+    def __init__(self, stores, max_workers=None):
+        """
+        @param stores: A sequence of L{Store}s.  They should not have
+            been used yet, or be used by any other thread afterwards.
+        @param max_workers: The maximum number of threads to use, by
+            default one for each store.
+        """
+        self.stores = list(stores)
+        if max_workers is None or max_workers > len(self.stores):
+            max_workers = len(self.stores)
+        self._queues = []
+        self._threads = []
+        for i in range(max_workers):
+            queue = Queue()
+            thread = threading.Thread(target=run_calls, args=(queue,),
+                                      name="ParallelStores")
+            thread.setDaemon(True)
+            thread.start()
+            self._queues.append(queue)
+            self._threads.append(thread)
+
+    def run(self, function):
+        """Call C{function} with each store, in the thread of each store.
+
+        @return: A list with the results of C{function} for each store, in
+            the order of L{stores}.
+        @raise: The exception raised by C{function} for the first store
+            that failed, if any, once all calls have finished.
+        """
+        futures = []
+        for i, store in enumerate(self.stores):
+            future = Future()
+            self._queues[i % len(self._queues)].put(
+                (future, function, (store,), {}))
+            futures.append(future)
+        for future in futures:
+            future.exception()
+        return [future.result() for future in futures]
+
+    def find(self, cls_spec, *args, **kwargs):
+        """Find objects in every store, as L{Store.find} does.
+
+        @return: A L{ParallelResultSet}.
+        """
+        return ParallelResultSet(self, cls_spec, *args, **kwargs)
+
+    def commit(self):
+        """Commit the transactions of all stores."""
+        self.run(lambda store: store.commit())
+
+    def rollback(self):
+        """Roll back the transactions of all stores."""
+        self.run(lambda store: store.rollback())
+
+    def close(self):
+        """Close all stores, and stop the threads of the pool."""
+        self.run(lambda store: store.close())
+        for queue in self._queues:
+            queue.put(None)
+
+
+class ParallelResultSet(object):
+    """The results of a find run in several stores concurrently.
+
+    The find is run in every store of a L{ParallelStores} whenever
+    results are needed.  Results are merged store after
+    store, or by their order when L{order_by} is used, which supports
+    ordering by columns of the find spec.  See L{merge_results} for how
+    that order may differ from the one of the database.
+    """
+
+    def __init__(self, parallel_stores, cls_spec, *args, **kwargs):
+        """
+        @param parallel_stores: The L{ParallelStores} to run the find in.
+        @param cls_spec: The find spec, as given to L{Store.find}.
+        """
+        self._parallel_stores = parallel_stores
+        self._cls_spec = cls_spec
+        self._args = args
+        self._kwargs = kwargs
+        if type(cls_spec) is tuple:
+            self._spec = cls_spec
+        else:
+            self._spec = (cls_spec,)
+        self._config = {}
+        self._order_by = ()
+        self._limit = None
+
+    def _copy(self):
+        result = self.__class__(self._parallel_stores, self._cls_spec,
+                                *self._args, **self._kwargs)
+        result._config = self._config.copy()
+        result._order_by = self._order_by
+        result._limit = self._limit
+        return result
+
+    def _run(self, function):
+        """Call C{function} with the result set of every store."""
+        def run(store):
+            result_set = store.find(self._cls_spec, *self._args,
+                                    **self._kwargs)
+            if self._config:
+                result_set.config(**self._config)
+            if self._order_by:
+                result_set.order_by(*self._order_by)
+            if self._limit is not None:
+                result_set = result_set[:self._limit]
+            return function(result_set)
+        return self._parallel_stores.run(run)
+
+    def config(self, **kwargs):
+        """Configure the find in every store, as L{ResultSet.config} does.
+        """
+        self._config.update(kwargs)
+        return self
+
+    def order_by(self, *args):
+        """Order results in every store, and merge them by that order."""
+        self._order_by = args
+        return self
+
+    def __getitem__(self, index):
+        """Limit the results to a slice starting at 0.
+
+        Each store returns at most as many results, and the merged
+        results are cut down to that number as well.
+        """
+        if (not isinstance(index, slice) or index.start not in (None, 0) or
+            index.step is not None or index.stop is None):
+            raise FeatureError("Only slices of the first results are "
+                               "supported by parallel result sets")
+        result = self._copy()
+        if result._limit is None or index.stop < result._limit:
+            result._limit = index.stop
+        return result
+
+    def __iter__(self):
+        return merge_results(self._run(list), self._spec, self._order_by,
+                             self._limit)
+
+    def all(self):
+        """Return a list with the merged results of all stores."""
+        return list(self)
+
+    def is_empty(self):
+        """Return whether no store has any result."""
+        return all(self._run(lambda result_set: result_set.is_empty()))
+
+    def count(self, expr=None, distinct=False):
+        """Return the number of results in all stores.
+
+        Each store counts its results in the database, even if they're
+        sliced.
+
+        @raise FeatureError: Raised for distinct counts, which can't be
+            added up across stores, and for counts of C{expr} in sliced
+            results, which depend on the results merged.
+        """
+        if distinct:
+            raise FeatureError("Distinct counts across stores aren't "
+                               "supported")
+        if expr is None:
+            counts = self._run(lambda result_set: result_set.count())
+        elif self._limit is not None:
+            raise FeatureError("Can't count expressions in sliced results "
+                               "across stores")
+        else:
+            counts = self._run(lambda result_set: result_set.count(expr))
+        if self._limit is not None:
+            return min(sum(counts), self._limit)
+        return sum(counts)
+
+    def _aggregate(self, method, expr, combine):
+        if self._limit is not None:
+            raise FeatureError("Can't aggregate sliced results across "
+                               "stores")
+        values = self._run(
+            lambda result_set: getattr(result_set, method)(expr))
+        values = [value for value in values if value is not None]
+        if not values:
+            return None
+        return combine(values)
+
+    def sum(self, expr):
+        """Return the sum of C{expr} over all stores."""
+        return self._aggregate("sum", expr, sum)
+
+    def max(self, expr):
+        """Return the largest value of C{expr} over all stores."""
+        return self._aggregate("max", expr, max)
+
+    def min(self, expr):
+        """Return the smallest value of C{expr} over all stores."""
+        return self._aggregate("min", expr, min)
@@ -22,7 +22,7 @@ from bisect import insort_left, bisect_left
 import weakref
 import sys
 
-from storm.exceptions import PropertyPathError
+from storm.exceptions import PropertyPathError, ReadOnlyObjectError
 from storm.info import get_obj_info, get_cls_info
 from storm.expr import Column, Undef
 from storm.variables import (
@@ -57,10 +57,17 @@ class Property(object):
             # (might be proxied or whatever).
             cls = obj_info.cls_info.cls
         column = self._get_column(cls)
-        return obj_info.variables[column].get()
+        variables = obj_info.variables
+        variable = variables.get(column)
+        if variable is None:
+            # A value of a compact object without a variable.
+            return variables.get_value(column)
+        return variable.get()
 
     def __set__(self, obj, value):
         obj_info = get_obj_info(obj)
+        if "readonly" in obj_info:
+            raise ReadOnlyObjectError("%s is read-only" % repr(obj))
         # Don't get obj.__class__ because we don't trust it
         # (might be proxied or whatever).
         column = self._get_column(obj_info.cls_info.cls)
@@ -68,6 +75,8 @@ class Property(object):
 
     def __delete__(self, obj):
         obj_info = get_obj_info(obj)
+        if "readonly" in obj_info:
+            raise ReadOnlyObjectError("%s is read-only" % repr(obj))
         # Don't get obj.__class__ because we don't trust it
         # (might be proxied or whatever).
         column = self._get_column(obj_info.cls_info.cls)
@@ -21,7 +21,8 @@
 import weakref
 
 from storm.exceptions import (
-    ClassInfoError, FeatureError, NoStoreError, WrongStoreError)
+    ClassInfoError, FeatureError, NoStoreError, ReadOnlyObjectError,
+    WrongStoreError)
 from storm.store import Store, get_where_for_args, LostObjectError
 from storm.variables import LazyValue
 from storm.expr import (
@@ -33,6 +34,12 @@ from storm.info import get_cls_info, get_obj_info
 __all__ = ["Reference", "ReferenceSet", "Proxy"]
 
 
+def _check_writable(obj_info):
+    """Raise L{ReadOnlyObjectError} if obj_info is of a read-only object."""
+    if "readonly" in obj_info:
+        raise ReadOnlyObjectError("%s is read-only" % repr(obj_info.get_obj()))
+
+
 class LazyAttribute(object):
     """
     This descriptor will call the named attribute builder to
@@ -152,6 +159,9 @@ class Reference(object):
         if store is None:
             return None
 
+        if store._load_batch_reference(self._relation, get_obj_info(local)):
+            return self._relation.get_remote(local)
+
         if self._relation.remote_key_is_primary:
             remote = store.get(self._relation.remote_cls,
                                self._relation.get_local_variables(local))
@@ -379,6 +389,7 @@ class BoundIndirectReferenceSet(BoundReferenceSetBase):
         store = Store.of(self._local)
         if store is None:
             raise NoStoreError("Can't perform operation without a store")
+        _check_writable(get_obj_info(self._local))
         # Don't use remote here, as it might be security proxied or something.
         remote = get_obj_info(remote).get_obj()
         where = (self._relation1.get_where_for_remote(self._local) &
@@ -566,8 +577,13 @@ class Relation(object):
             or the actual value to be set as the local key.
 
         @param setting: Pass true when the relationship is being newly created.
+
+        @raise ReadOnlyObjectError: Raised if C{setting} is true and one
+            of the objects is read-only.
         """
         local_info = get_obj_info(local)
+        if setting:
+            _check_writable(local_info)
 
         try:
             remote_info = get_obj_info(remote)
@@ -581,6 +597,8 @@ class Relation(object):
             for variable, value in zip(local_variables, remote):
                 variable.set(value)
             return
+        if setting:
+            _check_writable(remote_info)
 
         local_store = Store.of(local)
         remote_store = Store.of(remote)
@@ -682,7 +700,14 @@ class Relation(object):
         """Break the relation between the local and remote objects.
 
         @param setting: If true objects will be changed to persist breakage.
+
+        @raise ReadOnlyObjectError: Raised if C{setting} is true and one
+            of the objects is read-only.
         """
+        if setting:
+            _check_writable(local_info)
+            if remote_info is not None:
+                _check_writable(remote_info)
         unhook = False
         relation_data = local_info.get(self)
         if relation_data is not None:
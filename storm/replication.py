@@ -0,0 +1,191 @@
+"""Routing the statements of stores to a primary database or its replicas.
+
+A L{ReplicatedDatabase} is used as any other database, but its
+connections send queries to a replica of the primary database, and
+everything else, like the statements of flushes, to the primary.
+"""
+
+from itertools import cycle
+
+from storm.database import (
+    Database, Connection, create_database, is_read_statement)
+from storm.uri import URI
+
+
+__all__ = ["ReplicatedDatabase", "ReplicatedConnection", "use_primary"]
+
+
+class ReplicatedConnection(Connection):
+    """A connection to a primary database and one of its replicas.
+
+    Queries are executed by the replica, until any other statement is
+    executed by the primary, or a store flushes an object.  Then,
+    queries are executed by the primary as well until the transaction
+    ends, so that changes made in the transaction are seen.  Only
+    queries built with expressions, like the ones of L{Store.find} and
+    L{Store.get}, are assumed to be reads.  Raw statements given to
+    L{Store.execute} are executed by the primary, unless C{raw_reads}
+    is true, in which case raw SELECTs go to the replica as well.
+    Compiled queries with side effects, like ones calling functions
+    which change the database, should be preceded by L{prepare_write},
+    or the store should use the primary with L{use_primary}.
+
+    @ivar primary_only: If true, all statements are executed by the
+        primary.  See L{use_primary}.
+    @ivar raw_reads: If true, raw SELECT statements which don't lock
+        rows are executed by the replica.  Defaults to the C{raw_reads}
+        of the database.
+    """
+
+    def __init__(self, database, event=None):
+        Connection.__init__(self, database, event)
+        self._primary = database.primary.connect(event)
+        replica = database.get_replica()
+        if replica is None:
+            self._replica = self._primary
+        else:
+            self._replica = replica.connect(event)
+        self._sticky = False
+        self.primary_only = False
+        self.raw_reads = database.raw_reads
+        self.compile = self._primary.compile
+
+    def _get_connection(self, statement):
+        """Return the connection which should execute C{statement}."""
+        if self._sticky or self.primary_only:
+            return self._primary
+        if is_read_statement(statement, self.raw_reads):
+            return self._replica
+        self._sticky = True
+        return self._primary
+
+    def _get_connections(self):
+        if self._replica is self._primary:
+            return [self._primary]
+        return [self._primary, self._replica]
+
+    def execute(self, statement, params=None, noresult=False):
+        """Execute a statement in the primary database or a replica.
+
+        See L{Connection.execute}.
+        """
+        return self._get_connection(statement).execute(statement, params,
+                                                       noresult)
+
+    def execute_many(self, statement, seq_of_params):
+        """Execute a statement many times in the primary database.
+
+        See L{Connection.execute_many}.
+        """
+        self._sticky = True
+        self._primary.execute_many(statement, seq_of_params)
+
+    def copy_in(self, table, columns, rows):
+        """Load rows into a table of the primary database.
+
+        See L{Connection.copy_in}.
+        """
+        self._sticky = True
+        self._primary.copy_in(table, columns, rows)
+
+    def copy_out(self, statement, fileobj, format="csv", params=None):
+        """Write the rows of a query to a file.
+
+        See L{Connection.copy_out}.
+        """
+        self._get_connection(statement).copy_out(statement, fileobj,
+                                                 format, params)
+
+    def _get_pipelined(self):
+        return self._primary.pipelined
+
+    def _set_pipelined(self, pipelined):
+        self._primary.pipelined = pipelined
+
+    pipelined = property(_get_pipelined, _set_pipelined,
+                         doc="Whether the primary queues statements.")
+
+    def flush_pipeline(self):
+        self._primary.flush_pipeline()
+
+    def preset_primary_key(self, primary_columns, primary_variables):
+        self._primary.preset_primary_key(primary_columns, primary_variables)
+
+    def prepare_write(self):
+        """Execute all statements in the primary until the transaction ends.
+        """
+        self._sticky = True
+
+    def commit(self):
+        """Commit the transaction in the primary database and the replica.
+        """
+        for connection in self._get_connections():
+            connection.commit()
+        self._sticky = False
+
+    def rollback(self):
+        """Roll back the transaction in the primary database and the replica.
+        """
+        for connection in self._get_connections():
+            connection.rollback()
+        self._sticky = False
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            for connection in self._get_connections():
+                connection.close()
+
+    def block_access(self):
+        for connection in self._get_connections():
+            connection.block_access()
+
+    def unblock_access(self):
+        for connection in self._get_connections():
+            connection.unblock_access()
+
+
+class ReplicatedDatabase(Database):
+    """A primary database whose queries may be executed by replicas.
+
+    Each connection uses one of the replicas, taken in turn.
+    """
+
+    connection_factory = ReplicatedConnection
+
+    def __init__(self, primary, replicas=(), raw_reads=False):
+        """
+        @param primary: The primary database, as a L{Database} or a URI.
+        @param replicas: A sequence of replicas of the primary database,
+            as L{Database}s or URIs.  Without any, the primary database
+            executes all statements.
+        @param raw_reads: Whether raw SELECT statements given to
+            L{Store.execute} may be executed by a replica.  Only enable
+            it if they never change the database.
+        """
+        self.raw_reads = raw_reads
+        self.primary = self._get_database(primary)
+        self.replicas = [self._get_database(replica) for replica in replicas]
+        self._replicas = cycle(self.replicas)
+
+    @staticmethod
+    def _get_database(database):
+        if isinstance(database, (basestring, URI)):
+            return create_database(database)
+        return database
+
+    def get_replica(self):
+        """Return the next replica to be used, or None if there are none."""
+        if not self.replicas:
+            return None
+        return self._replicas.next()
+
+
+def use_primary(store, primary_only=True):
+    """Make a store execute all its statements in the primary database.
+
+    @param store: A L{Store} of a L{ReplicatedDatabase}.
+    @param primary_only: If false, the store goes back to executing
+        queries in its replica.
+    """
+    store._connection.primary_only = primary_only
@@ -0,0 +1,374 @@
+"""Stores for classes whose rows are split across several databases.
+
+Classes stored in shards name the attribute whose value decides the
+shard of their objects with a C{__storm_shard_key__} class attribute.
+For instance::
+
+    class Document(object):
+        __storm_table__ = "document"
+        __storm_primary__ = "tenant_id", "id"
+        __storm_shard_key__ = "tenant_id"
+        tenant_id = Int()
+        id = Int()
+
+    store = ShardedStore({"a": database_a, "b": database_b},
+                         lambda cls, tenant_id: "ab"[tenant_id % 2])
+"""
+
+import heapq
+from itertools import islice
+
+from storm.database import Database
+from storm.exceptions import FeatureError, NotOneError, UnorderedError
+from storm.expr import Eq, And, Asc, Desc, Undef
+from storm.info import get_cls_info, get_obj_info
+from storm.store import Store
+from storm.variables import Variable
+
+
+__all__ = ["ShardedStore", "ShardedResultSet", "merge_results"]
+
+
+class ShardedStore(object):
+    """A set of stores, one for each shard of the data.
+
+    Objects are added to the shard picked by the shard function for
+    their shard key, and retrieved from it when their shard key is
+    known.  Otherwise, every shard is queried.  Each shard keeps its
+    own objects, so primary keys of different shards don't collide.
+
+    @ivar stores: A dictionary mapping shard names to their L{Store}s.
+    """
+
+    def __init__(self, shards, shard_function):
+        """
+        @param shards: A dictionary mapping shard names to the L{Store}
+            or L{Database} of each shard.
+        @param shard_function: A function taking a class and a shard key
+            value, and returning the name of the shard holding it.
+        """
+        self.stores = {}
+        for name, shard in shards.iteritems():
+            if isinstance(shard, Database):
+                shard = Store(shard)
+            self.stores[name] = shard
+        self._shard_function = shard_function
+        self._touched = set()
+
+    def get_shard_key(self, cls):
+        """Return the shard key column of C{cls}.
+
+        @raise FeatureError: Raised if C{cls} has no C{__storm_shard_key__}.
+        """
+        name = getattr(cls, "__storm_shard_key__", None)
+        if name is None:
+            raise FeatureError("%s has no __storm_shard_key__" % cls.__name__)
+        return get_cls_info(cls).attributes[name]
+
+    def get_store(self, cls, value):
+        """Return the store of the shard holding C{value} for C{cls}."""
+        name = self._shard_function(cls, value)
+        self._touched.add(name)
+        return self.stores[name]
+
+    def _get_stores(self):
+        self._touched.update(self.stores)
+        return [self.stores[name] for name in sorted(self.stores)]
+
+    def get(self, cls, key):
+        """Get an object of C{cls} by its primary key.
+
+        If the shard key is part of the primary key, only its shard is
+        queried.  Otherwise, shards are queried in turn.
+        """
+        cls_info = get_cls_info(cls)
+        shard_key = self.get_shard_key(cls)
+        for i, column in enumerate(cls_info.primary_key):
+            if column is shard_key:
+                if type(key) is not tuple:
+                    key = (key,)
+                return self.get_store(cls, key[i]).get(cls, key)
+        for store in self._get_stores():
+            obj = store.get(cls, key)
+            if obj is not None:
+                return obj
+        return None
+
+    def find(self, cls_spec, *args, **kwargs):
+        """Find objects in the shard of their shard key, or in all shards.
+
+        If the shard key of the first class in C{cls_spec} is compared
+        for equality to a value, in C{kwargs} or C{args}, the shard of
+        that value is queried.  Otherwise, every shard is.
+
+        @return: A L{ResultSet} of a single shard, or a L{ShardedResultSet}.
+        """
+        if type(cls_spec) is tuple:
+            spec = cls_spec
+        else:
+            spec = (cls_spec,)
+        for item in spec:
+            cls = getattr(item, "cls", item)
+            if getattr(cls, "__storm_shard_key__", None) is not None:
+                shard_key = self.get_shard_key(cls)
+                value = _get_shard_key_value(shard_key, cls, args, kwargs)
+                if value is not Undef:
+                    store = self.get_store(cls, value)
+                    return store.find(cls_spec, *args, **kwargs)
+                break
+        return ShardedResultSet(
+            [store.find(cls_spec, *args, **kwargs)
+             for store in self._get_stores()],
+            spec)
+
+    def add(self, obj):
+        """Add an object to the store of the shard of its shard key."""
+        cls = type(obj)
+        self.get_shard_key(cls)
+        value = getattr(obj, cls.__storm_shard_key__)
+        return self.get_store(cls, value).add(obj)
+
+    def remove(self, obj):
+        """Remove an object from the store of its shard."""
+        return Store.of(obj).remove(obj)
+
+    def flush(self):
+        """Flush pending changes of all shards."""
+        for store in self._get_stores():
+            store.flush()
+
+    def commit(self):
+        """Commit the transactions of shards used since the last commit.
+
+        Shards are committed one after the other, so a failure may leave
+        some of them committed.
+        """
+        for name in sorted(self.stores):
+            store = self.stores[name]
+            if name in self._touched or store._dirty:
+                store.commit()
+        self._touched.clear()
+
+    def rollback(self):
+        """Roll back the transactions of all shards."""
+        for store in self._get_stores():
+            store.rollback()
+        self._touched.clear()
+
+    def close(self):
+        """Close the stores of all shards."""
+        for store in self.stores.itervalues():
+            store.close()
+
+
+def _get_shard_key_value(shard_key, cls, args, kwargs):
+    """Find the value a shard key is compared to by arguments of find()."""
+    name = cls.__storm_shard_key__
+    if name in kwargs:
+        return kwargs[name]
+    for arg in args:
+        value = _get_compared_value(shard_key, arg)
+        if value is not Undef:
+            return value
+    return Undef
+
+
+def _get_compared_value(column, expr):
+    if isinstance(expr, Eq) and expr.expr1 is column:
+        if isinstance(expr.expr2, Variable):
+            return expr.expr2.get()
+    elif isinstance(expr, And):
+        for subexpr in expr.exprs:
+            value = _get_compared_value(column, subexpr)
+            if value is not Undef:
+                return value
+    return Undef
+
+
+def merge_results(results, spec, order_by=(), limit=None):
+    """Merge the results of a find made in several stores.
+
+    Results ordered by C{order_by} are merged by comparing their values
+    in Python, which only matches the order of the database for values
+    compared the same way.  Python 2 sorts C{None} before other values,
+    while databases like PostgreSQL sort NULLs last, and strings are
+    compared by code point rather than by the collation of the
+    database.
+
+    @param results: Iterables with the results of each store, which are
+        already ordered by C{order_by}.
+    @param spec: The C{cls_spec} of the find, as a tuple.
+    @param order_by: The ordering of the results, if any, given as
+        columns of C{spec} or of its classes, or L{Desc} of them.
+    @param limit: The maximum number of merged results, if any.
+    @return: An iterator over the merged results.
+    @raise FeatureError: Raised if results can't be merged by C{order_by}.
+    """
+    if order_by:
+        get_sort_key = _get_sort_key_function(spec, order_by)
+        iterators = [((get_sort_key(item), i, item) for item in result)
+                     for i, result in enumerate(results)]
+        items = (item for key, i, item in heapq.merge(*iterators))
+    else:
+        items = (item for result in results for item in result)
+    if limit is not None:
+        items = islice(items, limit)
+    return items
+
+
+def _get_sort_key_function(spec, order_by):
+    getters = []
+    for expr in order_by:
+        reverse = isinstance(expr, Desc)
+        if isinstance(expr, (Asc, Desc)):
+            expr = expr.expr
+        getters.append((_get_value_getter(spec, expr), reverse))
+    single = len(spec) == 1
+    def get_sort_key(item):
+        if single:
+            item = (item,)
+        key = []
+        for getter, reverse in getters:
+            value = getter(item)
+            key.append(_Reversed(value) if reverse else value)
+        return key
+    return get_sort_key
+
+
+def _get_value_getter(spec, column):
+    for i, spec_item in enumerate(spec):
+        if spec_item is column:
+            return lambda item: item[i]
+        if isinstance(spec_item, type):
+            for spec_column in get_cls_info(spec_item).columns:
+                if spec_column is column:
+                    return lambda item: (
+                        get_obj_info(item[i]).variables[column].get())
+    raise FeatureError("Can't merge results ordered by %r" % (column,))
+
+
+class _Reversed(object):
+    """Sort key ordering values in reverse."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class ShardedResultSet(object):
+    """The results of a find in every shard of a L{ShardedStore}.
+
+    Results are merged shard after shard, or by their order when
+    L{order_by} is used, which supports ordering by columns of the find
+    spec.  See L{merge_results} for how that order may differ from the
+    one of the database.
+    """
+
+    def __init__(self, result_sets, spec):
+        self._result_sets = result_sets
+        self._spec = spec
+        self._order_by = ()
+        self._limit = None
+
+    def order_by(self, *args):
+        """Order results in every shard, and merge them by that order."""
+        self._order_by = args
+        for result_set in self._result_sets:
+            result_set.order_by(*args)
+        return self
+
+    def __getitem__(self, index):
+        """Limit the results to a slice starting at 0.
+
+        Each shard returns at most as many results, and the merged
+        results are cut down to that number as well.
+        """
+        if (not isinstance(index, slice) or index.start not in (None, 0) or
+            index.step is not None or index.stop is None):
+            raise FeatureError("Only slices of the first results are "
+                               "supported by sharded result sets")
+        result_sets = [result_set[index] for result_set in self._result_sets]
+        sharded = ShardedResultSet(result_sets, self._spec)
+        sharded._order_by = self._order_by
+        sharded._limit = index.stop
+        return sharded
+
+    def __iter__(self):
+        return merge_results(self._result_sets, self._spec, self._order_by,
+                             self._limit)
+
+    def count(self, *args, **kwargs):
+        """Return the number of results in all shards.
+
+        Each shard counts its results in the database, even if they're
+        sliced.
+
+        @raise FeatureError: Raised for counts of an expression in sliced
+            results, which depend on the results merged.
+        """
+        if self._limit is None:
+            return sum(result_set.count(*args, **kwargs)
+                       for result_set in self._result_sets)
+        if args or kwargs:
+            raise FeatureError("Can't count expressions in sliced results "
+                               "across shards")
+        return min(sum(result_set.count()
+                       for result_set in self._result_sets), self._limit)
+
+    def is_empty(self):
+        """Return whether no shard has any result."""
+        for result_set in self._result_sets:
+            if not result_set.is_empty():
+                return False
+        return True
+
+    def any(self):
+        """Return a result of any shard, or None if there are none."""
+        for result_set in self._result_sets:
+            item = result_set.any()
+            if item is not None:
+                return item
+        return None
+
+    def first(self):
+        """Return the first result, by order if there's one.
+
+        @raises UnorderedError: Raised if the result set isn't ordered.
+        """
+        if not self._order_by:
+            raise UnorderedError("Can't use first() on unordered result set")
+        for item in self:
+            return item
+        return None
+
+    def one(self):
+        """Return the only result of all shards, or None if there are none.
+
+        @raises NotOneError: Raised if there's more than one result.
+        """
+        found = None
+        for result_set in self._result_sets:
+            item = result_set.one()
+            if item is not None:
+                if found is not None:
+                    raise NotOneError("one() used with more than one result "
+                                      "available")
+                found = item
+        return found
+
+    def remove(self):
+        """Remove the results from all shards."""
+        for result_set in self._result_sets:
+            result_set.remove()
+
+    def set(self, *args, **kwargs):
+        """Update the results in all shards, as L{ResultSet.set} does."""
+        for result_set in self._result_sets:
+            result_set.set(*args, **kwargs)
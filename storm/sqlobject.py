@@ -323,6 +323,18 @@ class SQLObjectBase(Storm):
             raise SQLObjectNotFound("Object not found")
         return obj
 
+    @classmethod
+    def getDeferred(cls, id):
+        """Request the object with the given id to be retrieved later.
+
+        See L{Store.get_deferred}.  Calling L{get} on an id with an
+        outstanding deferred request retrieves the requested objects
+        together.
+        """
+        id = cls._idType(id)
+        store = cls._get_store()
+        return store.get_deferred(cls, id)
+
     @classmethod
     def _parse_orderBy(cls, orderBy):
         result = []
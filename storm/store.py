@@ -25,20 +25,24 @@ This module contains the highest-level ORM interface in Storm.
 """
 
 from copy import copy
-from weakref import WeakValueDictionary
+import re
+from weakref import WeakValueDictionary, WeakKeyDictionary
 from operator import itemgetter
 
-from storm.info import get_cls_info, get_obj_info, set_obj_info
+from storm.info import (
+    get_cls_info, get_obj_info, set_obj_info, CompactVariables)
 from storm.variables import Variable, LazyValue
 from storm.expr import (
     Expr, Select, Insert, Update, Delete, Column, Count, Max, Min,
-    Avg, Sum, Eq, And, Asc, Desc, compile_python, compare_columns, SQLRaw,
-    Union, Except, Intersect, Alias, SetExpr)
+    Avg, Sum, Eq, And, Or, Asc, Desc, compile_python, compare_columns, SQLRaw,
+    Union, Except, Intersect, Alias, SetExpr, State)
 from storm.exceptions import (
     WrongStoreError, NotFlushedError, OrderLoopError, UnorderedError,
-    NotOneError, FeatureError, CompileError, LostObjectError, ClassInfoError)
+    NotOneError, FeatureError, CompileError, LostObjectError, ClassInfoError,
+    ReadOnlyObjectError)
 from storm import Undef
 from storm.cache import Cache
+from storm.database import CompiledQuery
 from storm.event import EventSystem
 
 
@@ -63,14 +67,38 @@ class Store(object):
 
     _result_set_factory = None
 
-    def __init__(self, database, cache=None):
+    # Maximum number of objects revalidated or reloaded by a single query.
+    _batch_size = 100
+
+    def __init__(self, database, cache=None, table_aware_flushes=False,
+                 readonly=False, batch_references=False, pipelined=False):
         """
         @param database: The L{storm.database.Database} instance to use.
         @param cache: The cache to use.  Defaults to a L{Cache} instance.
+        @param table_aware_flushes: If true, implicit flushes performed
+            before queries only flush dirty objects whose tables are
+            used by the query, and the objects they must be flushed
+            after.  Tables used only indirectly (e.g. through views or
+            triggers) aren't detected, so this is disabled by default.
+        @param readonly: If true, L{get} and result sets returned by
+            L{find} load read-only objects by default (see
+            L{ResultSet.config}), they don't flush the store first, and
+            L{add} raises L{ReadOnlyObjectError}.
+        @param batch_references: If true, the first time a L{Reference}
+            is resolved on an object loaded by a L{ResultSet} iteration,
+            it's resolved for the other objects loaded by the same
+            iteration too, with a single query.
+        @param pipelined: If true, statements which don't return
+            results, like most of those run by flushes, are queued and
+            sent together before the next query or at commit, saving
+            round trips to the database.  Errors they raise are raised
+            by that query or commit.  See L{Connection.pipelined}.
         """
         self._database = database
         self._event = EventSystem(self)
         self._connection = database.connect(self._event)
+        if pipelined:
+            self._connection.pipelined = True
         self._alive = WeakValueDictionary()
         self._dirty = {}
         self._order = {} # (info, info) = count
@@ -79,7 +107,14 @@ class Store(object):
         else:
             self._cache = cache
         self._implicit_flush_block_count = 0
+        self._table_aware_flushes = table_aware_flushes
+        self._readonly = readonly
+        self._batch_references = batch_references
         self._sequence = 0 # Advisory ordering.
+        self._deferred = {} # cls -> {primary_values: (primary_vars, [..])}
+        self._deferred_missing = set() # (cls, primary_values)
+        self._key_converters = {} # cls -> (variable, ...)
+        self._get_statements = {} # cls -> statement
 
     def get_database(self):
         """Return this Store's Database object."""
@@ -103,10 +138,20 @@ class Store(object):
         This is just like L{storm.database.Database.execute}, except
         that a flush is performed first.
         """
-        if self._implicit_flush_block_count == 0:
-            self.flush()
+        self._implicit_flush(statement)
+        self._deferred_missing.clear()
         return self._connection.execute(statement, params, noresult)
 
+    def execute_many(self, statement, seq_of_params):
+        """Execute a statement once for each set of parameters.
+
+        This is just like L{storm.database.Connection.execute_many},
+        except that a flush is performed first.
+        """
+        self._implicit_flush(statement)
+        self._deferred_missing.clear()
+        self._connection.execute_many(statement, seq_of_params)
+
     def close(self):
         """Close the connection."""
         self._connection.close()
@@ -124,15 +169,15 @@ class Store(object):
     def rollback(self):
         """Roll back all outstanding changes, reverting to database state."""
         for obj_info in self._dirty:
+            obj_info.pop("changes", None)
+            # Objects pending removal never got removed, so they're still
+            # in the cache, and resolve lazy values again once they're
+            # not pending anymore.
             pending = obj_info.pop("pending", None)
             if pending is PENDING_ADD:
                 # Object never got in the cache, so being "in the store"
                 # has no actual meaning for it.
                 del obj_info["store"]
-            elif pending is PENDING_REMOVE:
-                # Object never got removed, so it's still in the cache,
-                # and thus should continue to resolve from now on.
-                self._enable_lazy_resolving(obj_info)
         self._dirty.clear()
         self.invalidate()
         self._connection.rollback()
@@ -140,7 +185,9 @@ class Store(object):
     def get(self, cls, key):
         """Get object of type cls with the given primary key from the database.
 
-        If the object is alive the database won't be touched.
+        If the object is alive the database won't be touched.  On a
+        read-only store, a new read-only object is loaded instead, as
+        by L{find}.
 
         @param cls: Class of the object to be retrieved.
         @param key: Primary key of object. May be a tuple for composed keys.
@@ -149,13 +196,150 @@ class Store(object):
             if no object is found.
         """
 
-        if self._implicit_flush_block_count == 0:
-            self.flush()
+        cls_info = get_cls_info(cls)
+
+        primary_values = self._get_key_values(cls_info, key)
+        if not self._readonly:
+            alive_key = (cls_info.cls, primary_values)
+            obj_info = self._alive.get(alive_key)
+            if (obj_info is not None and not obj_info.get("invalidated") and
+                not self._is_alive_affected(obj_info)):
+                # Flushing can't change the object returned, so don't.
+                return self._get_object(obj_info)
+
+            self._implicit_flush(cls_info.table)
+
+            obj_info = self._alive.get(alive_key)
+            if obj_info is not None:
+                if obj_info.get("invalidated"):
+                    try:
+                        self._validate_alive(obj_info)
+                    except LostObjectError:
+                        return None
+                return self._get_object(obj_info)
+
+        if cls_info.cls in self._deferred:
+            # Load the object together with the deferred ones.
+            return self.get_deferred(cls, key).get()
+
+        statement = self._get_statements.get(cls_info.cls)
+        if statement is None:
+            statement = self._compile_get_statement(cls_info)
+            self._get_statements[cls_info.cls] = statement
+        if statement:
+            result = self._connection.execute(statement, primary_values)
+        else:
+            where = compare_columns(cls_info.primary_key,
+                                    self._get_key_variables(cls_info, key))
+            select = Select(cls_info.columns, where,
+                            default_tables=cls_info.table, limit=1)
+            result = self._connection.execute(select)
+        values = result.get_one()
+        if values is None:
+            return None
+        if self._readonly:
+            return self._load_readonly_object(cls_info, result, values)
+        return self._load_object(cls_info, result, values)
 
+    def get_deferred(self, cls, key):
+        """Request an object of type cls to be retrieved later.
+
+        This is like L{get}, but the object is only retrieved when the
+        returned L{DeferredGet} is resolved.  All outstanding requests
+        for the same class are then retrieved together, with a single
+        query for each batch of objects rather than one query per
+        object.  Alive objects aren't queried, and keys known not to
+        exist in the database aren't queried again until the store
+        changes the database or the transaction ends.
+
+        @param cls: Class of the object to be retrieved.
+        @param key: Primary key of object. May be a tuple for composed keys.
+
+        @return: A L{DeferredGet} whose C{get()} method returns the
+            object found with the given primary key, or None.
+        """
+        cls_info = get_cls_info(cls)
+        primary_vars = self._get_key_variables(cls_info, key)
+        primary_values = tuple(var.get(to_db=True) for var in primary_vars)
+        deferred_get = DeferredGet(self, cls_info.cls)
+        pending = self._deferred.setdefault(cls_info.cls, {})
+        if primary_values in pending:
+            pending[primary_values][1].append(deferred_get)
+        else:
+            pending[primary_values] = (primary_vars, [deferred_get])
+        return deferred_get
+
+    def _get_key_values(self, cls_info, key):
+        """Return the alive cache key values of cls_info for the given key.
+
+        Values are converted by variables kept for each class, rather
+        than by new variables for every key.
+        """
         if type(key) != tuple:
             key = (key,)
 
-        cls_info = get_cls_info(cls)
+        assert len(key) == len(cls_info.primary_key)
+
+        converters = self._key_converters.get(cls_info.cls)
+        if converters is None:
+            converters = tuple(column.variable_factory()
+                               for column in cls_info.primary_key)
+            self._key_converters[cls_info.cls] = converters
+        primary_values = []
+        for converter, value in zip(converters, key):
+            if isinstance(value, Variable):
+                converter = value
+            else:
+                converter.set(value)
+            primary_values.append(converter.get(to_db=True))
+        return tuple(primary_values)
+
+    def _is_alive_affected(self, obj_info):
+        """Return true if flushing may change the object alive as obj_info.
+
+        That's the case when an object of the same class is pending
+        addition or removal, or has a changed primary key.
+        """
+        cls_info = obj_info.cls_info
+        for dirty_info in self._dirty:
+            if dirty_info.cls_info is cls_info:
+                if "pending" in dirty_info:
+                    return True
+                changes = dirty_info.get("changes")
+                if changes:
+                    for variable in dirty_info.primary_vars:
+                        if variable in changes:
+                            return True
+        return False
+
+    def _compile_get_statement(self, cls_info):
+        """Compile the statement used by L{get} to retrieve cls_info rows.
+
+        @return: The SQL of the statement, taking the primary key values
+            as parameters, or False if it can't be reused across keys.
+        """
+        primary_vars = [column.variable_factory()
+                        for column in cls_info.primary_key]
+        select = Select(cls_info.columns,
+                        compare_columns(cls_info.primary_key, primary_vars),
+                        default_tables=cls_info.table, limit=1)
+        state = State()
+        statement = self._connection.compile(select, state)
+        if len(state.parameters) != len(primary_vars):
+            # The key isn't fully parametrized, so the statement can't
+            # be reused for other keys.
+            return False
+        for parameter, variable in zip(state.parameters, primary_vars):
+            if parameter is not variable:
+                return False
+        if isinstance(statement, unicode):
+            statement = CompiledQuery(statement)
+        return statement
+
+    def _get_key_variables(self, cls_info, key):
+        """Return primary key variables of cls_info for the given key."""
+        if type(key) != tuple:
+            key = (key,)
 
         assert len(key) == len(cls_info.primary_key)
 
@@ -164,27 +348,85 @@ class Store(object):
             if not isinstance(variable, Variable):
                 variable = column.variable_factory(value=variable)
             primary_vars.append(variable)
+        return primary_vars
 
-        primary_values = tuple(var.get(to_db=True) for var in primary_vars)
-        obj_info = self._alive.get((cls_info.cls, primary_values))
-        if obj_info is not None:
-            if obj_info.get("invalidated"):
-                try:
-                    self._validate_alive(obj_info)
-                except LostObjectError:
-                    return None
-            return self._get_object(obj_info)
-
-        where = compare_columns(cls_info.primary_key, primary_vars)
+    def _resolve_deferred(self, cls):
+        """Retrieve the objects of all outstanding L{DeferredGet}s for cls.
+        """
+        pending = self._deferred.pop(cls, None)
+        if not pending:
+            return
+        try:
+            self._resolve_deferred_keys(cls, pending)
+        except:
+            # Keep the requests which weren't resolved, so that they're
+            # retried later rather than left without an object.
+            outstanding = self._deferred.setdefault(cls, {})
+            for primary_values, (primary_vars, deferred_gets) in \
+                    pending.iteritems():
+                deferred_gets = [deferred_get
+                                 for deferred_get in deferred_gets
+                                 if deferred_get._obj is Undef]
+                if not deferred_gets:
+                    continue
+                if primary_values in outstanding:
+                    outstanding[primary_values][1].extend(deferred_gets)
+                else:
+                    outstanding[primary_values] = (primary_vars,
+                                                   deferred_gets)
+            raise
 
-        select = Select(cls_info.columns, where,
-                        default_tables=cls_info.table, limit=1)
+    def _resolve_deferred_keys(self, cls, pending):
+        """Set the objects of the L{DeferredGet}s in C{pending}.
 
-        result = self._connection.execute(select)
-        values = result.get_one()
-        if values is None:
-            return None
-        return self._load_object(cls_info, result, values)
+        @param pending: A dictionary mapping primary values to a tuple
+            with the primary variables and the list of L{DeferredGet}s
+            requesting them.
+        """
+        cls_info = get_cls_info(cls)
+        if not self._readonly:
+            self._implicit_flush(cls_info.table)
+
+        query_keys = []
+        for primary_values, (primary_vars, deferred_gets) in \
+                pending.iteritems():
+            obj = None
+            if self._readonly:
+                obj_info = None
+            else:
+                obj_info = self._alive.get((cls, primary_values))
+            if obj_info is not None and not obj_info.get("invalidated"):
+                obj = self._get_object(obj_info)
+            elif (cls, primary_values) not in self._deferred_missing:
+                query_keys.append(primary_values)
+                continue
+            for deferred_get in deferred_gets:
+                deferred_get._obj = obj
+
+        # Objects retrieved together are revalidated and have their
+        # references batched together too.
+        batch = WeakKeyDictionary()
+        for i in range(0, len(query_keys), self._batch_size):
+            missing = set(query_keys[i:i+self._batch_size])
+            where = compare_primary_keys(cls_info.primary_key,
+                                         [pending[primary_values][0]
+                                          for primary_values in missing])
+            result = self._connection.execute(
+                Select(cls_info.columns, where,
+                       default_tables=cls_info.table))
+            for values in result:
+                if self._readonly:
+                    obj = self._load_readonly_object(cls_info, result, values)
+                else:
+                    obj = self._load_object(cls_info, result, values, batch)
+                primary_values = self._get_primary_values(cls_info, values)
+                missing.discard(primary_values)
+                for deferred_get in pending[primary_values][1]:
+                    deferred_get._obj = obj
+            for primary_values in missing:
+                self._deferred_missing.add((cls, primary_values))
+                for deferred_get in pending[primary_values][1]:
+                    deferred_get._obj = None
 
     def find(self, cls_spec, *args, **kwargs):
         """Perform a query.
@@ -206,10 +448,13 @@ class Store(object):
         @return: A L{ResultSet} of instances C{cls_spec}. If C{cls_spec}
             was a tuple, then an iterator of tuples of such instances.
         """
-        if self._implicit_flush_block_count == 0:
-            self.flush()
         find_spec = FindSpec(cls_spec)
         where = get_where_for_args(args, kwargs, find_spec.default_cls)
+        if not self._readonly:
+            if self._table_aware_flushes:
+                self._implicit_flush(find_spec.get_select(where))
+            else:
+                self._implicit_flush()
         return self._result_set_factory(self, find_spec, where)
 
     def using(self, *tables):
@@ -244,7 +489,12 @@ class Store(object):
         yet been added.
 
         The C{added} event will be fired on the object info's event system.
+
+        @raise ReadOnlyObjectError: Raised if this is a read-only store.
         """
+        if self._readonly:
+            raise ReadOnlyObjectError("Can't add %r to a read-only store"
+                                      % (obj,))
         self._event.emit("register-transaction")
         obj_info = get_obj_info(obj)
 
@@ -258,17 +508,173 @@ class Store(object):
             pass
         elif pending is PENDING_REMOVE:
             del obj_info["pending"]
-            self._enable_lazy_resolving(obj_info)
-            # obj_info.event.emit("added")
+            # obj_info.emit("added")
         elif store is None:
             obj_info["store"] = self
             obj_info["pending"] = PENDING_ADD
             self._set_dirty(obj_info)
             self._enable_lazy_resolving(obj_info)
-            obj_info.event.emit("added")
+            obj_info.emit("added")
 
         return obj
 
+    def insert_many(self, cls, rows, columns=None, return_objects=False):
+        """Insert rows of the given class without adding objects for them.
+
+        Rows are inserted by statements covering many rows at once,
+        rather than by flushing an object for each of them.  Pending
+        changes are flushed first, so objects added before are inserted
+        before these rows.
+
+        @param cls: The class whose table rows are inserted into.
+        @param rows: A sequence of rows, each being a dictionary mapping
+            attribute names of C{cls} to values, or a tuple of values for
+            C{columns}.  Missing attributes get their default value, if
+            any, or are left for the database to fill.
+        @param columns: The columns of C{cls} which tuple rows have values
+            for.  Defaults to all columns, in L{ClassInfo.columns} order.
+        @param return_objects: If true, objects for the inserted rows are
+            retrieved and returned, with primary keys and other values
+            generated by the database.
+        @return: If C{return_objects} is true, a list with an object for
+            each row, in the order of C{rows}.  Otherwise, None.
+        @raise ValueError: Raised if a tuple row doesn't have a value for
+            each of C{columns}.
+        """
+        cls_info = get_cls_info(cls)
+        if columns is None:
+            columns = cls_info.columns
+        positions = dict((id(column), i)
+                         for i, column in enumerate(cls_info.columns))
+        default_positions = [i for i, column in enumerate(cls_info.columns)
+                             if column.variable_factory().is_defined()]
+
+        self.flush()
+        # Rows are about to show up.
+        self._deferred_missing.clear()
+
+        # Rows are grouped by the columns they have values for, since
+        # each statement inserts the same columns.
+        groups = {}
+        for index, row in enumerate(rows):
+            if isinstance(row, dict):
+                row_items = [(cls_info.attributes[attr], value)
+                             for attr, value in row.iteritems()]
+            else:
+                if len(row) != len(columns):
+                    raise ValueError("Row %d has %d values for %d columns"
+                                     % (index, len(row), len(columns)))
+                row_items = zip(columns, row)
+            variables = {}
+            for column, value in row_items:
+                variables[positions[id(column)]] = \
+                    column.variable_factory(value=value)
+            for position in default_positions:
+                if position not in variables:
+                    variables[position] = \
+                        cls_info.columns[position].variable_factory()
+            key = tuple(sorted(variables))
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = ([], [])
+            group[0].append(tuple(variables[position] for position in key))
+            group[1].append(index)
+
+        primary_vars_list = []
+        indexes = []
+        for key, (group_rows, group_indexes) in groups.iteritems():
+            group_columns = [cls_info.columns[position] for position in key]
+            key_idx = [key.index(position) if position in key else None
+                       for position in cls_info.primary_key_pos]
+            # Stay below the limit of parameters of a single statement
+            # imposed by older SQLite versions.
+            size = max(1, min(self._batch_size,
+                              999 // max(1, len(group_columns))))
+            for i in range(0, len(group_rows), size):
+                insert = Insert(group_columns, cls_info.table,
+                                values=group_rows[i:i+size])
+                if return_objects or not group_columns:
+                    row_primary_vars = [
+                        tuple(row[idx] if idx is not None else
+                              column.variable_factory()
+                              for idx, column in zip(key_idx,
+                                                     cls_info.primary_key))
+                        for row in insert.values]
+                    if None in key_idx or not group_columns:
+                        # Let the backend fill generated primary keys.
+                        # Rows without values are inserted one at a time
+                        # this way too.
+                        insert.primary_columns = cls_info.primary_key
+                        insert.primary_variables = row_primary_vars
+                    primary_vars_list.extend(row_primary_vars)
+                    indexes.extend(group_indexes[i:i+size])
+                self._connection.execute(insert, noresult=True)
+
+        if not return_objects:
+            return None
+
+        objects = [None] * len(indexes)
+        pending = {}
+        for index, primary_vars in zip(indexes, primary_vars_list):
+            primary_values = tuple(var.get(to_db=True) for var in primary_vars)
+            pending.setdefault(primary_values, []).append(index)
+        # Objects inserted together are revalidated and have references
+        # batched together as well.
+        batch = WeakKeyDictionary()
+        for i in range(0, len(primary_vars_list), self._batch_size):
+            where = compare_primary_keys(
+                cls_info.primary_key, primary_vars_list[i:i+self._batch_size])
+            result = self._connection.execute(
+                Select(cls_info.columns, where,
+                       default_tables=cls_info.table))
+            for values in result:
+                if self._readonly:
+                    obj = self._load_readonly_object(cls_info, result, values)
+                else:
+                    obj = self._load_object(cls_info, result, values, batch)
+                primary_values = self._get_primary_values(cls_info, values)
+                for index in pending.get(primary_values, ()):
+                    objects[index] = obj
+        return objects
+
+    def copy_in(self, cls_or_table, rows, columns=None):
+        """Load rows into a table with the bulk loading of the backend.
+
+        This is the fastest way to insert a large number of rows, but no
+        objects, defaults or generated values are handled for them.  On
+        PostgreSQL, rows are streamed to the server with C{COPY ... FROM
+        STDIN} as they're taken from C{rows}.  Other backends insert them
+        with a single C{executemany()} call, in the current transaction.
+        Pending changes are flushed first.
+
+        @param cls_or_table: The class whose table rows are loaded into,
+            or the table itself.
+        @param rows: An iterable with a tuple of values for C{columns}
+            for each row.  Values for a class are converted by the
+            variables of its columns, while values for a table are
+            passed as they are.
+        @param columns: The columns which rows have values for.  Defaults
+            to all columns of the class, in L{ClassInfo.columns} order,
+            and is required for a table.
+        """
+        if isinstance(cls_or_table, (basestring, Expr)):
+            if columns is None:
+                raise FeatureError("copy_in() needs the columns of a table")
+            table = cls_or_table
+        else:
+            cls_info = get_cls_info(cls_or_table)
+            table = cls_info.table
+            if columns is None:
+                columns = cls_info.columns
+            factories = [column.variable_factory for column in columns]
+            rows = (tuple([factory(value=value)
+                           for factory, value in zip(factories, row)])
+                    for row in rows)
+        self.flush()
+        # Rows are about to show up.
+        self._deferred_missing.clear()
+        self._connection.copy_in(table, columns, rows)
+
     def remove(self, obj):
         """Remove the given object from the store.
 
@@ -279,6 +685,8 @@ class Store(object):
 
         if obj_info.get("store") is not self:
             raise WrongStoreError("%s is not in this store" % repr(obj))
+        if "readonly" in obj_info:
+            raise ReadOnlyObjectError("%s is read-only" % repr(obj))
 
         pending = obj_info.get("pending")
 
@@ -288,28 +696,31 @@ class Store(object):
             del obj_info["store"]
             del obj_info["pending"]
             self._set_clean(obj_info)
-            self._disable_lazy_resolving(obj_info)
-            obj_info.event.emit("removed")
+            obj_info.emit("removed")
         else:
             obj_info["pending"] = PENDING_REMOVE
             self._set_dirty(obj_info)
-            self._disable_lazy_resolving(obj_info)
-            obj_info.event.emit("removed")
+            obj_info.emit("removed")
 
     def reload(self, obj):
         """Reload the given object.
 
         The object will immediately have all of its data reset from
         the database. Any pending changes will be thrown away.
+
+        @raise ReadOnlyObjectError: Raised if the object is read-only.
         """
         obj_info = get_obj_info(obj)
         cls_info = obj_info.cls_info
         if obj_info.get("store") is not self:
             raise WrongStoreError("%s is not in this store" % repr(obj))
-        if "primary_vars" not in obj_info:
+        if "readonly" in obj_info:
+            raise ReadOnlyObjectError("%s is read-only" % repr(obj))
+        if "primary_values" not in obj_info:
             raise NotFlushedError("Can't reload an object if it was "
                                   "never flushed")
-        where = compare_columns(cls_info.primary_key, obj_info["primary_vars"])
+        where = compare_columns(cls_info.primary_key,
+                                self._get_cached_primary_vars(obj_info))
         select = Select(cls_info.columns, where,
                         default_tables=cls_info.table, limit=1)
         result = self._connection.execute(select)
@@ -318,6 +729,51 @@ class Store(object):
                          replace_unknown_lazy=True)
         self._set_clean(obj_info)
 
+    def reload_many(self, objs):
+        """Reload the given objects.
+
+        This is like L{reload}, but all objects of the same class are
+        reloaded together, with a single query for each group of objects
+        rather than one query per object.
+
+        @param objs: A sequence of objects which are in this store.
+        """
+        obj_infos = {}
+        for obj in objs:
+            obj_info = get_obj_info(obj)
+            if obj_info.get("store") is not self:
+                raise WrongStoreError("%s is not in this store" % repr(obj))
+            if "readonly" in obj_info:
+                raise ReadOnlyObjectError("%s is read-only" % repr(obj))
+            if "primary_values" not in obj_info:
+                raise NotFlushedError("Can't reload an object if it was "
+                                      "never flushed")
+            obj_infos.setdefault(obj_info.cls_info.cls, []).append(obj_info)
+
+        for cls_obj_infos in obj_infos.itervalues():
+            cls_info = cls_obj_infos[0].cls_info
+            for i in range(0, len(cls_obj_infos), self._batch_size):
+                pending = {}
+                for obj_info in cls_obj_infos[i:i+self._batch_size]:
+                    pending[obj_info["primary_values"]] = obj_info
+                where = compare_primary_keys(
+                    cls_info.primary_key,
+                    [self._get_cached_primary_vars(obj_info)
+                     for obj_info in pending.itervalues()])
+                result = self._connection.execute(
+                    Select(cls_info.columns, where,
+                           default_tables=cls_info.table))
+                for values in result:
+                    obj_info = pending.pop(
+                        self._get_primary_values(cls_info, values), None)
+                    if obj_info is not None:
+                        self._set_values(obj_info, cls_info.columns, result,
+                                         values, replace_unknown_lazy=True)
+                        self._set_clean(obj_info)
+                if pending:
+                    raise LostObjectError("Can't obtain values from the "
+                                          "database (object got removed?)")
+
     def autoreload(self, obj=None):
         """Set an object or all objects to be reloaded automatically on access.
 
@@ -347,6 +803,7 @@ class Store(object):
         """
         if obj is None:
             self._cache.clear()
+            self._deferred_missing.clear()
         else:
             self._cache.remove(get_obj_info(obj))
         self._mark_autoreload(obj, True)
@@ -368,6 +825,7 @@ class Store(object):
         self._alive.clear()
         self._dirty.clear()
         self._cache.clear()
+        self._deferred_missing.clear()
         # The following line is untested, but then, I can't really find a way
         # to test it without whitebox.
         self._order.clear()
@@ -380,9 +838,15 @@ class Store(object):
             obj_infos = (get_obj_info(obj),)
         for obj_info in obj_infos:
             cls_info = obj_info.cls_info
+            variables = obj_info.variables
             for column in cls_info.columns:
                 if id(column) not in cls_info.primary_key_idx:
-                    obj_info.variables[column].set(AutoReload)
+                    if column in variables:
+                        variables[column].set(AutoReload)
+                    else:
+                        # Compact objects are marked without building
+                        # variables.
+                        variables.set_state(column, AutoReload)
             if invalidate:
                 # Marking an object with 'invalidated' means that we're
                 # not sure if the object is actually in the database
@@ -424,7 +888,7 @@ class Store(object):
         pair = (get_obj_info(before), get_obj_info(after))
         self._order[pair] -= 1
 
-    def flush(self):
+    def flush(self, obj=None):
         """Flush all dirty objects in cache to database.
 
         This method will first call the __storm_pre_flush__ hook of all dirty
@@ -442,7 +906,18 @@ class Store(object):
         only need to call this method explicitly in very rare cases where
         normal flushing times are insufficient, such as when you want to
         make sure a database trigger gets run at a particular time.
+
+        @param obj: If passed, only this object and the objects that
+            must be flushed before it, as defined by the flush order,
+            are flushed.
         """
+        if obj is not None:
+            obj_info = get_obj_info(obj)
+            if obj_info.get("store") is not self:
+                raise WrongStoreError("%s is not in this store" % repr(obj))
+            self._flush_selected(lambda other_info: other_info is obj_info)
+            return
+
         self._event.emit("flush")
 
         # The _dirty list may change under us while we're running
@@ -457,14 +932,7 @@ class Store(object):
                 self._run_hook(obj_info, "__storm_pre_flush__")
         self._dirty = flushing
 
-        predecessors = {}
-        for (before_info, after_info), n in self._order.iteritems():
-            if n > 0:
-                before_set = predecessors.get(after_info)
-                if before_set is None:
-                    predecessors[after_info] = set((before_info,))
-                else:
-                    before_set.add(before_info)
+        predecessors = self._get_flush_predecessors()
 
         key_func = itemgetter("sequence")
 
@@ -494,14 +962,158 @@ class Store(object):
         # That's not stricly necessary, but prevents getting into bigints.
         self._sequence = 0
 
+    def _flush_selected(self, select):
+        """Flush the dirty objects accepted by C{select}.
+
+        Objects which must be flushed before the selected ones, according
+        to the flush order, are flushed as well.  Hooks are called just
+        like in L{flush}, but only for the flushed objects.
+
+        @param select: A function taking an ObjectInfo and returning
+            true if the object should be flushed.
+        """
+        self._event.emit("flush")
+
+        flushing = {}
+        while True:
+            # Pre-flush hooks may dirty other objects or change the
+            # flush order, so keep selecting until nothing is new.
+            predecessors = self._get_flush_predecessors()
+            selected = [obj_info for obj_info in self._dirty
+                        if obj_info not in flushing and select(obj_info)]
+            self._add_flush_dependencies(selected, flushing, predecessors)
+            if not selected:
+                break
+            for obj_info in selected:
+                flushing[obj_info] = True
+                self._run_hook(obj_info, "__storm_pre_flush__")
+
+        key_func = itemgetter("sequence")
+
+        flushed = {}
+        while True:
+            sorted_dirty = [obj_info for obj_info in flushing
+                            if obj_info in self._dirty]
+            self._add_flush_dependencies(sorted_dirty, flushing, predecessors)
+            if not sorted_dirty:
+                break
+            flushing.update(dict.fromkeys(sorted_dirty, True))
+            sorted_dirty.sort(key=key_func)
+            while sorted_dirty:
+                for i, obj_info in enumerate(sorted_dirty):
+                    for before_info in predecessors.get(obj_info, ()):
+                        if before_info in self._dirty:
+                            break # A predecessor is still dirty.
+                    else:
+                        break # Found an item without dirty predecessors.
+                else:
+                    raise OrderLoopError("Can't flush due to ordering loop")
+                del sorted_dirty[i]
+                self._dirty.pop(obj_info, None)
+                flushed[obj_info] = True
+                self._flush_one(obj_info)
+            predecessors = self._get_flush_predecessors()
+
+        # Ordering between flushed objects isn't needed anymore.
+        for pair in self._order.keys():
+            if pair[0] in flushed or pair[1] in flushed:
+                del self._order[pair]
+
+    def _get_flush_predecessors(self):
+        """Return a {obj_info: set(before_info, ...)} flush order map."""
+        predecessors = {}
+        for (before_info, after_info), n in self._order.iteritems():
+            if n > 0:
+                before_set = predecessors.get(after_info)
+                if before_set is None:
+                    predecessors[after_info] = set((before_info,))
+                else:
+                    before_set.add(before_info)
+        return predecessors
+
+    def _add_flush_dependencies(self, obj_infos, flushing, predecessors):
+        """Extend C{obj_infos} with the dirty objects they depend on.
+
+        Objects which are already in C{obj_infos} or C{flushing} are
+        not added again.
+        """
+        seen = set(obj_infos)
+        i = 0
+        while i < len(obj_infos):
+            for before_info in predecessors.get(obj_infos[i], ()):
+                if (before_info in self._dirty and
+                    before_info not in seen and
+                    before_info not in flushing):
+                    seen.add(before_info)
+                    obj_infos.append(before_info)
+            i += 1
+
+    def _implicit_flush(self, statement=None):
+        """Flush before executing C{statement}, unless blocked.
+
+        With table-aware flushes enabled, only the dirty objects whose
+        tables are mentioned in the statement, and the objects they
+        depend on, are flushed.
+
+        @param statement: An L{Expr} or a string with the SQL about to be
+            executed.  If None, all dirty objects are flushed.
+        """
+        if self._implicit_flush_block_count != 0:
+            return
+        if not self._table_aware_flushes or statement is None:
+            self.flush()
+        else:
+            self._flush_selected(self._get_table_selector(statement))
+
+    def _get_table_selector(self, statement):
+        """Return a function checking if an object's table is used.
+
+        The returned function takes an ObjectInfo and returns true if
+        its table is mentioned in the given statement, compiling it
+        on first use.
+
+        @param statement: An L{Expr} or a string with SQL.
+        """
+        compiled = []
+        def uses_table(obj_info):
+            if not compiled:
+                if isinstance(statement, basestring):
+                    compiled.append(statement)
+                else:
+                    try:
+                        compiled.append(self._connection.compile(statement))
+                    except CompileError:
+                        # Can't tell, so assume everything is used.
+                        compiled.append(None)
+            if compiled[0] is None:
+                return True
+            table = obj_info.cls_info.table
+            if not isinstance(table, basestring):
+                return True
+            pattern = _table_patterns.get(table)
+            if pattern is None:
+                pattern = re.compile(r"(?<![\w$])%s(?![\w$])"
+                                     % re.escape(table), re.IGNORECASE)
+                _table_patterns[table] = pattern
+            return pattern.search(compiled[0]) is not None
+
+        return uses_table
+
     def _flush_one(self, obj_info):
         cls_info = obj_info.cls_info
 
+        self._connection.prepare_write()
+
         pending = obj_info.pop("pending", None)
+        changed_variables = obj_info.pop("changes", ())
+        # Rows may show up, so keys known to be missing must be checked
+        # again.
+        self._deferred_missing.clear()
 
         if pending is PENDING_REMOVE:
-            expr = Delete(compare_columns(cls_info.primary_key,
-                                          obj_info["primary_vars"]),
+            expr = Delete(compare_columns(
+                              cls_info.primary_key,
+                              self._get_cached_primary_vars(obj_info)),
                           cls_info.table)
             self._connection.execute(expr, noresult=True)
 
@@ -535,9 +1147,10 @@ class Store(object):
             self._enable_change_notification(obj_info)
             self._add_to_alive(obj_info)
         else:
-            cached_primary_vars = obj_info["primary_vars"]
+            cached_primary_vars = self._get_cached_primary_vars(obj_info)
 
-            changes = self._get_changes_map(obj_info)
+            changes = self._get_changes_map(obj_info,
+                                            variables=changed_variables)
 
             if changes:
                 expr = Update(changes,
@@ -546,13 +1159,14 @@ class Store(object):
                               cls_info.table)
                 self._connection.execute(expr, noresult=True)
 
-                self._fill_missing_values(obj_info, obj_info.primary_vars)
+                self._fill_missing_values(obj_info, obj_info.primary_vars,
+                                          variables=changed_variables)
 
                 self._add_to_alive(obj_info)
 
         self._run_hook(obj_info, "__storm_flushed__")
 
-        obj_info.event.emit("flushed")
+        obj_info.emit("flushed")
 
     def block_implicit_flushes(self):
         """Block implicit flushes from operations like execute()."""
@@ -571,18 +1185,23 @@ class Store(object):
         """Unblock access to the underlying database connection."""
         self._connection.unblock_access()
 
-    def _get_changes_map(self, obj_info, adding=False):
+    def _get_changes_map(self, obj_info, adding=False, variables=None):
         """Return a {column: variable} dictionary suitable for inserts/updates.
 
         @param obj_info: ObjectInfo to inspect for changes.
         @param adding: If true, any defined variables will be considered
                        a change and included in the returned map.
+        @param variables: If given, only these variables are inspected,
+                          rather than the variables of all columns.
         """
         cls_info = obj_info.cls_info
         changes = {}
         select_variables = []
-        for column in cls_info.columns:
-            variable = obj_info.variables[column]
+        if variables is None:
+            variables = [obj_info.variables[column]
+                         for column in cls_info.columns]
+        for variable in variables:
+            column = variable.column
             if adding or variable.has_changed():
                 if variable.is_defined():
                     changes[column] = variable
@@ -607,7 +1226,8 @@ class Store(object):
 
         return changes
 
-    def _fill_missing_values(self, obj_info, primary_vars, result=None):
+    def _fill_missing_values(self, obj_info, primary_vars, result=None,
+                             variables=None):
         """Fill missing values in variables of the given obj_info.
 
         This method will verify which values are unset in obj_info,
@@ -622,21 +1242,32 @@ class Store(object):
             isn't defined, it must be retrieved from the database
             using database-dependent logic, which is provided by the
             backend in the result of the query which inserted the object.
+        @param variables: If given, only these variables and the ones
+            of the primary key are filled, rather than the variables of
+            all columns.  Other variables must be unchanged.
         """
         cls_info = obj_info.cls_info
 
-        cached_primary_vars = obj_info.get("primary_vars")
         primary_key_idx = cls_info.primary_key_idx
+        if variables is None:
+            columns = cls_info.columns
+        else:
+            columns = list(cls_info.primary_key)
+            for variable in variables:
+                if id(variable.column) not in primary_key_idx:
+                    columns.append(variable.column)
         missing_columns = []
-        for column in cls_info.columns:
+        for column in columns:
             variable = obj_info.variables[column]
             if not variable.is_defined():
                 idx = primary_key_idx.get(id(column))
                 if idx is not None:
-                    if (cached_primary_vars is not None
+                    if ("primary_values" in obj_info
                         and variable.get_lazy() is AutoReload):
                         # For auto-reloading a primary key, just
                         # get the value out of the cache.
+                        cached_primary_vars = \
+                            self._get_cached_primary_vars(obj_info)
                         variable.set(cached_primary_vars[idx].get())
                     else:
                         missing_columns.append(column)
@@ -657,23 +1288,167 @@ class Store(object):
 
     def _validate_alive(self, obj_info):
         """Perform cache validation for the given obj_info."""
+        if self._reload_invalidated_batch(obj_info):
+            return
         where = compare_columns(obj_info.cls_info.primary_key,
-                                obj_info["primary_vars"])
+                                self._get_cached_primary_vars(obj_info))
         result = self._connection.execute(Select(SQLRaw("1"), where))
         if not result.get_one():
             raise LostObjectError("Object is not in the database anymore")
         obj_info.pop("invalidated", None)
 
-    def _load_object(self, cls_info, result, values):
+    def _reload_invalidated_batch(self, obj_info):
+        """Revalidate and reload obj_info together with its siblings.
+
+        Objects loaded by the same L{ResultSet} iteration share a batch.
+        If other objects in the batch of obj_info are pending validation
+        too, all of them are validated and have their auto-reloading
+        values filled with a single query.
+
+        @raise LostObjectError: If obj_info is not in the database anymore.
+        @return: False if there are no siblings to be handled together
+            with obj_info, and thus nothing was done.
+        """
+        batch = obj_info.get("batch")
+        if batch is None:
+            return False
+        cls_info = obj_info.cls_info
+        obj_infos = [obj_info]
+        for sibling in batch.keys():
+            if len(obj_infos) == self._batch_size:
+                break
+            if (sibling is not obj_info and
+                sibling.cls_info is cls_info and
+                sibling.get("invalidated") and
+                sibling.get("store") is self and
+                "pending" not in sibling and
+                "primary_values" in sibling and
+                sibling.get_obj() is not None):
+                obj_infos.append(sibling)
+        if len(obj_infos) == 1:
+            return False
+        where = compare_primary_keys(cls_info.primary_key,
+                                     [self._get_cached_primary_vars(sibling)
+                                      for sibling in obj_infos])
+        result = self._connection.execute(
+            Select(cls_info.columns, where, default_tables=cls_info.table))
+        for values in result:
+            # Objects are in the alive cache, so they will be found and
+            # have their undefined values filled, and the invalidated
+            # flag removed.
+            self._load_object(cls_info, result, values)
+        if obj_info.get("invalidated"):
+            raise LostObjectError("Object is not in the database anymore")
+        return True
+
+    def _load_batch_reference(self, relation, obj_info):
+        """Resolve a reference of obj_info together with its siblings.
+
+        When references are batched, the remote objects of the given
+        relation are retrieved for obj_info and the other objects in its
+        batch with a single query, and linked to them.  Remote objects
+        which are alive already are linked without being queried.
+
+        @return: False if the reference of obj_info wasn't resolved,
+            because references aren't batched, obj_info has no siblings
+            to be handled together with it, or it references more than
+            one remote object.
+        """
+        batch = obj_info.get("batch")
+        if not self._batch_references or batch is None:
+            return False
+        cls_info = obj_info.cls_info
+        key_and_vars = self._get_batch_reference_key(relation, obj_info)
+        if key_and_vars is None:
+            return False
+        obj_key, local_vars = key_and_vars
+        locals_by_key = {obj_key: [obj_info.get_obj()]}
+        local_vars_by_key = {obj_key: local_vars}
+        for sibling in batch.keys():
+            if len(locals_by_key) == self._batch_size:
+                break
+            if (sibling is obj_info or
+                sibling.cls_info is not cls_info or
+                sibling.get("store") is not self or
+                sibling.get("invalidated") or
+                "remote" in sibling.get(relation, ())):
+                continue
+            key_and_vars = self._get_batch_reference_key(relation, sibling)
+            if key_and_vars is not None:
+                key, local_vars = key_and_vars
+                locals_by_key.setdefault(key, []).append(sibling.get_obj())
+                local_vars_by_key[key] = local_vars
+        if len(locals_by_key) < 2:
+            return False
+
+        remote_cls = relation.remote_cls
+        remote_cls_info = get_cls_info(remote_cls)
+        remotes_by_key = {}
+        if relation.remote_key_is_primary:
+            for key in local_vars_by_key.keys():
+                remote_info = self._alive.get((remote_cls, key))
+                if (remote_info is not None and
+                    not remote_info.get("invalidated")):
+                    remotes_by_key[key] = [self._get_object(remote_info)]
+                    del local_vars_by_key[key]
+        if local_vars_by_key:
+            self._implicit_flush(remote_cls_info.table)
+            where = compare_primary_keys(relation.remote_key,
+                                         local_vars_by_key.values())
+            result = self._connection.execute(
+                Select(remote_cls_info.columns, where,
+                       default_tables=remote_cls_info.table))
+            # Remote objects are batched as well, so that references
+            # chained from them are resolved together too.
+            remote_batch = WeakKeyDictionary()
+            for values in result:
+                remote = self._load_object(remote_cls_info, result, values,
+                                           remote_batch)
+                key = tuple(var.get(to_db=True) for var in
+                            relation.get_remote_variables(remote))
+                remotes_by_key.setdefault(key, []).append(remote)
+
+        for key, local_objs in locals_by_key.iteritems():
+            remotes = remotes_by_key.get(key, ())
+            if len(remotes) == 1:
+                for local in local_objs:
+                    relation.link(local, remotes[0])
+        # With more than one remote object, let the reference complain
+        # about it as usual.
+        return len(remotes_by_key.get(obj_key, ())) < 2
+
+    def _get_batch_reference_key(self, relation, obj_info):
+        """Return the local key values and variables of a relation.
+
+        @return: A tuple with the values and the variables of the local
+            key of obj_info, or None if the object is gone, the values are
+            all None, or they would have to be loaded first.
+        """
+        local = obj_info.get_obj()
+        if local is None:
+            return None
+        local_vars = relation.get_local_variables(local)
+        for var in local_vars:
+            if not var.is_defined() or var.get_lazy() is not None:
+                return None
+        key = tuple(var.get(to_db=True) for var in local_vars)
+        if key.count(None) == len(key):
+            return None
+        return key, local_vars
+
+    def _get_primary_values(self, cls_info, values):
+        """Return the alive cache key values for the given row values."""
+        columns = cls_info.columns
+        return tuple(columns[i].variable_factory(value=values[i],
+                                                 from_db=True).get(to_db=True)
+                     for i in cls_info.primary_key_pos)
+
+    def _load_object(self, cls_info, result, values, batch=None):
         # _set_values() need the cls_info columns for the class of the
         # actual object, not from a possible wrapper (e.g. an alias).
         cls = cls_info.cls
         cls_info = get_cls_info(cls)
 
-        # Prepare cache key.
-        primary_vars = []
-        columns = cls_info.columns
-
         for value in values:
             if value is not None:
                 break
@@ -683,13 +1458,8 @@ class Store(object):
             # rows are represented like that.
             return None
 
-        for i in cls_info.primary_key_pos:
-            value = values[i]
-            variable = columns[i].variable_factory(value=value, from_db=True)
-            primary_vars.append(variable)
-
         # Lookup cache.
-        primary_values = tuple(var.get(to_db=True) for var in primary_vars)
+        primary_values = self._get_primary_values(cls_info, values)
         obj_info = self._alive.get((cls, primary_values))
 
         if obj_info is not None:
@@ -721,6 +1491,35 @@ class Store(object):
 
             self._run_hook(obj_info, "__storm_loaded__")
 
+        if batch is not None:
+            batch[obj_info] = True
+            obj_info["batch"] = batch
+
+        return obj
+
+    def _load_readonly_object(self, cls_info, result, values):
+        """Build a read-only object from the given values.
+
+        Read-only objects are neither cached nor tracked for changes,
+        so the same row may be loaded as different objects, and the
+        objects go away as soon as they're not used anymore.
+        """
+        cls = cls_info.cls
+        cls_info = get_cls_info(cls)
+
+        for value in values:
+            if value is not None:
+                break
+        else:
+            return None
+
+        obj = cls.__new__(cls)
+        obj_info = get_obj_info(obj)
+        obj_info["store"] = self
+        obj_info["readonly"] = True
+        self._set_values(obj_info, cls_info.columns, result, values,
+                         replace_unknown_lazy=True)
+        self._run_hook(obj_info, "__storm_loaded__")
         return obj
 
     def _get_object(self, obj_info):
@@ -751,8 +1550,29 @@ class Store(object):
             raise LostObjectError("Can't obtain values from the database "
                                   "(object got removed?)")
         obj_info.pop("invalidated", None)
+        variables = obj_info.variables
+        if type(variables) is CompactVariables:
+            cls_info = obj_info.cls_info
+            converters = cls_info.converters
+        else:
+            converters = None
         for column, value in zip(columns, values):
-            variable = obj_info.variables[column]
+            if converters is not None and column not in variables:
+                converter = converters[cls_info.column_idx[id(column)]]
+                state = variables.get_state(column)
+                if converter is not None and (state is not Undef or
+                                              not keep_defined):
+                    # Keep the value of a compact object without
+                    # building a variable for it.
+                    if keep_defined and state is not AutoReload:
+                        continue
+                    if value is None:
+                        converter.set(value, from_db=True)
+                    else:
+                        result.set_variable(converter, value)
+                    variables.set_state(column, converter.get_state()[1])
+                    continue
+            variable = variables[column]
             lazy_value = variable.get_lazy()
             is_unknown_lazy = not (lazy_value is None or
                                    lazy_value is AutoReload)
@@ -786,6 +1606,7 @@ class Store(object):
 
     def _set_clean(self, obj_info):
         self._dirty.pop(obj_info, None)
+        obj_info.pop("changes", None)
 
     def _iter_dirty(self):
         return self._dirty
@@ -795,8 +1616,8 @@ class Store(object):
         """Add an object to the set of known in-memory objects.
 
         When an object is added to the set of known in-memory objects,
-        the key is built from a copy of the current variables that are
-        part of the primary key.  This means that, when an object is
+        the key is built from the current values of the variables that
+        are part of the primary key.  This means that, when an object is
         retrieved from the database, these values may be used to get
         the cached object which is already in memory, even if it
         requested the primary key value to be changed.  For that reason,
@@ -809,19 +1630,27 @@ class Store(object):
         objects.
         """
         cls_info = obj_info.cls_info
-        old_primary_vars = obj_info.get("primary_vars")
-        if old_primary_vars is not None:
-            old_primary_values = tuple(
-                var.get(to_db=True) for var in old_primary_vars)
+        old_primary_values = obj_info.get("primary_values")
+        if old_primary_values is not None:
             self._alive.pop((cls_info.cls, old_primary_values), None)
-        new_primary_vars = tuple(variable.copy()
-                                 for variable in obj_info.primary_vars)
         new_primary_values = tuple(
-            var.get(to_db=True) for var in new_primary_vars)
+            var.get(to_db=True) for var in obj_info.primary_vars)
         self._alive[cls_info.cls, new_primary_values] = obj_info
-        obj_info["primary_vars"] = new_primary_vars
+        # Only the values are kept, rather than copies of the primary
+        # variables, and they're shared with the key above.
+        obj_info["primary_values"] = new_primary_values
         self._cache.add(obj_info)
 
+    def _get_cached_primary_vars(self, obj_info):
+        """Return variables with the primary key the object is cached with.
+
+        These may differ from the current primary variables of the object,
+        if it has changes to its primary key which weren't flushed yet.
+        """
+        return tuple(column.variable_factory(value=value, from_db=True)
+                     for column, value in zip(obj_info.cls_info.primary_key,
+                                              obj_info["primary_values"]))
+
     def _remove_from_alive(self, obj_info):
         """Remove an object from the cache.
 
@@ -829,23 +1658,23 @@ class Store(object):
         deleted and flushed.  Objects that are unused will get removed
         from the cache dictionary automatically by their weakref callbacks.
         """
-        primary_vars = obj_info.get("primary_vars")
-        if primary_vars is not None:
+        primary_values = obj_info.get("primary_values")
+        if primary_values is not None:
             self._cache.remove(obj_info)
-            primary_values = tuple(var.get(to_db=True) for var in primary_vars)
             del self._alive[obj_info.cls_info.cls, primary_values]
-            del obj_info["primary_vars"]
+            del obj_info["primary_values"]
 
     def _iter_alive(self):
         return self._alive.values()
 
     def _enable_change_notification(self, obj_info):
-        obj_info.event.emit("start-tracking-changes", self._event)
-        obj_info.event.hook("changed", self._variable_changed)
+        _hook_class(obj_info.cls_info)
+        obj_info["notify_changes"] = True
+        obj_info.emit("start-tracking-changes", self._event)
 
     def _disable_change_notification(self, obj_info):
-        obj_info.event.unhook("changed", self._variable_changed)
-        obj_info.event.emit("stop-tracking-changes", self._event)
+        obj_info.pop("notify_changes", None)
+        obj_info.emit("stop-tracking-changes", self._event)
 
     def _variable_changed(self, obj_info, variable,
                           old_value, new_value, fromdb):
@@ -853,6 +1682,14 @@ class Store(object):
         # database don't mark the object as dirty again.
         # XXX The fromdb check is untested. How to test it?
         if not fromdb:
+            if new_value is not AutoReload:
+                # Remember changed variables, so that flushing an
+                # object doesn't have to inspect all of its columns.
+                changes = obj_info.get("changes")
+                if changes is None:
+                    obj_info["changes"] = set((variable,))
+                else:
+                    changes.add(variable)
             if new_value is not Undef and new_value is not AutoReload:
                 if obj_info.get("invalidated"):
                     # This might be a previously alive object being
@@ -863,44 +1700,80 @@ class Store(object):
 
 
     def _enable_lazy_resolving(self, obj_info):
-        obj_info.event.hook("resolve-lazy-value", self._resolve_lazy_value)
-
-    def _disable_lazy_resolving(self, obj_info):
-        obj_info.event.unhook("resolve-lazy-value", self._resolve_lazy_value)
+        # Lazy values are resolved for objects in the store which aren't
+        # pending removal.
+        _hook_class(obj_info.cls_info)
 
     def _resolve_lazy_value(self, obj_info, variable, lazy_value):
         """Resolve a variable set to a lazy value when it's touched.
 
-        This method is hooked into the obj_info to resolve variables
-        set to lazy values when they're accessed.  It will first flush
-        the store, and then set all variables set to AutoReload to
-        their database values.
+        This method is hooked into the class of obj_info to resolve
+        variables set to lazy values when they're accessed.  It will
+        first flush the store, and then set all variables set to
+        AutoReload to their database values.
         """
+        if obj_info.get("pending") is PENDING_REMOVE:
+            return
         if lazy_value is not AutoReload and not isinstance(lazy_value, Expr):
             # It's not something we handle.
             return
 
-        # XXX This will do it for now, but it should really flush
-        #     just this single object and ones that it depends on.
-        #     _flush_one() doesn't consider dependencies, so it may
-        #     not be used directly.  Maybe allow flush(obj)?
         if self._implicit_flush_block_count == 0:
-            self.flush()
+            # Flushing this object and the ones it depends on is enough
+            # for reloading it, but expressions may use other tables,
+            # which are only known with table-aware flushes.
+            if lazy_value is AutoReload:
+                self.flush(obj_info)
+            elif not self._table_aware_flushes:
+                self.flush()
+            else:
+                uses_table = self._get_table_selector(lazy_value)
+                self._flush_selected(lambda other_info:
+                                     other_info is obj_info or
+                                     uses_table(other_info))
+
+        if (obj_info.get("invalidated") and
+            self._reload_invalidated_batch(obj_info)):
+            return
 
         autoreload_columns = []
+        variables = obj_info.variables
         for column in obj_info.cls_info.columns:
-            if obj_info.variables[column].get_lazy() is AutoReload:
+            if column in variables:
+                state = variables[column].get_lazy()
+            else:
+                state = variables.get_state(column)
+            if state is AutoReload:
                 autoreload_columns.append(column)
 
         if autoreload_columns:
             where = compare_columns(obj_info.cls_info.primary_key,
-                                    obj_info["primary_vars"])
+                                    self._get_cached_primary_vars(obj_info))
             result = self._connection.execute(
                 Select(autoreload_columns, where))
             self._set_values(obj_info, autoreload_columns,
                              result, result.get_one())
 
 
+class DeferredGet(object):
+    """An object requested with L{Store.get_deferred}."""
+
+    def __init__(self, store, cls):
+        self._store = store
+        self._cls = cls
+        self._obj = Undef
+
+    def get(self):
+        """Return the requested object, or None if it wasn't found.
+
+        If the object wasn't retrieved yet, it's retrieved together with
+        all other outstanding requests for objects of the same class.
+        """
+        if self._obj is Undef:
+            self._store._resolve_deferred(self._cls)
+        return self._obj
+
+
 class ResultSet(object):
     """The representation of the results of a query.
 
@@ -925,6 +1798,7 @@ class ResultSet(object):
         self._distinct = False
         self._group_by = Undef
         self._having = Undef
+        self._readonly = store._readonly
 
     def copy(self):
         """Return a copy of this ResultSet object, with the same configuration.
@@ -937,7 +1811,7 @@ class ResultSet(object):
             result_set._select = copy(self._select)
         return result_set
 
-    def config(self, distinct=None, offset=None, limit=None):
+    def config(self, distinct=None, offset=None, limit=None, readonly=None):
         """Configure this result object in-place. All parameters are optional.
 
         @param distinct: Boolean enabling/disabling usage of the DISTINCT
@@ -946,6 +1820,10 @@ class ResultSet(object):
             from the result set.
         @param limit: Limit the number of objects retrieved from the
             result set.
+        @param readonly: Boolean enabling/disabling loading of read-only
+            objects.  These are neither cached nor tracked for changes
+            by the store, and assigning to their attributes raises
+            L{ReadOnlyObjectError}.
 
         @return: self (not a copy).
         """
@@ -956,6 +1834,8 @@ class ResultSet(object):
             self._offset = offset
         if limit is not None:
             self._limit = limit
+        if readonly is not None:
+            self._readonly = readonly
         return self
 
     def _get_select(self):
@@ -973,15 +1853,21 @@ class ResultSet(object):
                       distinct=self._distinct, group_by=self._group_by,
                       having=self._having)
 
-    def _load_objects(self, result, values):
-        return self._find_spec.load_objects(self._store, result, values)
+    def _load_objects(self, result, values, batch=None):
+        return self._find_spec.load_objects(self._store, result, values,
+                                            batch, self._readonly)
 
     def __iter__(self):
         """Iterate the results of the query.
         """
         result = self._store._connection.execute(self._get_select())
+        if self._readonly:
+            batch = None
+        else:
+            # Objects loaded together are revalidated together later.
+            batch = WeakKeyDictionary()
         for values in result:
-            yield self._load_objects(result, values)
+            yield self._load_objects(result, values, batch)
 
     def __getitem__(self, index):
         """Get an individual item by offset, or a range of items by slice.
@@ -1319,6 +2205,36 @@ class ResultSet(object):
                     result.set_variable(variable, value)
                 yield tuple(variable.get() for variable in variables)
 
+    def rows(self):
+        """Retrieve the results as rows instead of objects.
+
+        Classes in the find spec are represented by instances of their
+        L{ClassInfo.row_class <storm.info.ClassInfo.row_class>}, holding
+        the converted values of their columns, and expressions by their
+        values.  No objects are loaded, so the store neither caches nor
+        tracks changes in these rows.
+
+        @return: An iterator of rows, or of tuples of rows and values if
+            the find spec is a tuple.
+        """
+        result = self._store._connection.execute(self._get_select())
+        return self._find_spec.load_rows(result, result)
+
+    def copy_out(self, fileobj, format="csv"):
+        """Write the results to a file, without loading or converting them.
+
+        On PostgreSQL, the query is wrapped in a C{COPY ... TO STDOUT}
+        and the server streams rows to the file by itself.  Other
+        backends write rows as they're fetched.  Values of columns are
+        written as the database returns them, and NULL values as empty
+        fields.
+
+        @param fileobj: The file object results are written to.
+        @param format: The format results are written in.  Only C{"csv"}
+            is supported.
+        """
+        self._store._connection.copy_out(self._get_select(), fileobj, format)
+
     def set(self, *args, **kwargs):
         """Update objects in the result set with the given arguments.
 
@@ -1466,7 +2382,9 @@ class ResultSet(object):
             raise FeatureError("Incompatible results for set operation")
 
         expr = expr_cls(self._get_select(), other._get_select(), all=all)
-        return ResultSet(self._store, self._find_spec, select=expr)
+        result_set = ResultSet(self._store, self._find_spec, select=expr)
+        result_set._readonly = self._readonly
+        return result_set
 
     def union(self, other, all=False):
         """Get the L{Union} of this result set and another.
@@ -1520,7 +2438,7 @@ class EmptyResultSet(object):
         result = EmptyResultSet(self._order_by)
         return result
 
-    def config(self, distinct=None, offset=None, limit=None):
+    def config(self, distinct=None, offset=None, limit=None, readonly=None):
         pass
 
     def __iter__(self):
@@ -1596,6 +2514,13 @@ class EmptyResultSet(object):
         return
         yield None
 
+    def rows(self):
+        return iter(())
+
+    def copy_out(self, fileobj, format="csv"):
+        if format != "csv":
+            raise ValueError("Unsupported copy format: %r" % (format,))
+
     def set(self, *args, **kwargs):
         pass
 
@@ -1635,10 +2560,14 @@ class TableSet(object):
 
         @return: A L{ResultSet}.
         """
-        if self._store._implicit_flush_block_count == 0:
-            self._store.flush()
         find_spec = FindSpec(cls_spec)
         where = get_where_for_args(args, kwargs, find_spec.default_cls)
+        if not self._store._readonly:
+            if self._store._table_aware_flushes:
+                self._store._implicit_flush(
+                    find_spec.get_select(where, self._tables))
+            else:
+                self._store._implicit_flush()
         return self._store._result_set_factory(self._store, find_spec,
                                                where, self._tables)
 
@@ -1673,6 +2602,11 @@ class FindSpec(object):
             self.default_cls_info = None
             self.default_order = Undef
 
+    def get_select(self, where=Undef, tables=Undef):
+        """Return a L{Select} for this find spec and the given arguments."""
+        columns, default_tables = self.get_columns_and_tables()
+        return Select(columns, where, tables, default_tables)
+
     def get_columns_and_tables(self):
         columns = []
         default_tables = []
@@ -1698,7 +2632,8 @@ class FindSpec(object):
                 return False
         return True
 
-    def load_objects(self, store, result, values):
+    def load_objects(self, store, result, values, batch=None,
+                     readonly=False):
         objects = []
         values_start = values_end = 0
         for is_expr, info in self._cls_spec_info:
@@ -1709,8 +2644,13 @@ class FindSpec(object):
                 objects.append(variable.get())
             else:
                 values_end += len(info.columns)
-                obj = store._load_object(info, result,
-                                         values[values_start:values_end])
+                if readonly:
+                    obj = store._load_readonly_object(
+                        info, result, values[values_start:values_end])
+                else:
+                    obj = store._load_object(info, result,
+                                             values[values_start:values_end],
+                                             batch)
                 objects.append(obj)
             values_start = values_end
         if self.is_tuple:
@@ -1718,6 +2658,40 @@ class FindSpec(object):
         else:
             return objects[0]
 
+    def load_rows(self, result, rows):
+        """Convert raw C{rows} of C{result} into records and values."""
+        loaders = []
+        for is_expr, info in self._cls_spec_info:
+            if is_expr:
+                variable = getattr(info, "variable_factory", Variable)()
+                loaders.append((None, (variable,)))
+            else:
+                loaders.append((info.row_class,
+                                tuple(column.variable_factory()
+                                      for column in info.columns)))
+        for values in rows:
+            items = []
+            values_start = 0
+            for row_class, variables in loaders:
+                row_values = []
+                for variable, value in zip(variables, values[values_start:]):
+                    if value is not None:
+                        result.set_variable(variable, value)
+                        value = variable.get()
+                    row_values.append(value)
+                values_start += len(variables)
+                if row_class is None:
+                    items.append(row_values[0])
+                elif row_values.count(None) == len(row_values):
+                    # A left join didn't find a row for the class.
+                    items.append(None)
+                else:
+                    items.append(row_class(*row_values))
+            if self.is_tuple:
+                yield tuple(items)
+            else:
+                yield items[0]
+
     def get_columns_and_values_for_item(self, item):
         """Generate a comparison expression with the given item."""
         if isinstance(item, tuple):
@@ -1747,6 +2721,10 @@ class FindSpec(object):
         return columns, values
 
 
+# Compiled patterns finding table names in SQL statements.
+_table_patterns = {}
+
+
 def get_where_for_args(args, kwargs, cls=None):
     equals = list(args)
     if kwargs:
@@ -1760,6 +2738,45 @@ def get_where_for_args(args, kwargs, cls=None):
     return Undef
 
 
+def _hook_class(cls_info):
+    """Hook the store callbacks into the event system of a class.
+
+    Callbacks are shared by all objects of the class and all stores,
+    rather than hooked into each object, and are dispatched to the store
+    of the object, if any.  Each class is only hooked once, so the cost
+    of an event doesn't depend on the number of stores.
+    """
+    if "store_hooked" not in cls_info:
+        cls_info.event.hook("changed", _variable_changed)
+        cls_info.event.hook("resolve-lazy-value", _resolve_lazy_value)
+        cls_info["store_hooked"] = True
+
+def _variable_changed(cls_info, obj_info, variable, old_value, new_value,
+                      fromdb):
+    store = obj_info.get("store")
+    if store is not None and "notify_changes" in obj_info:
+        store._variable_changed(obj_info, variable, old_value, new_value,
+                                fromdb)
+
+def _resolve_lazy_value(cls_info, obj_info, variable, lazy_value):
+    store = obj_info.get("store")
+    if store is not None:
+        store._resolve_lazy_value(obj_info, variable, lazy_value)
+
+
+def compare_primary_keys(primary_key, primary_vars_list):
+    """Return an expression matching any of the given primary keys.
+
+    @param primary_key: Tuple of primary key columns.
+    @param primary_vars_list: A sequence of primary variable tuples.
+    """
+    if len(primary_key) == 1:
+        return primary_key[0].is_in([primary_vars[0]
+                                     for primary_vars in primary_vars_list])
+    return Or(*[compare_columns(primary_key, primary_vars)
+                for primary_vars in primary_vars_list])
+
+
 def replace_columns(expr, columns):
     if isinstance(expr, Select):
         select = copy(expr)
@@ -37,6 +37,23 @@ class DebugTracer(object):
         self._stream.write("[%s] DONE\n" % time)
         self._stream.flush()
 
+    def connection_raw_execute_many(self, connection, raw_cursor, statement,
+                                    batch_size):
+        time = datetime.now().isoformat()[11:]
+        self._stream.write("[%s] EXECUTE MANY: %r, %d times\n"
+                           % (time, statement, batch_size))
+        self._stream.flush()
+
+    def connection_raw_execute_many_error(self, connection, raw_cursor,
+                                          statement, batch_size, error):
+        self.connection_raw_execute_error(connection, raw_cursor,
+                                          statement, (), error)
+
+    def connection_raw_execute_many_success(self, connection, raw_cursor,
+                                            statement, batch_size):
+        self.connection_raw_execute_success(connection, raw_cursor,
+                                            statement, ())
+
 
 class TimeoutTracer(object):
     """Provide a timeout facility for connections to prevent rogue operations.
@@ -82,6 +99,20 @@ class TimeoutTracer(object):
         raise NotImplementedError("%s.connection_raw_execute_error() must be "
                                   "implemented" % self.__class__.__name__)
 
+    def connection_raw_execute_many(self, connection, raw_cursor, statement,
+                                    batch_size):
+        """Check timeout conditions before a batch is executed.
+
+        The whole batch is bound by the timeout of a single statement.
+        """
+        self.connection_raw_execute(connection, raw_cursor, statement, ())
+
+    def connection_raw_execute_many_error(self, connection, raw_cursor,
+                                          statement, batch_size, error):
+        """Raise TimeoutError if the given error was a timeout issue."""
+        self.connection_raw_execute_error(connection, raw_cursor,
+                                          statement, (), error)
+
     def set_statement_timeout(self, raw_cursor, remaining_time):
         """Perform the timeout setup in the raw cursor.
 
@@ -542,11 +542,24 @@ class MutableValueVariable(Variable):
     of variable, we can't simply detect when a modification has been made, so
     we have to synchronize the content of the variable when the store is
     flushing current objects, to check if the state has changed.
+
+    By default, changes are detected by comparing the serialized state of
+    the value, which is computed on every check.  With
+    C{change_detection="copy"}, a copy of the value is kept when
+    checkpointing instead, and later compared to the value for equality,
+    which is usually much cheaper for large values.  It requires values
+    to define a meaningful equality, otherwise unchanged values will be
+    considered changed.
     """
-    __slots__ = ("_event_system")
+    __slots__ = ("_event_system", "_copy_checkpoint")
 
     def __init__(self, *args, **kwargs):
         self._event_system = None
+        change_detection = kwargs.pop("change_detection", "pickle")
+        if change_detection not in ("pickle", "copy"):
+            raise ValueError("Invalid change detection: %r"
+                             % (change_detection,))
+        self._copy_checkpoint = (change_detection == "copy")
         Variable.__init__(self, *args, **kwargs)
         if self.event is not None:
             self.event.hook("start-tracking-changes", self._start_tracking)
@@ -560,9 +573,27 @@ class MutableValueVariable(Variable):
         event_system.unhook("flush", self._detect_changes)
         self._event_system = None
 
+    def _get_checkpoint_state(self):
+        if not self._copy_checkpoint:
+            return self.get_state()
+        value = self._value
+        if value is not Undef and value is not None:
+            value = pickle.loads(pickle.dumps(value, -1))
+        return (self._lazy_value, value)
+
+    def _state_changed(self):
+        if not self._copy_checkpoint:
+            return self.get_state() != self._checkpoint_state
+        return (self._lazy_value, self._value) != self._checkpoint_state
+
+    def has_changed(self):
+        return self._lazy_value is not Undef or self._state_changed()
+
+    def checkpoint(self):
+        self._checkpoint_state = self._get_checkpoint_state()
+
     def _detect_changes(self, obj_info):
-        if (self._checkpoint_state is not Undef and
-            self.get_state() != self._checkpoint_state):
+        if (self._checkpoint_state is not Undef and self._state_changed()):
             self.event.emit("changed", self, None, self._value, False)
     
     def _detect_changes_and_stop(self, obj_info):
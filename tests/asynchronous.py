@@ -0,0 +1,188 @@
+import threading
+
+from storm.asynchronous import AsyncStore, AsyncResultSet, Future
+from storm.database import create_database
+from storm.exceptions import FeatureError, NotOneError
+from storm.properties import Int, Unicode
+from storm.store import Store
+
+from tests.helper import TestHelper
+
+
+class Foo(object):
+    __storm_table__ = "foo"
+    id = Int(primary=True)
+    title = Unicode()
+
+
+class AsyncStoreTest(TestHelper):
+
+    def setUp(self):
+        TestHelper.setUp(self)
+        self.store = AsyncStore(create_database("sqlite:"))
+        self.store.execute("CREATE TABLE foo "
+                           "(id INTEGER PRIMARY KEY, title VARCHAR)")
+        for id in range(10, 60, 10):
+            self.store.execute("INSERT INTO foo VALUES (?, ?)",
+                               (id, u"Title %d" % id))
+        self.store.commit().result()
+
+    def tearDown(self):
+        self.store.close().result()
+        TestHelper.tearDown(self)
+
+    def test_run(self):
+        threads = []
+        def function(store, arg, kwarg=None):
+            threads.append(threading.currentThread())
+            return store, arg, kwarg
+        future = self.store.run(function, 1, kwarg=2)
+        store, arg, kwarg = future.result()
+        self.assertTrue(isinstance(store, Store))
+        self.assertEquals((arg, kwarg), (1, 2))
+        self.assertNotEquals(threads, [threading.currentThread()])
+
+    def test_run_uses_a_single_thread(self):
+        threads = set()
+        for i in range(5):
+            future = self.store.run(
+                lambda store: threads.add(threading.currentThread()))
+        future.result()
+        self.assertEquals(len(threads), 1)
+
+    def test_run_error(self):
+        def function(store):
+            raise ZeroDivisionError()
+        future = self.store.run(function)
+        self.assertRaises(ZeroDivisionError, future.result)
+        self.assertTrue(isinstance(future.exception(), ZeroDivisionError))
+        self.assertTrue(future.done())
+
+    def test_add_done_callback(self):
+        event = threading.Event()
+        done = []
+        future = self.store.run(lambda store: event.wait())
+        future.add_done_callback(done.append)
+        self.assertEquals(done, [])
+        event.set()
+        # Callbacks run after waiters are woken up, but before the next
+        # call in the queue starts.
+        self.store.run(lambda store: None).result()
+        self.assertEquals(done, [future])
+        future.add_done_callback(done.append)
+        self.assertEquals(done, [future, future])
+
+    def test_execute(self):
+        future = self.store.execute("SELECT id FROM foo WHERE id < ?", (30,))
+        self.assertTrue(isinstance(future, Future))
+        self.assertEquals(future.result(), [(10,), (20,)])
+
+    def test_execute_noresult(self):
+        future = self.store.execute("DELETE FROM foo", noresult=True)
+        self.assertEquals(future.result(), None)
+
+    def test_get(self):
+        foo = self.store.get(Foo, 20).result()
+        self.assertEquals((foo.id, foo.title), (20, "Title 20"))
+        self.assertEquals(self.store.get(Foo, 25).result(), None)
+
+    def test_add_commit(self):
+        foo = Foo()
+        foo.id = 60
+        foo.title = u"Title 60"
+        self.store.add(foo)
+        self.store.commit()
+        self.store.rollback()
+        self.assertTrue(self.store.get(Foo, 60).result() is foo)
+
+    def test_remove_flush(self):
+        foo = self.store.get(Foo, 20).result()
+        self.store.remove(foo)
+        self.store.flush().result()
+        self.assertEquals(self.store.find(Foo).count().result(), 4)
+
+    def test_find(self):
+        result = self.store.find(Foo, Foo.id > 20)
+        self.assertTrue(isinstance(result, AsyncResultSet))
+        self.assertEquals(result.count().result(), 3)
+        self.assertEquals(result.is_empty().result(), False)
+        self.assertEquals(result.any().result().id > 20, True)
+
+    def test_find_order_by(self):
+        result = self.store.find(Foo).order_by(Foo.id)
+        self.assertEquals(result.first().result().id, 10)
+        self.assertEquals(result.last().result().id, 50)
+        self.assertEquals([foo.id for foo in result.all().result()],
+                          [10, 20, 30, 40, 50])
+
+    def test_find_config(self):
+        result = self.store.find(Foo.title).config(distinct=True)
+        self.store.execute("UPDATE foo SET title='Title'")
+        self.assertEquals(result.all().result(), [u"Title"])
+
+    def test_find_one(self):
+        self.assertEquals(self.store.find(Foo, id=30).one().result().id, 30)
+        self.assertRaises(NotOneError, self.store.find(Foo).one().result)
+
+    def test_find_set_remove(self):
+        self.store.find(Foo, Foo.id < 30).set(title=u"New title")
+        self.store.find(Foo, Foo.id > 30).remove()
+        titles = self.store.find(Foo.title).order_by(Foo.id).all().result()
+        self.assertEquals(titles, [u"New title", u"New title", u"Title 30"])
+
+    def test_find_config_error(self):
+        result = self.store.find(Foo).config(unknown=True)
+        self.assertRaises(TypeError, result.all().result)
+        self.assertRaises(TypeError, result.count().result)
+
+    def test_find_order_by_error(self):
+        result = self.store.find(Foo).config(limit=1).order_by(Foo.id)
+        self.assertRaises(FeatureError, result.all().result)
+
+    def get_chunks(self, result, size):
+        chunks = []
+        for future in result.chunks(size):
+            foos, has_more = future.result()
+            chunks.append([foo.id for foo in foos])
+            if not has_more:
+                return chunks
+
+    def test_find_chunks(self):
+        result = self.store.find(Foo).order_by(Foo.id)
+        self.assertEquals(self.get_chunks(result, 2),
+                          [[10, 20], [30, 40], [50]])
+
+    def test_find_chunks_exact(self):
+        result = self.store.find(Foo, Foo.id < 50).order_by(Foo.id)
+        self.assertEquals(self.get_chunks(result, 2), [[10, 20], [30, 40]])
+
+    def test_find_chunks_empty(self):
+        result = self.store.find(Foo, Foo.id > 50)
+        self.assertEquals(self.get_chunks(result, 2), [[]])
+
+    def test_find_chunks_dont_wait(self):
+        event = threading.Event()
+        self.store.run(lambda store: event.wait())
+        chunks = self.store.find(Foo).order_by(Foo.id).chunks(2)
+        futures = [chunks.next() for i in range(4)]
+        self.assertFalse(futures[0].done())
+        event.set()
+        self.assertEquals([([foo.id for foo in foos], has_more)
+                           for foos, has_more in
+                           (future.result() for future in futures)],
+                          [([10, 20], True), ([30, 40], True),
+                           ([50], False), ([], False)])
+
+    def test_stores_run_concurrently(self):
+        event = threading.Event()
+        other_store = AsyncStore(create_database("sqlite:"))
+        self.addCleanup(lambda: other_store.close().result())
+        future = self.store.run(lambda store: event.wait())
+        other_store.run(lambda store: event.set()).result()
+        future.result()
+
+    def test_close(self):
+        store = AsyncStore(create_database("sqlite:"))
+        store.close().result()
+        store._thread.join()
+        self.assertFalse(store._thread.isAlive())
@@ -200,6 +200,22 @@ class TestGenerationalCache(BaseCacheTest):
         self.obj3 = StubObjectInfo(3)
         self.obj4 = StubObjectInfo(4)
 
+    def test_adding_similar_obj_infos(self):
+        """If __eq__ is broken, this fails.
+
+        Objects within a generation aren't ordered.
+        """
+        obj_info1 = get_obj_info(StubClass())
+        obj_info2 = get_obj_info(StubClass())
+        cache = self.Cache(5)
+        cache.add(obj_info1)
+        cache.add(obj_info2)
+        cache.add(obj_info2)
+        cache.add(obj_info1)
+        self.assertEquals(
+            sorted([hash(obj_info) for obj_info in cache.get_cached()]),
+            sorted([hash(obj_info1), hash(obj_info2)]))
+
     def test_initially_empty(self):
         cache = GenerationalCache()
         self.assertEqual(cache.get_cached(), [])
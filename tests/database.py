@@ -21,9 +21,12 @@
 import sys
 import new
 import gc
+import threading
 
-from storm.exceptions import ClosedError, DatabaseError, DisconnectionError
-from storm.variables import Variable
+from storm.exceptions import (
+    ClosedError, ConnectionBlockedError, DatabaseError, DisconnectionError,
+    PoolTimeoutError)
+from storm.variables import Variable, IntVariable
 import storm.database
 from storm.database import *
 from storm.tracer import install_tracer, remove_all_tracers, DebugTracer
@@ -76,6 +79,9 @@ class RawCursor(object):
     def execute(self, statement, params=marker):
         self.executed.append((statement, params))
 
+    def executemany(self, statement, params_list):
+        self.executed.append(("MANY", statement, list(params_list)))
+
     def fetchone(self):
         if self._fetchone_data:
             return self._fetchone_data.pop(0)
@@ -118,6 +124,21 @@ class FakeTracer(object):
         self.seen.append(("ERROR", connection, type(raw_cursor),
                           statement, params, error))
 
+    def connection_raw_execute_many(self, connection, raw_cursor,
+                                    statement, batch_size):
+        self.seen.append(("EXECUTE MANY", connection, type(raw_cursor),
+                          statement, batch_size))
+
+    def connection_raw_execute_many_success(self, connection, raw_cursor,
+                                            statement, batch_size):
+        self.seen.append(("SUCCESS MANY", connection, type(raw_cursor),
+                          statement, batch_size))
+
+    def connection_raw_execute_many_error(self, connection, raw_cursor,
+                                          statement, batch_size, error):
+        self.seen.append(("ERROR MANY", connection, type(raw_cursor),
+                          statement, batch_size, error))
+
 
 class DatabaseTest(TestHelper):
 
@@ -126,7 +147,8 @@ class DatabaseTest(TestHelper):
         self.database = Database()
 
     def test_connect(self):
-        self.assertRaises(NotImplementedError, self.database.connect)
+        connection = self.database.connect()
+        self.assertRaises(NotImplementedError, connection.execute, "SELECT 1")
 
 
 class ConnectionTest(TestHelper):
@@ -193,6 +215,67 @@ class ConnectionTest(TestHelper):
         self.connection.close()
         self.assertRaises(ClosedError, self.connection.execute, "SELECT 1")
 
+    def test_execute_many(self):
+        result = self.connection.execute_many(
+            "something ?", iter([(1,), (IntVariable(2),)]))
+        self.assertEquals(result, None)
+        self.assertEquals(self.executed,
+                          [("MANY", "something ?", [(1,), (2,)]), "RCLOSE"])
+
+    def test_execute_many_convert_param_style(self):
+        class MyConnection(Connection):
+            param_mark = "%s"
+        connection = MyConnection(self.database)
+        connection.execute_many("'?' ? '?'", [(1,)])
+        self.assertEquals(self.executed,
+                          [("MANY", "'?' %s '?'", [(1,)]), "RCLOSE"])
+
+    def test_execute_many_expr(self):
+        insert = Insert((SQLToken("column1"),), SQLToken("table1"),
+                        values=[(SQLRaw("?"),)])
+        self.connection.execute_many(insert, [(1,), (2,)])
+        self.assertEquals(self.executed,
+                          [("MANY", "INSERT INTO table1 (column1) VALUES (?)",
+                            [(1,), (2,)]),
+                           "RCLOSE"])
+
+    def test_execute_many_expr_with_parameters(self):
+        select = Select(Eq(SQLToken("column1"), 1))
+        self.assertRaises(ValueError, self.connection.execute_many,
+                          select, [()])
+
+    def test_execute_many_closed(self):
+        self.connection.close()
+        self.assertRaises(ClosedError, self.connection.execute_many,
+                          "something", [()])
+
+    def test_execute_many_tracing(self):
+        tracer = FakeTracer()
+        install_tracer(tracer)
+        self.connection.execute_many("something", [(1,), (2,), (3,)])
+        self.assertEquals(tracer.seen,
+                          [("EXECUTE MANY", self.connection, RawCursor,
+                            "something", 3),
+                           ("SUCCESS MANY", self.connection, RawCursor,
+                            "something", 3)])
+
+    def test_execute_many_error_tracing(self):
+        cursor_mock = self.mocker.patch(RawCursor)
+        cursor_mock.executemany(ARGS)
+        error = ZeroDivisionError()
+        self.mocker.throw(error)
+        self.mocker.replay()
+
+        tracer = FakeTracer()
+        install_tracer(tracer)
+        self.assertRaises(ZeroDivisionError, self.connection.execute_many,
+                          "something", [(1,)])
+        self.assertEquals(tracer.seen,
+                          [("EXECUTE MANY", self.connection, RawCursor,
+                            "something", 1),
+                           ("ERROR MANY", self.connection, RawCursor,
+                            "something", 1, error)])
+
     def test_raw_execute_tracing(self):
         self.assertMethodsMatch(FakeTracer, DebugTracer)
         tracer = FakeTracer()
@@ -275,30 +358,128 @@ class ConnectionTest(TestHelper):
         self.assertRaises(DisconnectionError,
                           self.connection.execute, "something")
 
+    def test_connect_lazily(self):
+        def connect():
+            raise DatabaseError("Connection tried to connect")
+        self.database.raw_connect = connect
+        connection = Connection(self.database)
+        self.assertEquals(connection._raw_connection, None)
+        connection.commit()
+        connection.rollback()
+        connection.close()
+
+    def test_connect_on_execute(self):
+        self.connection.execute("something", noresult=True)
+        self.assertTrue(self.connection._raw_connection is self.raw_connection)
+        self.assertEqual(self.connection._state,
+                         storm.database.STATE_CONNECTED)
+
+    def test_connect_failure_on_execute(self):
+        def connect():
+            raise DatabaseError("could not connect")
+        self.database.raw_connect = connect
+        connection = Connection(self.database)
+        self.assertRaises(DisconnectionError, connection.execute, "something")
+
     def test_commit(self):
+        self.connection.execute("something", noresult=True)
         self.connection.commit()
-        self.assertEquals(self.executed, ["COMMIT"])
+        self.assertEquals(self.executed,
+                          [("something", marker), "RCLOSE", "COMMIT"])
+
+    def test_commit_without_execute(self):
+        self.connection.commit()
+        self.assertEquals(self.executed, [])
 
     def test_rollback(self):
+        self.connection.execute("something", noresult=True)
         self.connection.rollback()
-        self.assertEquals(self.executed, ["ROLLBACK"])
+        self.assertEquals(self.executed,
+                          [("something", marker), "RCLOSE", "ROLLBACK"])
 
     def test_close(self):
+        self.connection.execute("something", noresult=True)
         self.connection.close()
-        self.assertEquals(self.executed, ["CCLOSE"])
+        self.assertEquals(self.executed,
+                          [("something", marker), "RCLOSE", "CCLOSE"])
 
     def test_close_twice(self):
+        self.connection.execute("something", noresult=True)
         self.connection.close()
         self.connection.close()
+        self.assertEquals(self.executed,
+                          [("something", marker), "RCLOSE", "CCLOSE"])
+
+    def test_pipelined_execute_noresult(self):
+        self.connection.pipelined = True
+        self.assertEquals(self.connection.execute("one", noresult=True),
+                          None)
+        self.connection.execute("two ?", (1,), noresult=True)
+        self.assertEquals(self.executed, [])
+        result = self.connection.execute("three")
+        self.assertTrue(isinstance(result, Result))
+        self.assertEquals(self.executed,
+                          [("one", marker), "RCLOSE", ("two ?", (1,)),
+                           "RCLOSE", ("three", marker)])
+
+    def test_pipelined_copies_variables(self):
+        self.connection.pipelined = True
+        variable = IntVariable(1)
+        self.connection.execute("something ?", (variable,), noresult=True)
+        variable.set(2)
+        self.connection.flush_pipeline()
+        self.assertEquals(self.executed, [("something ?", (1,)), "RCLOSE"])
+
+    def test_pipelined_flush_pipeline(self):
+        self.connection.pipelined = True
+        self.connection.execute("something", noresult=True)
+        self.connection.flush_pipeline()
+        self.connection.flush_pipeline()
+        self.assertEquals(self.executed, [("something", marker), "RCLOSE"])
+
+    def test_pipelined_execute_many(self):
+        self.connection.pipelined = True
+        self.connection.execute("one", noresult=True)
+        self.connection.execute_many("two", [()])
+        self.assertEquals(self.executed,
+                          [("one", marker), "RCLOSE", ("MANY", "two", [()]),
+                           "RCLOSE"])
+
+    def test_pipelined_commit(self):
+        self.connection.pipelined = True
+        self.connection.execute("something", noresult=True)
+        self.connection.commit()
+        self.assertEquals(self.executed,
+                          [("something", marker), "RCLOSE", "COMMIT"])
+
+    def test_pipelined_rollback(self):
+        self.connection.pipelined = True
+        self.connection.execute("something", noresult=True)
+        self.connection.rollback()
+        self.connection.commit()
+        self.assertEquals(self.executed, ["ROLLBACK", "COMMIT"])
+
+    def test_pipelined_close(self):
+        self.connection.pipelined = True
+        self.connection.execute("something", noresult=True)
+        self.connection.close()
         self.assertEquals(self.executed, ["CCLOSE"])
 
+    def test_pipelined_blocked(self):
+        self.connection.pipelined = True
+        self.connection.block_access()
+        self.assertRaises(ConnectionBlockedError, self.connection.execute,
+                          "something", noresult=True)
+
     def test_close_deallocates_raw_connection(self):
+        self.connection.execute("something", noresult=True)
         refs_before = len(gc.get_referrers(self.raw_connection))
         self.connection.close()
         refs_after = len(gc.get_referrers(self.raw_connection))
         self.assertEquals(refs_after, refs_before-1)
 
     def test_del_deallocates_raw_connection(self):
+        self.connection.execute("something", noresult=True)
         refs_before = len(gc.get_referrers(self.raw_connection))
         self.connection.__del__()
         refs_after = len(gc.get_referrers(self.raw_connection))
@@ -315,6 +496,7 @@ class ConnectionTest(TestHelper):
 
     def test_wb_ensure_connected_noop(self):
         """Check that _ensure_connected() is a no-op for STATE_CONNECTED."""
+        self.connection.execute("something", noresult=True)
         self.assertEqual(self.connection._state, storm.database.STATE_CONNECTED)
         def connect():
             raise DatabaseError("_ensure_connected() tried to connect")
@@ -358,6 +540,7 @@ class ConnectionTest(TestHelper):
         self.connection.is_disconnection_error = (
             lambda exc: isinstance(exc, FakeException))
 
+        self.connection.execute("something", noresult=True)
         self.assertEqual(self.connection._state,
                          storm.database.STATE_CONNECTED)
         # Error is converted to DisconnectionError:
@@ -380,6 +563,201 @@ class ConnectionTest(TestHelper):
                          storm.database.STATE_RECONNECT)
 
 
+class ConnectionPoolTest(TestHelper):
+
+    def setUp(self):
+        TestHelper.setUp(self)
+        self.executed = []
+        self.raw_connections = []
+        self.database = Database()
+        def raw_connect():
+            raw_connection = RawConnection(self.executed)
+            self.raw_connections.append(raw_connection)
+            return raw_connection
+        self.database.raw_connect = raw_connect
+
+    def test_checkout_connects(self):
+        pool = ConnectionPool(self.database)
+        raw_connection = pool.checkout()
+        self.assertEquals(self.raw_connections, [raw_connection])
+        self.assertEquals(pool.size, 1)
+        self.assertEquals(pool.idle_size, 0)
+
+    def test_checkout_uses_raw_connect_pooled(self):
+        raw_connection = RawConnection(self.executed)
+        self.database.raw_connect_pooled = lambda: raw_connection
+        pool = ConnectionPool(self.database)
+        self.assertTrue(pool.checkout() is raw_connection)
+        self.assertEquals(self.raw_connections, [])
+
+    def test_checkin_rolls_back(self):
+        pool = ConnectionPool(self.database)
+        pool.checkin(pool.checkout())
+        self.assertEquals(self.executed, ["ROLLBACK"])
+        self.assertEquals(pool.size, 1)
+        self.assertEquals(pool.idle_size, 1)
+
+    def test_checkout_reuses_idle(self):
+        pool = ConnectionPool(self.database)
+        raw_connection = pool.checkout()
+        pool.checkin(raw_connection)
+        self.assertTrue(pool.checkout() is raw_connection)
+        self.assertEquals(len(self.raw_connections), 1)
+
+    def test_checkout_checks_idle(self):
+        pool = ConnectionPool(self.database)
+        pool.checkin(pool.checkout())
+        del self.executed[:]
+        pool.checkout()
+        self.assertEquals(self.executed,
+                          [("SELECT 1", marker), "RCLOSE", "ROLLBACK"])
+
+    def test_checkout_without_check(self):
+        pool = ConnectionPool(self.database, check=False)
+        pool.checkin(pool.checkout())
+        del self.executed[:]
+        pool.checkout()
+        self.assertEquals(self.executed, [])
+
+    def test_checkout_discards_dead(self):
+        pool = ConnectionPool(self.database)
+        raw_connection = pool.checkout()
+        pool.checkin(raw_connection)
+        def cursor():
+            raise DatabaseError("connection closed")
+        raw_connection.cursor = cursor
+        new_raw_connection = pool.checkout()
+        self.assertTrue(new_raw_connection is not raw_connection)
+        self.assertEquals(self.executed, ["ROLLBACK", "CCLOSE"])
+        self.assertEquals(pool.size, 1)
+
+    def test_max_lifetime(self):
+        pool = ConnectionPool(self.database, max_lifetime=0)
+        raw_connection = pool.checkout()
+        pool.checkin(raw_connection)
+        self.assertEquals(self.executed, ["ROLLBACK", "CCLOSE"])
+        self.assertEquals(pool.size, 0)
+        self.assertTrue(pool.checkout() is not raw_connection)
+
+    def test_max_size(self):
+        pool = ConnectionPool(self.database, max_size=1, timeout=0)
+        raw_connection = pool.checkout()
+        self.assertRaises(PoolTimeoutError, pool.checkout)
+        pool.checkin(raw_connection)
+        self.assertTrue(pool.checkout() is raw_connection)
+
+    def test_max_size_waits(self):
+        pool = ConnectionPool(self.database, max_size=1, timeout=5)
+        raw_connection = pool.checkout()
+        timer = threading.Timer(0.1, pool.checkin, (raw_connection,))
+        timer.start()
+        self.addCleanup(timer.join)
+        self.assertTrue(pool.checkout() is raw_connection)
+
+    def test_min_idle(self):
+        pool = ConnectionPool(self.database, min_idle=2)
+        self.assertEquals(len(self.raw_connections), 2)
+        self.assertEquals(pool.idle_size, 2)
+
+    def test_min_idle_reopens_discarded(self):
+        pool = ConnectionPool(self.database, min_idle=1)
+        pool.discard(pool.checkout())
+        self.assertEquals(len(self.raw_connections), 2)
+        self.assertEquals(pool.idle_size, 1)
+
+    def test_min_idle_bounded_by_max_size(self):
+        pool = ConnectionPool(self.database, max_size=1, min_idle=2)
+        self.assertEquals(pool.size, 1)
+
+    def test_discard(self):
+        pool = ConnectionPool(self.database)
+        pool.discard(pool.checkout())
+        self.assertEquals(self.executed, ["CCLOSE"])
+        self.assertEquals(pool.size, 0)
+
+    def test_close(self):
+        pool = ConnectionPool(self.database)
+        raw_connection1 = pool.checkout()
+        raw_connection2 = pool.checkout()
+        pool.checkin(raw_connection1)
+        pool.close()
+        self.assertEquals(self.executed, ["ROLLBACK", "CCLOSE"])
+        pool.checkin(raw_connection2)
+        self.assertEquals(self.executed, ["ROLLBACK", "CCLOSE",
+                                          "ROLLBACK", "CCLOSE"])
+        self.assertEquals(pool.size, 0)
+
+
+class PooledConnectionTest(TestHelper):
+
+    def setUp(self):
+        TestHelper.setUp(self)
+        self.executed = []
+        self.database = Database()
+        self.database.raw_connect = lambda: RawConnection(self.executed)
+        self.database.pool = ConnectionPool(self.database, check=False)
+        self.connection = Connection(self.database)
+
+    def test_borrows_on_execute(self):
+        self.assertEquals(self.database.pool.size, 0)
+        self.connection.execute("something", noresult=True)
+        self.assertEquals(self.database.pool.size, 1)
+        self.assertEquals(self.database.pool.idle_size, 0)
+
+    def test_commit_gives_back(self):
+        self.connection.execute("something", noresult=True)
+        self.connection.commit()
+        self.assertEquals(self.executed,
+                          [("something", marker), "RCLOSE", "COMMIT", "ROLLBACK"])
+        self.assertEquals(self.database.pool.idle_size, 1)
+        self.assertEquals(self.connection._raw_connection, None)
+
+    def test_rollback_gives_back(self):
+        self.connection.execute("something", noresult=True)
+        self.connection.rollback()
+        self.assertEquals(self.executed,
+                          [("something", marker), "RCLOSE", "ROLLBACK", "ROLLBACK"])
+        self.assertEquals(self.database.pool.idle_size, 1)
+
+    def test_commit_without_execute(self):
+        self.connection.commit()
+        self.connection.rollback()
+        self.assertEquals(self.executed, [])
+        self.assertEquals(self.database.pool.size, 0)
+
+    def test_commit_blocked(self):
+        self.connection.block_access()
+        self.assertRaises(ConnectionBlockedError, self.connection.commit)
+
+    def test_connections_share_raw_connection(self):
+        connection = Connection(self.database)
+        self.connection.execute("something", noresult=True)
+        raw_connection = self.connection._raw_connection
+        self.connection.commit()
+        connection.execute("something else", noresult=True)
+        self.assertTrue(connection._raw_connection is raw_connection)
+        self.assertEquals(self.database.pool.size, 1)
+
+    def test_close_gives_back(self):
+        self.connection.execute("something", noresult=True)
+        self.connection.close()
+        self.assertEquals(self.executed, [("something", marker), "RCLOSE", "ROLLBACK"])
+        self.assertEquals(self.database.pool.idle_size, 1)
+
+    def test_disconnection_discards(self):
+        self.connection.execute("something", noresult=True)
+        self.connection.is_disconnection_error = lambda exc: True
+        def raise_exception():
+            raise DatabaseError("connection closed")
+        self.assertRaises(DisconnectionError,
+                          self.connection._check_disconnect, raise_exception)
+        self.assertEquals(self.executed, [("something", marker), "RCLOSE", "CCLOSE"])
+        self.assertEquals(self.database.pool.size, 0)
+        self.connection.rollback()
+        self.connection.execute("something", noresult=True)
+        self.assertEquals(self.database.pool.size, 1)
+
+
 class ResultTest(TestHelper):
 
     def setUp(self):
@@ -482,6 +860,59 @@ class CreateDatabaseTest(TestHelper):
         create_database(uri)
         self.assertTrue(self.uri is uri)
 
+    def test_create_database_without_pool(self):
+        self.db_module.create_from_uri = lambda uri: Database()
+        self.assertEquals(create_database("db_module:db").pool, None)
+
+    def test_create_database_with_pool(self):
+        self.db_module.create_from_uri = lambda uri: Database()
+        database = create_database("db_module:db?pool_size=10&pool_check=0"
+                                   "&pool_max_lifetime=60&pool_timeout=5")
+        pool = database.pool
+        self.assertTrue(isinstance(pool, ConnectionPool))
+        self.assertEquals((pool.max_size, pool.min_idle, pool.max_lifetime,
+                           pool.check, pool.timeout), (10, 0, 60, False, 5))
+
+    def test_create_database_with_unknown_pool_option(self):
+        self.db_module.create_from_uri = lambda uri: Database()
+        self.assertRaises(ValueError, create_database,
+                          "db_module:db?pool_stuff=1")
+
+
+class IsReadStatementTest(TestHelper):
+
+    def test_select(self):
+        self.assertTrue(is_read_statement(Select(SQLRaw("1"))))
+        self.assertTrue(is_read_statement(Union(Select(SQLRaw("1")),
+                                                Select(SQLRaw("2")))))
+
+    def test_raw_select(self):
+        self.assertTrue(is_read_statement("SELECT 1"))
+        self.assertTrue(is_read_statement(u" \n select 1"))
+
+    def test_raw_select_locking_rows(self):
+        self.assertFalse(is_read_statement("SELECT * FROM foo FOR UPDATE"))
+        self.assertFalse(is_read_statement("SELECT * FROM foo\nfor share"))
+
+    def test_compiled_query(self):
+        self.assertTrue(is_read_statement(CompiledQuery(u"SELECT 1")))
+        self.assertTrue(is_read_statement(CompiledQuery(u"SELECT 1"),
+                                          raw=False))
+
+    def test_raw_select_not_raw(self):
+        self.assertFalse(is_read_statement("SELECT 1", raw=False))
+        self.assertTrue(is_read_statement(Select(SQLRaw("1")), raw=False))
+
+    def test_raw_select_into(self):
+        self.assertFalse(is_read_statement("SELECT * INTO bar FROM foo"))
+        self.assertFalse(is_read_statement("select id\ninto bar from foo"))
+
+    def test_other_statements(self):
+        self.assertFalse(is_read_statement("INSERT INTO foo VALUES (1)"))
+        self.assertFalse(is_read_statement("SELECTED"))
+        self.assertFalse(is_read_statement(Insert({SQLRaw("id"): 1},
+                                                  SQLRaw("foo"))))
+
 
 class RegisterSchemeTest(TestHelper):
 
@@ -20,6 +20,7 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
+from cStringIO import StringIO
 from datetime import datetime, date, time, timedelta
 import cPickle as pickle
 import shutil
@@ -27,8 +28,10 @@ import sys
 import os
 
 from storm.uri import URI
-from storm.expr import Select, Column, SQLToken, SQLRaw, Count, Alias
+from storm.expr import (
+    Select, Insert, Column, SQLToken, SQLRaw, Count, Alias)
 from storm.variables import (Variable, PickleVariable, RawStrVariable,
+                             IntVariable, UnicodeVariable,
                              DecimalVariable, DateTimeVariable, DateVariable,
                              TimeVariable, TimeDeltaVariable)
 from storm.database import *
@@ -163,6 +166,98 @@ class DatabaseTest(object):
         result = self.connection.execute(Select(SQLRaw("1")))
         self.assertTrue(result.get_one(), (1,))
 
+    def test_execute_bulk_insert(self):
+        title_column = Column("title", SQLToken("test"))
+        insert = Insert((Column("id", SQLToken("test")), title_column),
+                        SQLToken("test"),
+                        values=[(IntVariable(30), UnicodeVariable(u"Title 30")),
+                                (IntVariable(40), UnicodeVariable(u"Title 40"))])
+        result = self.connection.execute(insert)
+        result = self.connection.execute("SELECT id, title FROM test "
+                                         "ORDER BY id")
+        self.assertEquals(result.get_all(), [(10, "Title 10"),
+                                             (20, "Title 20"),
+                                             (30, "Title 30"),
+                                             (40, "Title 40")])
+
+    def test_execute_bulk_insert_with_primary_variables(self):
+        id_column = Column("id", SQLToken("test"))
+        primary_variables = [(IntVariable(),), (IntVariable(),)]
+        insert = Insert((Column("title", SQLToken("test")),),
+                        SQLToken("test"),
+                        primary_columns=(id_column,),
+                        primary_variables=primary_variables,
+                        values=[(UnicodeVariable(u"Title 30"),),
+                                (UnicodeVariable(u"Title 40"),)])
+        self.assertEquals(self.connection.execute(insert), None)
+        for variables, title in zip(primary_variables,
+                                    ["Title 30", "Title 40"]):
+            result = self.connection.execute("SELECT title FROM test "
+                                             "WHERE id=?", variables)
+            self.assertEquals(result.get_one(), (title,))
+
+    def test_execute_many(self):
+        self.connection.execute_many("INSERT INTO test VALUES (?, ?)",
+                                     iter([(IntVariable(30), u"Title 30"),
+                                           (40, u"Title 40")]))
+        result = self.connection.execute("SELECT id, title FROM test "
+                                         "WHERE id > 20 ORDER BY id")
+        self.assertEquals(result.get_all(), [(30, "Title 30"),
+                                             (40, "Title 40")])
+
+    def test_execute_many_expr(self):
+        insert = Insert((SQLToken("id"), SQLToken("title")), SQLToken("test"),
+                        values=[(SQLRaw("?"), SQLRaw("?"))])
+        self.connection.execute_many(insert, [(30, u"Title 30")])
+        result = self.connection.execute("SELECT title FROM test WHERE id=30")
+        self.assertEquals(result.get_one(), ("Title 30",))
+
+    def test_pipelined(self):
+        self.connection.pipelined = True
+        self.connection.execute("INSERT INTO test VALUES (30, 'Title 30')",
+                                noresult=True)
+        self.connection.execute("UPDATE test SET title=? WHERE id=?",
+                                (u"Title 40", 30), noresult=True)
+        result = self.connection.execute("SELECT title FROM test WHERE id=30")
+        self.assertEquals(result.get_one(), ("Title 40",))
+
+    def test_pipelined_error(self):
+        self.connection.pipelined = True
+        self.connection.execute("INSERT INTO test VALUES (30, 'Title 30')",
+                                noresult=True)
+        self.connection.execute("INSERT INTO test VALUES (30, 'Title 30')",
+                                noresult=True)
+        self.assertRaises(DatabaseError, self.connection.execute,
+                          "SELECT 1")
+        self.connection.rollback()
+        result = self.connection.execute("SELECT count(*) FROM test")
+        self.assertEquals(result.get_one(), (2,))
+
+    def test_pipelined_commit(self):
+        self.connection.pipelined = True
+        self.connection.execute("INSERT INTO test VALUES (30, 'Title 30')",
+                                noresult=True)
+        self.connection.commit()
+        self.connection.rollback()
+        result = self.connection.execute("SELECT title FROM test WHERE id=30")
+        self.assertEquals(result.get_one(), ("Title 30",))
+
+    def test_copy_in(self):
+        rows = iter([(IntVariable(30), UnicodeVariable(u"Title 30")),
+                     (40, u"Title\t40")])
+        self.connection.copy_in(SQLToken("test"),
+                                (SQLToken("id"), SQLToken("title")), rows)
+        result = self.connection.execute("SELECT id, title FROM test "
+                                         "WHERE id > 20 ORDER BY id")
+        self.assertEquals(result.get_all(), [(30, "Title 30"),
+                                             (40, "Title\t40")])
+
+    def test_copy_out(self):
+        fileobj = StringIO()
+        self.connection.copy_out("SELECT id, title FROM test WHERE id > ? "
+                                 "ORDER BY id", fileobj, params=(0,))
+        self.assertEquals(fileobj.getvalue(), "10,Title 10\n20,Title 20\n")
+
     def test_get_one(self):
         result = self.connection.execute("SELECT * FROM test ORDER BY id")
         self.assertEquals(result.get_one(), (10, "Title 10"))
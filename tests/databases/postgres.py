@@ -22,9 +22,11 @@ from datetime import date, time, timedelta
 import os
 
 from storm.databases.postgres import (
-    Postgres, compile, currval, Returning, PostgresTimeoutTracer)
+    Postgres, compile, currval, Returning, PostgresTimeoutTracer,
+    CopyInFile, copy_format)
 from storm.database import create_database
-from storm.exceptions import InterfaceError, ProgrammingError
+from storm.exceptions import (
+    InterfaceError, OperationalError, ProgrammingError)
 from storm.variables import DateTimeVariable, RawStrVariable
 from storm.variables import ListVariable, IntVariable, Variable
 from storm.properties import Int
@@ -509,11 +511,150 @@ class PostgresTest(DatabaseTest, TestHelper):
         result = self.connection.execute("SHOW TRANSACTION ISOLATION LEVEL")
         self.assertEquals(result.get_one()[0], u"serializable")
 
+    def test_version_detected_on_first_execute(self):
+        database = create_database(os.environ["STORM_POSTGRES_URI"])
+        connection = database.connect()
+        self.assertEquals(database._version, None)
+        connection.execute("SELECT 1")
+        self.assertTrue(database._version >= 0)
+
+    def test_execute_many_in_pages(self):
+        """
+        Batches are sent with execute_batch(), in pages of
+        C{batch_page_size} statements.
+        """
+        statements = []
+        class Cursor(object):
+            def __init__(self, raw_cursor):
+                self._raw_cursor = raw_cursor
+            def __getattr__(self, name):
+                return getattr(self._raw_cursor, name)
+            def execute(self, statement, params=None):
+                statements.append(statement)
+                return self._raw_cursor.execute(statement, params)
+        self.connection.execute("SELECT 1")
+        self.connection.batch_page_size = 2
+        build_raw_cursor = self.connection.build_raw_cursor
+        self.connection.build_raw_cursor = lambda: Cursor(build_raw_cursor())
+        self.connection.execute_many("INSERT INTO test VALUES (?, ?)",
+                                     [(30, u"Title 30"), (40, u"Title 40"),
+                                      (50, u"Title 50")])
+        self.assertEquals(len(statements), 2)
+        result = self.connection.execute("SELECT count(*) FROM test")
+        self.assertEquals(result.get_one(), (5,))
+
+    def test_pipelined_single_round_trip(self):
+        statements = []
+        raw_execute = self.connection.raw_execute
+        def record_raw_execute(statement, params):
+            statements.append(statement)
+            return raw_execute(statement, params)
+        self.connection.raw_execute = record_raw_execute
+        self.connection.pipelined = True
+        self.connection.execute("INSERT INTO test VALUES (30, 'Title 30')",
+                                noresult=True)
+        self.connection.execute("UPDATE test SET title=? WHERE id=?",
+                                (u"Title 40", 30), noresult=True)
+        result = self.connection.execute("SELECT title FROM test WHERE id=30")
+        self.assertEquals(result.get_one(), ("Title 40",))
+        self.assertEquals(len(statements), 2)
+
+    def test_pipelined_error_not_raised_again(self):
+        """
+        If the statements sent together fail, but succeed once executed
+        one by one, like after a deadlock, no error is raised and the
+        statements are applied once.
+        """
+        raw_execute = self.connection.raw_execute
+        failed = []
+        def fail_once(statement, params):
+            if not failed and "RELEASE SAVEPOINT" in statement:
+                failed.append(statement)
+                raw_execute("SAVEPOINT storm_pipeline", None).close()
+                raise OperationalError("deadlock detected")
+            return raw_execute(statement, params)
+        self.connection.raw_execute = fail_once
+        self.connection.pipelined = True
+        self.connection.execute("INSERT INTO test VALUES (30, 'Title 30')",
+                                noresult=True)
+        self.connection.execute("INSERT INTO test VALUES (40, 'Title 40')",
+                                noresult=True)
+        result = self.connection.execute("SELECT count(*) FROM test")
+        self.assertEquals(result.get_one(), (4,))
+        self.assertEquals(len(failed), 1)
+
     def test_unknown_serialization(self):
         self.assertRaises(ValueError, create_database,
             os.environ["STORM_POSTGRES_URI"] + "?isolation=stuff")
 
 
+class CopyInFileTest(TestHelper):
+
+    def test_copy_format(self):
+        self.assertEquals(copy_format(None), "\\N")
+        self.assertEquals(copy_format(True), "t")
+        self.assertEquals(copy_format(False), "f")
+        self.assertEquals(copy_format(42), "42")
+        self.assertEquals(copy_format(0.1), "0.1")
+        self.assertEquals(copy_format(u"a\\b\tc\nd\re\xe1"),
+                          "a\\\\b\\tc\\nd\\re\xc3\xa1")
+        self.assertEquals(copy_format(date(2010, 1, 2)), "2010-01-02")
+
+    def test_copy_format_bytes(self):
+        self.assertEquals(copy_format("a\x00\\"),
+                          "\\\\141\\\\000\\\\134")
+
+    def test_copy_format_array(self):
+        self.assertEquals(copy_format([1, 2]), '{"1","2"}')
+        self.assertEquals(copy_format((u"a b", u'"c\\', None)),
+                          '{"a b","\\\\"c\\\\\\\\",NULL}')
+        self.assertEquals(copy_format([[1, 2], [u"{}"]]),
+                          '{{"1","2"},{"{}"}}')
+        self.assertEquals(copy_format(ListVariable(IntVariable, value=[1])),
+                          '{"1"}')
+
+    def test_copy_format_interval(self):
+        self.assertEquals(copy_format(timedelta(1, 2, 3)),
+                          "1 days 2.000003 seconds")
+        self.assertEquals(copy_format(timedelta(-1)),
+                          "-1 days 0.000000 seconds")
+
+    def test_copy_format_unsupported(self):
+        self.assertRaises(TypeError, copy_format, {})
+        self.assertRaises(TypeError, copy_format, object())
+
+    def test_copy_format_variable(self):
+        self.assertEquals(copy_format(RawStrVariable("a")), "\\\\141")
+        self.assertEquals(copy_format(IntVariable()), "\\N")
+
+    def test_read(self):
+        copy_file = CopyInFile(iter([(1, u"a"), (2, None)]))
+        self.assertEquals(copy_file.read(3), "1\ta")
+        self.assertEquals(copy_file.read(100), "\n2\t\\N\n")
+        self.assertEquals(copy_file.read(100), "")
+
+    def test_read_all(self):
+        copy_file = CopyInFile([(1, u"a"), (2, u"b")])
+        self.assertEquals(copy_file.read(), "1\ta\n2\tb\n")
+
+    def test_readline(self):
+        copy_file = CopyInFile([(1, u"a"), (2, u"b")])
+        self.assertEquals(copy_file.readline(), "1\ta\n")
+        self.assertEquals(copy_file.readline(), "2\tb\n")
+        self.assertEquals(copy_file.readline(), "")
+
+    def test_rows_are_taken_lazily(self):
+        taken = []
+        def rows():
+            for i in range(3):
+                taken.append(i)
+                yield (i,)
+        copy_file = CopyInFile(rows())
+        self.assertEquals(taken, [])
+        copy_file.read(2)
+        self.assertEquals(taken, [0])
+
+
 class PostgresUnsupportedTest(UnsupportedDatabaseTest, TestHelper):
 
     dbapi_module_names = ["psycopg2"]
@@ -19,10 +19,12 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 from datetime import timedelta
+import threading
 import time
 import os
 
-from storm.exceptions import OperationalError
+from storm.exceptions import (
+    DisconnectionError, OperationalError, PoolTimeoutError)
 from storm.databases.sqlite import SQLite
 from storm.database import create_database
 from storm.uri import URI
@@ -66,7 +68,8 @@ class SQLiteMemoryTest(DatabaseTest, TestHelper):
              # exercise the concurrency behavior (nor it makes sense).
 
     def test_synchronous(self):
-        synchronous_values = {"OFF": 0, "NORMAL": 1, "FULL": 2}
+        synchronous_values = {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3,
+                              "1": 1}
         for value in synchronous_values:
             database = SQLite(URI("sqlite:%s?synchronous=%s" %
                                   (self.get_path(), value)))
@@ -75,6 +78,40 @@ class SQLiteMemoryTest(DatabaseTest, TestHelper):
             self.assertEquals(result.get_one()[0],
                               synchronous_values[value])
 
+    def get_pragma(self, uri, name):
+        database = create_database("sqlite:%s?%s" % (self.get_path(), uri))
+        connection = database.connect()
+        result = connection.execute("PRAGMA %s" % name).get_one()[0]
+        connection.close()
+        return result
+
+    def test_cache_size(self):
+        self.assertEquals(self.get_pragma("cache_size=-4096", "cache_size"),
+                          -4096)
+
+    def test_temp_store(self):
+        self.assertEquals(self.get_pragma("temp_store=MEMORY", "temp_store"),
+                          2)
+        self.assertEquals(self.get_pragma("temp_store=1", "temp_store"), 1)
+
+    def test_busy_timeout(self):
+        self.assertEquals(self.get_pragma("busy_timeout=300", "busy_timeout"),
+                          300)
+        database = create_database("sqlite:?busy_timeout=300")
+        self.assertEquals(database._timeout, 0.3)
+        database = create_database("sqlite:?busy_timeout=300&timeout=1")
+        self.assertEquals(database._timeout, 1)
+
+    def test_invalid_pragma_values(self):
+        self.assertRaises(ValueError, create_database,
+                          "sqlite:?journal_mode=WAL;DROP")
+        self.assertRaises(ValueError, create_database,
+                          "sqlite:?temp_store=DISK")
+        self.assertRaises(ValueError, create_database,
+                          "sqlite:?cache_size=big")
+        self.assertRaises(ValueError, create_database,
+                          "sqlite:?synchronous=OFF;DROP")
+
     def test_sqlite_specific_reserved_words(self):
         """Check sqlite-specific reserved words are recognized.
 
@@ -104,6 +141,33 @@ class SQLiteFileTest(SQLiteMemoryTest):
         self.assertTrue(isinstance(database, SQLite))
         self.assertEquals(database._filename, filename)
 
+    def test_journal_mode(self):
+        self.assertEquals(self.get_pragma("journal_mode=wal", "journal_mode"),
+                          "wal")
+
+    def test_mmap_size(self):
+        self.assertEquals(self.get_pragma("mmap_size=1048576", "mmap_size"),
+                          1048576)
+
+    def test_page_size(self):
+        path = self.make_path()
+        database = create_database("sqlite:%s?page_size=8192" % path)
+        connection = database.connect()
+        connection.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+        connection.commit()
+        result = connection.execute("PRAGMA page_size")
+        self.assertEquals(result.get_one(), (8192,))
+
+    def test_page_size_before_journal_mode(self):
+        path = self.make_path()
+        database = create_database("sqlite:%s?journal_mode=WAL&page_size=8192"
+                                   % path)
+        connection = database.connect()
+        connection.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+        connection.commit()
+        result = connection.execute("PRAGMA page_size")
+        self.assertEquals(result.get_one(), (8192,))
+
     def test_timeout(self):
         database = create_database("sqlite:%s?timeout=0.3" % self.get_path())
         connection1 = database.connect()
@@ -184,6 +248,186 @@ class SQLiteFileTest(SQLiteMemoryTest):
         self.assertEquals(connection1.execute("SELECT id FROM test").get_all(),
                           [(1,), (2,)])
 
+    def test_connect_lazily(self):
+        database = create_database("sqlite:%s" %
+                                   os.path.join(self.make_path(), "test.db"))
+        connection = database.connect()
+        self.assertRaises(DisconnectionError, connection.execute, "SELECT 1")
+
+    def test_pool(self):
+        database = create_database("sqlite:%s?pool_size=1&pool_timeout=0" %
+                                   self.get_path())
+        connection1 = database.connect()
+        connection2 = database.connect()
+        connection1.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+        self.assertRaises(PoolTimeoutError,
+                          connection2.execute, "SELECT id FROM test")
+        connection1.execute("INSERT INTO test VALUES (1)")
+        connection1.commit()
+        self.assertEquals(connection2.execute("SELECT id FROM test").get_all(),
+                          [(1,)])
+        connection2.rollback()
+        self.assertEquals(database.pool.size, 1)
+        self.assertEquals(database.pool.idle_size, 1)
+
+    def test_pool_shared_by_threads(self):
+        for check in ["1", "0"]:
+            database = create_database(
+                "sqlite:%s?pool_size=1&pool_check=%s" % (self.get_path(),
+                                                          check))
+            raw_connections = []
+            def select():
+                connection = database.connect()
+                connection.execute("SELECT 1").get_all()
+                raw_connections.append(connection._raw_connection)
+                connection.commit()
+                connection.close()
+            select()
+            thread = threading.Thread(target=select)
+            thread.start()
+            thread.join()
+            self.assertEquals(len(raw_connections), 2)
+            self.assertTrue(raw_connections[0] is raw_connections[1])
+            self.assertEquals(database.pool.size, 1)
+
+    def create_readers_database(self, options=""):
+        path = self.get_path()
+        database = create_database("sqlite:%s?journal_mode=WAL&readers=2%s"
+                                   % (path, options))
+        connection = database.connect()
+        connection.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+        connection.execute("INSERT INTO test VALUES (1)")
+        connection.commit()
+        connection.close()
+        return database
+
+    def test_readers_in_memory(self):
+        self.assertRaises(ValueError, create_database, "sqlite:?readers=2")
+
+    def test_reader_is_read_only(self):
+        database = self.create_readers_database()
+        reader = database.raw_connect_reader()
+        self.assertRaises(OperationalError,
+                          reader.execute, "INSERT INTO test VALUES (2)")
+
+    def test_readers_execute_queries(self):
+        database = self.create_readers_database()
+        connection = database.connect()
+        result = connection.execute("SELECT id FROM test")
+        self.assertEquals(result.get_all(), [(1,)])
+        self.assertEquals(database._readers.size, 1)
+        self.assertFalse(connection._in_transaction)
+        connection.commit()
+        self.assertEquals(database._readers.idle_size, 1)
+
+    def test_readers_keep_snapshot(self):
+        database = self.create_readers_database()
+        connection1 = database.connect()
+        connection2 = database.connect()
+        connection1.execute("SELECT id FROM test").get_all()
+        connection2.execute("INSERT INTO test VALUES (2)")
+        result = connection1.execute("SELECT id FROM test ORDER BY id")
+        self.assertEquals(result.get_all(), [(1,)])
+        connection2.commit()
+        result = connection1.execute("SELECT id FROM test ORDER BY id")
+        self.assertEquals(result.get_all(), [(1,)])
+        connection1.rollback()
+        result = connection1.execute("SELECT id FROM test ORDER BY id")
+        self.assertEquals(result.get_all(), [(1,), (2,)])
+
+    def test_readers_writes_use_writer(self):
+        database = self.create_readers_database()
+        connection = database.connect()
+        connection.execute("SELECT id FROM test").get_all()
+        connection.execute("INSERT INTO test VALUES (2)")
+        result = connection.execute("SELECT id FROM test ORDER BY id")
+        self.assertEquals(result.get_all(), [(1,), (2,)])
+        self.assertEquals(database._readers.size, 1)
+        connection.rollback()
+        self.assertEquals(database._readers.idle_size, 1)
+
+    def test_readers_writers_take_turns(self):
+        database = self.create_readers_database("&timeout=0.1")
+        connection1 = database.connect()
+        connection2 = database.connect()
+        connection1.execute("INSERT INTO test VALUES (2)")
+        started = time.time()
+        self.assertRaises(OperationalError, connection2.execute,
+                          "INSERT INTO test VALUES (3)")
+        self.assertTrue(time.time() - started < 1)
+        connection1.commit()
+        connection2.execute("INSERT INTO test VALUES (3)")
+        connection2.commit()
+        result = connection1.execute("SELECT id FROM test ORDER BY id")
+        self.assertEquals(result.get_all(), [(1,), (2,), (3,)])
+
+    def test_readers_writer_waits_for_turn(self):
+        database = self.create_readers_database()
+        connection1 = database.connect()
+        connection1.execute("INSERT INTO test VALUES (2)")
+        inserted = threading.Event()
+        def insert():
+            connection2 = database.connect()
+            connection2.execute("INSERT INTO test VALUES (3)")
+            inserted.set()
+            connection2.commit()
+            connection2.close()
+        thread = threading.Thread(target=insert)
+        thread.start()
+        inserted.wait(0.2)
+        self.assertFalse(inserted.isSet())
+        connection1.commit()
+        thread.join()
+        self.assertTrue(inserted.isSet())
+
+    def test_readers_shared_by_threads(self):
+        database = self.create_readers_database()
+        results = []
+        def select():
+            connection = database.connect()
+            results.append(connection.execute("SELECT id FROM test").get_all())
+            connection.commit()
+            connection.close()
+        for i in range(3):
+            thread = threading.Thread(target=select)
+            thread.start()
+            thread.join()
+        self.assertEquals(results, [[(1,)]] * 3)
+        self.assertEquals(database._readers.size, 1)
+
+    def test_readers_write_after_read(self):
+        database = self.create_readers_database()
+        connection1 = database.connect()
+        connection2 = database.connect()
+        connection2.execute("INSERT INTO test VALUES (2)")
+        connection2.rollback()
+        connection1.execute("SELECT id FROM test").get_all()
+        connection1.execute("INSERT INTO test VALUES (3)")
+        connection1.commit()
+        result = connection2.execute("SELECT id FROM test ORDER BY id")
+        self.assertEquals(result.get_all(), [(1,), (3,)])
+
+    def test_readers_write_after_stale_read(self):
+        """
+        A transaction can't write once the snapshot of its queries is
+        stale, since it could overwrite changes it didn't see.
+        """
+        database = self.create_readers_database()
+        connection1 = database.connect()
+        connection2 = database.connect()
+        connection1.execute("SELECT id FROM test").get_all()
+        connection2.execute("INSERT INTO test VALUES (2)")
+        connection2.commit()
+        self.assertRaises(OperationalError, connection1.execute,
+                          "INSERT INTO test VALUES (3)")
+        connection1.rollback()
+        connection1.execute("SELECT id FROM test").get_all()
+        connection1.execute("INSERT INTO test VALUES (3)")
+        connection1.commit()
+        result = connection2.execute("SELECT id FROM test ORDER BY id")
+        self.assertEquals(result.get_all(), [(1,), (2,), (3,)])
+
+
 class SQLiteUnsupportedTest(UnsupportedDatabaseTest, TestHelper):
  
     dbapi_module_names = ["pysqlite2", "sqlite3"]
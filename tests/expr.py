@@ -86,15 +86,17 @@ class ExprTest(TestHelper):
         self.assertEquals(expr.default_table, Undef)
         self.assertEquals(expr.primary_columns, Undef)
         self.assertEquals(expr.primary_variables, Undef)
+        self.assertEquals(expr.values, Undef)
 
     def test_insert_constructor(self):
-        objects = [object() for i in range(5)]
+        objects = [object() for i in range(6)]
         expr = Insert(*objects)
         self.assertEquals(expr.map, objects[0])
         self.assertEquals(expr.table, objects[1])
         self.assertEquals(expr.default_table, objects[2])
         self.assertEquals(expr.primary_columns, objects[3])
         self.assertEquals(expr.primary_variables, objects[4])
+        self.assertEquals(expr.values, objects[5])
 
     def test_update_default(self):
         expr = Update(None)
@@ -824,6 +826,25 @@ class CompileTest(TestHelper):
                         'VALUES (elem2, elem1)'), statement)
         self.assertEquals(state.parameters, [])
 
+    def test_insert_bulk(self):
+        expr = Insert((Column(column1, table1), Column(column2, table1)),
+                      table2, values=[(elem1, Variable(1)),
+                                      (elem2, Variable(2))])
+        state = State()
+        statement = compile(expr, state)
+        self.assertEquals(statement,
+                          'INSERT INTO "table 2" (column1, column2) '
+                          'VALUES (elem1, ?), (elem2, ?)')
+        self.assertVariablesEqual(state.parameters,
+                                  [Variable(1), Variable(2)])
+
+    def test_returning(self):
+        insert = Insert({column1: elem1}, table1,
+                        primary_columns=(column2, column3))
+        self.assertEquals(compile(Returning(insert)),
+                          'INSERT INTO "table 1" (column1) VALUES (elem1) '
+                          'RETURNING column2, column3')
+
     def test_insert_with_columns_to_escape(self):
         expr = Insert({Column("column 1", table1): elem1}, table2)
         state = State()
@@ -22,8 +22,8 @@ from weakref import ref
 import gc
 
 from storm.exceptions import ClassInfoError
-from storm.properties import Property
-from storm.variables import Variable
+from storm.properties import Property, Int, Pickle
+from storm.variables import Variable, LazyValue
 from storm.expr import Undef, Select, compile
 from storm.info import *
 
@@ -96,6 +96,42 @@ class ClassInfoTest(TestHelper):
     def test_table(self):
         self.assertEquals(self.cls_info.table, "table")
 
+    def test_row_class(self):
+        row_class = self.cls_info.row_class
+        self.assertTrue(issubclass(row_class, Row))
+        self.assertEquals(row_class.__name__, "ClassRow")
+        self.assertEquals(row_class.__slots__, ("prop1", "prop2"))
+        self.assertTrue(self.cls_info.row_class is row_class)
+
+    def test_row(self):
+        row = self.cls_info.row_class(1, u"Title")
+        self.assertEquals((row.prop1, row.prop2), (1, u"Title"))
+        self.assertEquals(tuple(row), (1, u"Title"))
+        self.assertEquals(len(row), 2)
+        self.assertEquals(row, self.cls_info.row_class(1, u"Title"))
+        self.assertNotEquals(row, self.cls_info.row_class(2, u"Title"))
+        self.assertNotEquals(row, (1, u"Title"))
+        self.assertEquals(repr(row), "ClassRow(prop1=1, prop2=u'Title')")
+        self.assertRaises(AttributeError, setattr, row, "prop3", 3)
+
+    def test_compact(self):
+        self.assertEquals(self.cls_info.compact, False)
+        self.assertEquals(self.cls_info.converters, None)
+        class Class(object):
+            __storm_table__ = "table"
+            __storm_compact__ = True
+            prop1 = Int(primary=True)
+            prop2 = Pickle()
+        cls_info = get_cls_info(Class)
+        self.assertEquals(cls_info.compact, True)
+        self.assertEquals(len(cls_info.converters), 2)
+        self.assertTrue(cls_info.converters[0].column is Class.prop1)
+        self.assertEquals(cls_info.converters[1], None)
+
+    def test_column_idx(self):
+        self.assertEquals(self.cls_info.column_idx,
+                          {id(self.Class.prop1): 0, id(self.Class.prop2): 1})
+
     def test_primary_key(self):
         # Can't use == for props.
         self.assertTrue(self.cls_info.primary_key[0] is self.Class.prop1)
@@ -518,6 +554,147 @@ class ObjectInfoTest(TestHelper):
         self.assertEquals(len(deleted), 1)
         self.assertTrue("tainted" in deleted[0])
 
+    def test_class_change_notification(self):
+        changes = []
+        def object_changed(cls_info, obj_info, variable,
+                           old_value, new_value, fromdb):
+            changes.append((cls_info, obj_info, variable,
+                            old_value, new_value, fromdb))
+        self.cls_info.event.hook("changed", object_changed)
+        self.obj.prop1 = 20
+        self.assertEquals(changes, [(self.cls_info, self.obj_info,
+                                     self.variable1, Undef, 20, False)])
+
+    def test_class_object_deleted_notification(self):
+        obj = self.Class()
+        obj_info = get_obj_info(obj)
+        deleted = []
+        def object_deleted(cls_info, obj_info):
+            deleted.append(obj_info)
+        self.cls_info.event.hook("object-deleted", object_deleted)
+        del obj
+        self.assertEquals(deleted, [obj_info])
+
+    def test_emit(self):
+        emitted = []
+        def class_callback(cls_info, obj_info, *args):
+            emitted.append(("class", obj_info) + args)
+        def object_callback(obj_info, *args):
+            emitted.append(("object", obj_info) + args)
+        self.obj_info.emit("event", 1)
+        self.assertEquals(emitted, [])
+        self.cls_info.event.hook("event", class_callback)
+        self.obj_info.hook("event", object_callback)
+        self.obj_info.emit("event", 1)
+        self.assertEquals(emitted, [("class", self.obj_info, 1),
+                                    ("object", self.obj_info, 1)])
+
+    def test_hook_and_unhook(self):
+        emitted = []
+        def callback(obj_info, *args):
+            emitted.append(args)
+        self.obj_info.unhook("event", callback)
+        self.obj_info.hook("event", callback, 2)
+        self.obj_info.event.emit("event", 1)
+        self.obj_info.unhook("event", callback, 2)
+        self.obj_info.event.emit("event", 1)
+        self.assertEquals(emitted, [(1, 2)])
+
+    def test_event_is_kept(self):
+        self.assertTrue(self.obj_info.event is self.obj_info.event)
+
+
+class CompactVariablesTest(TestHelper):
+
+    def setUp(self):
+        TestHelper.setUp(self)
+        class Class(object):
+            __storm_table__ = "table"
+            __storm_compact__ = True
+            prop1 = Int(primary=True)
+            prop2 = Int(default=3)
+            prop3 = Pickle()
+        self.Class = Class
+        self.obj = Class()
+        self.obj_info = get_obj_info(self.obj)
+        self.variables = self.obj_info.variables
+
+    def test_variables(self):
+        self.assertTrue(isinstance(self.variables, CompactVariables))
+        self.assertEquals(self.variables.keys(), [self.Class.prop1])
+        self.assertEquals(self.obj_info.primary_vars,
+                          (self.variables[self.Class.prop1],))
+
+    def test_variable_built_when_looked_up(self):
+        variable = self.variables[self.Class.prop2]
+        self.assertTrue(isinstance(variable, Variable))
+        self.assertTrue(variable.column is self.Class.prop2)
+        self.assertTrue(variable.event is self.obj_info)
+        self.assertEquals(variable.get(), 3)
+        self.assertTrue(self.variables[self.Class.prop2] is variable)
+
+    def test_unknown_column(self):
+        class Other(object):
+            __storm_table__ = "other"
+            prop = Int(primary=True)
+        self.assertRaises(KeyError, self.variables.__getitem__, Other.prop)
+        self.assertRaises(KeyError, self.variables.get_state, Other.prop)
+
+    def test_default_value(self):
+        self.assertEquals(self.variables.get_state(self.Class.prop2), Undef)
+        self.assertEquals(self.obj.prop2, 3)
+
+    def test_set_state(self):
+        self.variables.set_state(self.Class.prop2, 5)
+        self.assertEquals(self.variables.get_state(self.Class.prop2), 5)
+        self.assertEquals(self.variables.get_value(self.Class.prop2), 5)
+        self.assertEquals(self.obj.prop2, 5)
+        self.assertEquals(len(self.variables), 1)
+
+    def test_set_state_none(self):
+        self.variables.set_state(self.Class.prop2, None)
+        self.assertEquals(self.obj.prop2, None)
+        self.assertEquals(len(self.variables), 1)
+
+    def test_variable_built_from_state(self):
+        self.variables.set_state(self.Class.prop2, 5)
+        variable = self.variables[self.Class.prop2]
+        self.assertEquals(variable.get(), 5)
+        self.assertFalse(variable.has_changed())
+        self.obj.prop2 = 6
+        self.assertTrue(variable.has_changed())
+        self.assertEquals(self.obj.prop2, 6)
+
+    def test_mutable_value_built_as_variable(self):
+        self.obj.prop3 = {}
+        self.assertTrue(self.Class.prop3 in self.variables)
+        self.assertEquals(self.obj.prop3, {})
+
+    def test_lazy_value_resolved_without_variable(self):
+        lazy_value = LazyValue()
+        def resolve(cls_info, obj_info, variable, value):
+            self.assertTrue(value is lazy_value)
+            obj_info.variables.set_state(variable.column, 7)
+        cls_info = get_cls_info(self.Class)
+        cls_info.event.hook("resolve-lazy-value", resolve)
+        self.variables.set_state(self.Class.prop2, lazy_value)
+        self.assertEquals(self.obj.prop2, 7)
+        self.assertEquals(len(self.variables), 1)
+
+    def test_lazy_value_unresolved(self):
+        lazy_value = LazyValue()
+        self.variables.set_state(self.Class.prop2, lazy_value)
+        self.assertEquals(self.obj.prop2, None)
+        variable = self.variables.get(self.Class.prop2)
+        self.assertTrue(variable.get_lazy() is lazy_value)
+
+    def test_checkpoint(self):
+        self.variables.set_state(self.Class.prop2, 5)
+        self.obj.prop1 = 1
+        self.obj_info.checkpoint()
+        self.assertFalse(self.variables[self.Class.prop1].has_changed())
+        self.assertEquals(self.variables.keys(), [self.Class.prop1])
+
 
 class ClassAliasTest(TestHelper):
 
@@ -0,0 +1,165 @@
+import threading
+
+from storm.database import create_database
+from storm.exceptions import FeatureError
+from storm.expr import Desc
+from storm.parallel import ParallelStores, ParallelResultSet
+from storm.properties import Int, Unicode
+from storm.store import Store
+
+from tests.helper import TestHelper, MakePath
+
+
+class Foo(object):
+    __storm_table__ = "foo"
+    id = Int(primary=True)
+    title = Unicode()
+    amount = Int()
+
+
+class ParallelStoresTest(TestHelper):
+
+    helpers = [MakePath]
+
+    def setUp(self):
+        TestHelper.setUp(self)
+        self.databases = []
+        rows = [[(1, u"Title 1", 10), (4, u"Title 4", 40)],
+                [(2, u"Title 2", 20), (5, u"Title 5", None)],
+                [(3, u"Title 3", 30)]]
+        for database_rows in rows:
+            database = create_database("sqlite:%s" % self.make_path())
+            connection = database.connect()
+            connection.execute("CREATE TABLE foo (id INTEGER PRIMARY KEY,"
+                               " title VARCHAR, amount INTEGER)")
+            for row in database_rows:
+                connection.execute("INSERT INTO foo VALUES (?, ?, ?)", row)
+            connection.commit()
+            connection.close()
+            self.databases.append(database)
+        self.stores = ParallelStores(
+            [Store(database) for database in self.databases])
+
+    def tearDown(self):
+        self.stores.close()
+        TestHelper.tearDown(self)
+
+    def get_ids(self, result):
+        return [foo.id for foo in result]
+
+    def test_run(self):
+        results = self.stores.run(lambda store: store.find(Foo).count())
+        self.assertEquals(results, [2, 2, 1])
+
+    def test_run_concurrently(self):
+        barrier = threading.Semaphore(0)
+        def wait_for_others(store):
+            # Each call waits for the other two, which can only happen
+            # if they run at the same time.
+            barrier.release()
+            barrier.release()
+            for i in range(2):
+                barrier.acquire()
+        self.stores.run(wait_for_others)
+
+    def test_run_in_the_thread_of_each_store(self):
+        threads = {}
+        def record_thread(store):
+            threads.setdefault(store, set()).add(threading.currentThread())
+        self.stores.run(record_thread)
+        self.stores.run(record_thread)
+        self.assertEquals(len(threads), 3)
+        for store_threads in threads.values():
+            self.assertEquals(len(store_threads), 1)
+        self.assertEquals(len(set.union(*threads.values())), 3)
+
+    def test_max_workers(self):
+        self.stores.close()
+        self.stores = ParallelStores(
+            [Store(database) for database in self.databases], max_workers=2)
+        threads = set()
+        self.stores.run(
+            lambda store: threads.add(threading.currentThread()))
+        self.assertEquals(len(threads), 2)
+        self.assertEquals(self.stores.find(Foo).count(), 5)
+
+    def test_run_error(self):
+        calls = []
+        def function(store):
+            calls.append(store)
+            if store is not self.stores.stores[0]:
+                raise ZeroDivisionError()
+        self.assertRaises(ZeroDivisionError, self.stores.run, function)
+        self.assertEquals(len(calls), 3)
+
+    def test_find(self):
+        result = self.stores.find(Foo, Foo.id > 1)
+        self.assertTrue(isinstance(result, ParallelResultSet))
+        self.assertEquals(sorted(self.get_ids(result)), [2, 3, 4, 5])
+        self.assertEquals(sorted(self.get_ids(result.all())), [2, 3, 4, 5])
+
+    def test_find_keywords(self):
+        result = self.stores.find(Foo, title=u"Title 2")
+        self.assertEquals(self.get_ids(result), [2])
+
+    def test_find_order_by(self):
+        result = self.stores.find(Foo).order_by(Desc(Foo.title))
+        self.assertEquals(self.get_ids(result), [5, 4, 3, 2, 1])
+
+    def test_find_slice(self):
+        result = self.stores.find(Foo.id).order_by(Foo.id)[:3]
+        self.assertEquals(list(result), [1, 2, 3])
+        self.assertEquals(list(result[:2]), [1, 2])
+        self.assertEquals(list(result[:5]), [1, 2, 3])
+        self.assertEquals(result.count(), 3)
+
+    def test_find_unsupported_slice(self):
+        result = self.stores.find(Foo)
+        self.assertRaises(FeatureError, result.__getitem__, slice(1, 2))
+        self.assertRaises(FeatureError, result.__getitem__, 1)
+
+    def test_find_config(self):
+        result = self.stores.find(Foo.title).config(distinct=True)
+        self.stores.run(
+            lambda store: store.execute("UPDATE foo SET title=''"))
+        self.assertEquals(list(result), [u""] * 3)
+
+    def test_is_empty(self):
+        self.assertFalse(self.stores.find(Foo, id=3).is_empty())
+        self.assertTrue(self.stores.find(Foo, id=6).is_empty())
+
+    def test_count(self):
+        self.assertEquals(self.stores.find(Foo).count(), 5)
+        self.assertEquals(self.stores.find(Foo).count(Foo.amount), 4)
+        self.assertRaises(FeatureError, self.stores.find(Foo).count,
+                          Foo.amount, distinct=True)
+
+    def test_count_slice(self):
+        result = self.stores.find(Foo).order_by(Foo.id)
+        self.assertEquals(result[:3].count(), 3)
+        self.assertEquals(result[:10].count(), 5)
+        self.assertRaises(FeatureError, result[:3].count, Foo.amount)
+
+    def test_sum(self):
+        self.assertEquals(self.stores.find(Foo).sum(Foo.amount), 100)
+        self.assertEquals(self.stores.find(Foo, id=5).sum(Foo.amount), None)
+
+    def test_max_min(self):
+        result = self.stores.find(Foo)
+        self.assertEquals(result.max(Foo.amount), 40)
+        self.assertEquals(result.min(Foo.amount), 10)
+        self.assertEquals(result.max(Foo.title), u"Title 5")
+        self.assertEquals(self.stores.find(Foo, id=6).max(Foo.amount), None)
+
+    def test_aggregate_slice(self):
+        result = self.stores.find(Foo)[:2]
+        self.assertRaises(FeatureError, result.sum, Foo.amount)
+
+    def test_commit_rollback(self):
+        self.stores.run(lambda store: store.execute("DELETE FROM foo"))
+        self.stores.rollback()
+        self.assertEquals(self.stores.find(Foo).count(), 5)
+        self.stores.run(lambda store: store.execute("DELETE FROM foo"))
+        self.stores.commit()
+        self.stores.rollback()
+        self.assertEquals(self.stores.find(Foo).count(), 0)
@@ -693,6 +693,24 @@ class PropertyKindsTest(TestHelper):
         del self.obj
         self.assertEquals(changes, [(self.variable1, None, ["a"], False)])
 
+    def test_pickle_copy_change_detection(self):
+        self.setup(Pickle, default_factory=dict, allow_none=False,
+                   change_detection="copy")
+
+        changes = []
+        def changed(owner, variable, old_value, new_value, fromdb):
+            changes.append((variable, old_value, new_value, fromdb))
+
+        self.obj.prop2 = {}
+
+        self.obj_info.checkpoint()
+        self.obj_info.event.emit("start-tracking-changes", self.obj_info.event)
+        self.obj_info.event.hook("changed", changed)
+
+        self.obj.prop1["a"] = 1
+        self.obj_info.event.emit("flush")
+        self.assertEquals(changes, [(self.variable1, None, {"a": 1}, False)])
+
     def test_list(self):
         self.setup(List, default_factory=list, allow_none=False)
 
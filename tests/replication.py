@@ -0,0 +1,182 @@
+from storm.database import Connection, create_database
+from storm.exceptions import ConnectionBlockedError
+from storm.expr import SQL, Select
+from storm.properties import Int, Unicode
+from storm.replication import (
+    ReplicatedDatabase, ReplicatedConnection, use_primary)
+from storm.store import Store
+
+from tests.helper import TestHelper, MakePath
+
+
+class Foo(object):
+    __storm_table__ = "foo"
+    id = Int(primary=True)
+    title = Unicode()
+
+
+class ReplicatedDatabaseTest(TestHelper):
+
+    helpers = [MakePath]
+
+    def setUp(self):
+        TestHelper.setUp(self)
+        self.uris = []
+        for title in [u"Primary", u"Replica 1", u"Replica 2"]:
+            uri = "sqlite:%s" % self.make_path()
+            connection = create_database(uri).connect()
+            connection.execute("CREATE TABLE foo "
+                               "(id INTEGER PRIMARY KEY, title VARCHAR)")
+            connection.execute("INSERT INTO foo VALUES (10, ?)", (title,))
+            connection.commit()
+            connection.close()
+            self.uris.append(uri)
+        self.database = ReplicatedDatabase(self.uris[0], self.uris[1:])
+        self.store = Store(self.database)
+
+    def tearDown(self):
+        self.store.close()
+        TestHelper.tearDown(self)
+
+    def get_title(self, store=None):
+        store = store or self.store
+        return store.find(Foo.title, Foo.id == 10).one()
+
+    def test_connect(self):
+        connection = self.database.connect()
+        self.assertTrue(isinstance(connection, ReplicatedConnection))
+        self.assertTrue(isinstance(connection, Connection))
+
+    def test_find_uses_replica(self):
+        self.assertEquals(self.get_title(), "Replica 1")
+
+    def test_get_uses_replica(self):
+        self.assertEquals(self.store.get(Foo, 10).title, "Replica 1")
+
+    def test_execute_select_uses_primary(self):
+        result = self.store.execute("SELECT title FROM foo")
+        self.assertEquals(result.get_all(), [("Primary",)])
+        self.assertEquals(self.get_title(), "Primary")
+
+    def test_execute_compiled_select_uses_replica(self):
+        result = self.store.execute(Select(Foo.title))
+        self.assertEquals(result.get_all(), [("Replica 1",)])
+
+    def test_execute_select_with_raw_reads(self):
+        store = Store(ReplicatedDatabase(self.uris[0], self.uris[1:],
+                                         raw_reads=True))
+        self.assertTrue(store._connection.raw_reads)
+        result = store.execute("SELECT title FROM foo")
+        self.assertEquals(result.get_all(), [("Replica 1",)])
+
+    def test_select_into_with_raw_reads_uses_primary(self):
+        connection = ReplicatedDatabase(self.uris[0], self.uris[1:],
+                                        raw_reads=True).connect()
+        statement = "SELECT * INTO bar FROM foo"
+        self.assertTrue(connection._get_connection(statement)
+                        is connection._primary)
+
+    def test_replicas_in_turn(self):
+        store = Store(self.database)
+        self.assertEquals(self.get_title(store), "Replica 2")
+        store = Store(self.database)
+        self.assertEquals(self.get_title(store), "Replica 1")
+
+    def test_without_replicas(self):
+        store = Store(ReplicatedDatabase(self.uris[0]))
+        self.assertEquals(self.get_title(store), "Primary")
+
+    def test_write_uses_primary(self):
+        self.store.execute("UPDATE foo SET title='Changed'")
+        self.store.commit()
+        primary = create_database(self.uris[0]).connect()
+        result = primary.execute("SELECT title FROM foo")
+        self.assertEquals(result.get_all(), [("Changed",)])
+
+    def test_flush_uses_primary(self):
+        foo = Foo()
+        foo.id = 20
+        foo.title = u"Title 20"
+        self.store.add(foo)
+        self.store.commit()
+        primary = create_database(self.uris[0]).connect()
+        result = primary.execute("SELECT title FROM foo WHERE id=20")
+        self.assertEquals(result.get_all(), [("Title 20",)])
+
+    def test_flush_resolves_primary_key_in_primary(self):
+        primary = create_database(self.uris[0]).connect()
+        primary.execute("INSERT INTO foo VALUES (30, 'Title 30')")
+        primary.commit()
+        foo = Foo()
+        foo.id = SQL("(SELECT MAX(id) + 1 FROM foo)")
+        foo.title = u"Title 31"
+        self.store.add(foo)
+        self.store.flush()
+        self.assertEquals(foo.id, 31)
+        self.store.commit()
+        result = primary.execute("SELECT title FROM foo WHERE id=31")
+        self.assertEquals(result.get_all(), [("Title 31",)])
+
+    def test_prepare_write(self):
+        self.store._connection.prepare_write()
+        self.assertEquals(self.get_title(), "Primary")
+        self.store.commit()
+        self.assertEquals(self.get_title(), "Replica 1")
+
+    def test_sticky_primary_after_write(self):
+        self.store.execute("UPDATE foo SET title='Changed'")
+        self.assertEquals(self.get_title(), "Changed")
+        self.store.invalidate()
+        self.assertEquals(self.store.get(Foo, 10).title, "Changed")
+
+    def test_commit_ends_sticky_primary(self):
+        self.store.execute("UPDATE foo SET title='Changed'")
+        self.store.commit()
+        self.assertEquals(self.get_title(), "Replica 1")
+
+    def test_rollback_ends_sticky_primary(self):
+        self.store.execute("UPDATE foo SET title='Changed'")
+        self.store.rollback()
+        self.assertEquals(self.get_title(), "Replica 1")
+
+    def test_use_primary(self):
+        use_primary(self.store)
+        self.assertEquals(self.get_title(), "Primary")
+        self.store.commit()
+        self.assertEquals(self.get_title(), "Primary")
+        use_primary(self.store, False)
+        self.assertEquals(self.get_title(), "Replica 1")
+
+    def test_use_primary_is_per_store(self):
+        use_primary(self.store)
+        store = Store(self.database)
+        self.assertEquals(self.get_title(store), "Replica 2")
+
+    def test_copy_in_uses_primary(self):
+        self.store.copy_in(Foo, [(20, u"Title 20")])
+        self.assertEquals(self.store.find(Foo).count(), 2)
+
+    def test_execute_many_uses_primary(self):
+        self.store.execute_many("UPDATE foo SET title=? WHERE id=?",
+                                [(u"Changed", 10)])
+        self.assertEquals(self.get_title(), "Changed")
+        self.store.commit()
+        primary = create_database(self.uris[0]).connect()
+        result = primary.execute("SELECT title FROM foo")
+        self.assertEquals(result.get_all(), [("Changed",)])
+
+    def test_pipelined(self):
+        store = Store(self.database, pipelined=True)
+        self.assertTrue(store._connection.pipelined)
+        store.execute("UPDATE foo SET title='Changed'", noresult=True)
+        self.assertEquals(self.get_title(store), "Changed")
+
+    def test_block_access(self):
+        self.store.block_implicit_flushes()
+        self.store._connection.block_access()
+        self.assertRaises(ConnectionBlockedError, self.get_title)
+        self.assertRaises(ConnectionBlockedError,
+                          self.store.execute, "UPDATE foo SET title='Changed'")
+        self.store._connection.unblock_access()
+        self.store.rollback()
+        self.assertEquals(self.get_title(), "Replica 1")
@@ -0,0 +1,233 @@
+from storm.database import create_database
+from storm.exceptions import FeatureError, NotOneError, UnorderedError
+from storm.expr import Desc
+from storm.properties import Int, Unicode
+from storm.sharding import ShardedStore, ShardedResultSet
+from storm.store import Store, ResultSet
+
+from tests.helper import TestHelper
+
+
+class Document(object):
+    __storm_table__ = "document"
+    __storm_primary__ = "tenant_id", "id"
+    __storm_shard_key__ = "tenant_id"
+    tenant_id = Int()
+    id = Int()
+    title = Unicode()
+
+    def __init__(self, tenant_id, id, title):
+        self.tenant_id = tenant_id
+        self.id = id
+        self.title = title
+
+
+class Event(object):
+    __storm_table__ = "event"
+    __storm_shard_key__ = "tenant_id"
+    id = Int(primary=True)
+    tenant_id = Int()
+
+
+class Setting(object):
+    __storm_table__ = "setting"
+    id = Int(primary=True)
+
+
+def shard_function(cls, tenant_id):
+    return "ab"[tenant_id % 2]
+
+
+class ShardedStoreTest(TestHelper):
+
+    def setUp(self):
+        TestHelper.setUp(self)
+        self.store = ShardedStore({"a": create_database("sqlite:"),
+                                   "b": Store(create_database("sqlite:"))},
+                                  shard_function)
+        for store in self.store.stores.values():
+            store.execute("CREATE TABLE document "
+                          "(tenant_id INTEGER, id INTEGER, title VARCHAR,"
+                          " PRIMARY KEY (tenant_id, id))")
+            store.execute("CREATE TABLE event "
+                          "(id INTEGER PRIMARY KEY, tenant_id INTEGER)")
+        for tenant_id, id, title in [(1, 1, u"Title 1"), (1, 2, u"Title 4"),
+                                     (2, 1, u"Title 2"), (2, 2, u"Title 3"),
+                                     (3, 1, u"Title 5")]:
+            self.store.add(Document(tenant_id, id, title))
+        self.store.commit()
+
+    def tearDown(self):
+        self.store.close()
+        TestHelper.tearDown(self)
+
+    def get_titles(self, result):
+        return [document.title for document in result]
+
+    def test_stores(self):
+        self.assertEquals(sorted(self.store.stores), ["a", "b"])
+        for store in self.store.stores.values():
+            self.assertTrue(isinstance(store, Store))
+
+    def test_add_routes_by_shard_key(self):
+        store_a = self.store.stores["a"]
+        store_b = self.store.stores["b"]
+        self.assertEquals(sorted(store_a.find(Document.title)),
+                          [u"Title 2", u"Title 3"])
+        self.assertEquals(sorted(store_b.find(Document.title)),
+                          [u"Title 1", u"Title 4", u"Title 5"])
+
+    def test_add_without_shard_key(self):
+        setting = Setting()
+        setting.id = 1
+        self.assertRaises(FeatureError, self.store.add, setting)
+
+    def test_get(self):
+        document = self.store.get(Document, (2, 1))
+        self.assertEquals(document.title, "Title 2")
+        self.assertTrue(Store.of(document) is self.store.stores["a"])
+        self.assertEquals(self.store.get(Document, (2, 3)), None)
+
+    def test_identity_map_per_shard(self):
+        document1 = self.store.get(Document, (1, 1))
+        document2 = self.store.get(Document, (2, 1))
+        self.assertNotEquals(document1.title, document2.title)
+
+    def test_get_without_shard_key_in_primary_key(self):
+        event = Event()
+        event.id = 10
+        event.tenant_id = 2
+        self.store.add(event)
+        self.assertTrue(self.store.get(Event, 10) is event)
+        self.assertEquals(self.store.get(Event, 20), None)
+
+    def test_find_routes_by_keyword(self):
+        result = self.store.find(Document, tenant_id=2)
+        self.assertTrue(isinstance(result, ResultSet))
+        self.assertEquals(sorted(self.get_titles(result)),
+                          ["Title 2", "Title 3"])
+
+    def test_find_routes_by_expression(self):
+        result = self.store.find(Document, Document.id == 1,
+                                 Document.tenant_id == 1)
+        self.assertTrue(isinstance(result, ResultSet))
+        self.assertEquals(self.get_titles(result), ["Title 1"])
+
+    def test_find_routes_by_column_spec(self):
+        result = self.store.find(Document.title, Document.tenant_id == 3)
+        self.assertTrue(isinstance(result, ResultSet))
+        self.assertEquals(list(result), ["Title 5"])
+
+    def test_find_fans_out(self):
+        result = self.store.find(Document, Document.id == 1)
+        self.assertTrue(isinstance(result, ShardedResultSet))
+        self.assertEquals(sorted(self.get_titles(result)),
+                          ["Title 1", "Title 2", "Title 5"])
+
+    def test_find_fans_out_with_other_comparison(self):
+        result = self.store.find(Document, Document.tenant_id > 1)
+        self.assertEquals(sorted(self.get_titles(result)),
+                          ["Title 2", "Title 3", "Title 5"])
+
+    def test_find_order_by(self):
+        result = self.store.find(Document).order_by(Document.title)
+        self.assertEquals(self.get_titles(result),
+                          ["Title 1", "Title 2", "Title 3", "Title 4",
+                           "Title 5"])
+
+    def test_find_order_by_desc(self):
+        result = self.store.find(Document).order_by(Desc(Document.title))
+        self.assertEquals(self.get_titles(result),
+                          ["Title 5", "Title 4", "Title 3", "Title 2",
+                           "Title 1"])
+
+    def test_find_order_by_many_columns(self):
+        result = self.store.find(Document).order_by(Document.id,
+                                                    Desc(Document.tenant_id))
+        self.assertEquals([(document.id, document.tenant_id)
+                           for document in result],
+                          [(1, 3), (1, 2), (1, 1), (2, 2), (2, 1)])
+
+    def test_find_order_by_tuple_spec(self):
+        result = self.store.find((Document.title, Document))
+        result.order_by(Document.title)
+        self.assertEquals([title for title, document in result],
+                          ["Title 1", "Title 2", "Title 3", "Title 4",
+                           "Title 5"])
+
+    def test_find_order_by_unsupported(self):
+        result = self.store.find(Document.title).order_by(Document.id)
+        self.assertRaises(FeatureError, list, result)
+
+    def test_find_slice(self):
+        result = self.store.find(Document).order_by(Document.title)[:3]
+        self.assertEquals(self.get_titles(result),
+                          ["Title 1", "Title 2", "Title 3"])
+        self.assertEquals(result.count(), 3)
+        result = self.store.find(Document).order_by(Document.title)[:10]
+        self.assertEquals(result.count(), 5)
+        self.assertRaises(FeatureError, result.count, Document.title)
+
+    def test_find_unsupported_slice(self):
+        result = self.store.find(Document)
+        self.assertRaises(FeatureError, result.__getitem__, slice(1, 2))
+        self.assertRaises(FeatureError, result.__getitem__, 1)
+
+    def test_find_count(self):
+        self.assertEquals(self.store.find(Document).count(), 5)
+
+    def test_find_is_empty_any(self):
+        result = self.store.find(Document, Document.id == 2)
+        self.assertFalse(result.is_empty())
+        self.assertEquals(result.any().id, 2)
+        result = self.store.find(Document, Document.id == 3)
+        self.assertTrue(result.is_empty())
+        self.assertEquals(result.any(), None)
+
+    def test_find_first(self):
+        result = self.store.find(Document).order_by(Desc(Document.title))
+        self.assertEquals(result.first().title, "Title 5")
+        self.assertRaises(UnorderedError, self.store.find(Document).first)
+
+    def test_find_one(self):
+        result = self.store.find(Document, title=u"Title 3")
+        self.assertEquals(result.one().title, "Title 3")
+        result = self.store.find(Document, Document.id == 2)
+        self.assertRaises(NotOneError, result.one)
+        self.assertEquals(self.store.find(Document, id=3).one(), None)
+
+    def test_find_set_remove(self):
+        self.store.find(Document, id=1).set(title=u"New title")
+        self.store.find(Document, id=2).remove()
+        self.assertEquals(self.get_titles(self.store.find(Document)),
+                          ["New title"] * 3)
+
+    def test_commit_touched_shards(self):
+        self.store.add(Document(4, 1, u"Title 6"))
+        committed = []
+        for name, store in self.store.stores.items():
+            store.commit = lambda name=name: committed.append(name)
+        self.store.commit()
+        self.assertEquals(committed, ["a"])
+
+    def test_commit_dirty_shards(self):
+        document = self.store.get(Document, (1, 1))
+        self.store.commit()
+        document.title = u"New title"
+        self.store.commit()
+        self.store.rollback()
+        self.assertEquals(self.store.get(Document, (1, 1)).title,
+                          "New title")
+
+    def test_rollback(self):
+        self.store.add(Document(4, 1, u"Title 6"))
+        self.store.get(Document, (1, 1)).title = u"New title"
+        self.store.rollback()
+        self.assertEquals(self.store.find(Document).count(), 5)
+        self.assertEquals(self.store.get(Document, (1, 1)).title,
+                          "Title 1")
+
+    def test_remove(self):
+        self.store.remove(self.store.get(Document, (1, 1)))
+        self.store.commit()
+        self.assertEquals(self.store.find(Document).count(), 4)
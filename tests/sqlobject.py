@@ -98,6 +98,20 @@ class SQLObjectTest(TestHelper):
         self.assertTrue(person)
         self.assertEquals(person.name, "John Doe")
 
+    def test_getDeferred(self):
+        deferred1 = self.Person.getDeferred(1)
+        deferred2 = self.Person.getDeferred("2")
+        deferred3 = self.Person.getDeferred(1000)
+        self.assertEquals(deferred2.get().name, "John Doe")
+        self.assertEquals(deferred1.get().name, "John Joe")
+        self.assertEquals(deferred3.get(), None)
+
+    def test_wb_get_loads_deferred(self):
+        deferred = self.Person.getDeferred(1)
+        person = self.Person.get(2)
+        self.assertEquals(person.name, "John Doe")
+        self.assertEquals(deferred._obj.name, "John Joe")
+
     def test_destroySelf(self):
         person = self.Person.get(2)
         person.destroySelf()
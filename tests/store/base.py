@@ -27,18 +27,18 @@ import operator
 import weakref
 
 from storm.references import Reference, ReferenceSet, Proxy
-from storm.database import Result
+from storm.database import CompiledQuery, Result
 from storm.properties import Int, Float, RawStr, Unicode, Property, Pickle
 from storm.properties import PropertyPublisherMeta, Decimal
 from storm.variables import PickleVariable
 from storm.expr import (
     Asc, Desc, Select, LeftJoin, SQL, Count, Sum, Avg, And, Or, Eq, Lower, Alias)
 from storm.variables import Variable, UnicodeVariable, IntVariable
-from storm.info import get_obj_info, ClassAlias
+from storm.info import get_obj_info, get_cls_info, ClassAlias, Row
 from storm.exceptions import (
     ClosedError, ConnectionBlockedError, FeatureError, LostObjectError,
-    NoStoreError, NotFlushedError, NotOneError, OrderLoopError, UnorderedError,
-    WrongStoreError)
+    NoStoreError, NotFlushedError, NotOneError, OrderLoopError,
+    ReadOnlyObjectError, UnorderedError, WrongStoreError)
 from storm.cache import Cache
 from storm.store import AutoReload, EmptyResultSet, Store, ResultSet
 from storm.tracer import debug
@@ -102,6 +102,9 @@ class FooIndRefSetOrderTitle(Foo):
                         order_by=Bar.title)
 
 
+class CompactFoo(Foo):
+    __storm_compact__ = True
+
 class FooValue(object):
     __storm_table__ = "foovalue"
     id = Int(primary=True)
@@ -304,11 +307,157 @@ class StoreTest(object):
         result = self.store.execute("SELECT title FROM foo WHERE id=10")
         self.assertEquals(result.get_one(), ("New Title",))
 
+    def test_execute_many(self):
+        result = self.store.execute_many("UPDATE foo SET title=? WHERE id=?",
+                                         [(u"Title 1", 10), (u"Title 3", 30)])
+        self.assertEquals(result, None)
+        self.assertEquals(self.get_items(), [
+                          (10, "Title 1"),
+                          (20, "Title 20"),
+                          (30, "Title 3"),
+                         ])
+
+    def test_execute_many_flushes(self):
+        foo = self.store.get(Foo, 10)
+        foo.title = u"New Title"
+        self.store.execute_many("UPDATE foo SET title=title || ? WHERE id=?",
+                                [(u"!", 10)])
+        self.assertEquals(self.get_items()[0], (10, "New Title!"))
+
+    def test_wb_pipelined_flush(self):
+        store = Store(self.database, pipelined=True)
+        self.stores.append(store)
+        foo = store.get(Foo, 10)
+        foo.title = u"New Title"
+        store.flush()
+        self.assertEquals(len(store._connection._pipeline), 1)
+        self.assertEquals(store.find(Foo.title, Foo.id == 10).one(),
+                          "New Title")
+        self.assertEquals(store._connection._pipeline, [])
+
+    def test_pipelined_commit(self):
+        store = Store(self.database, pipelined=True)
+        self.stores.append(store)
+        store.get(Foo, 10).title = u"New Title"
+        store.commit()
+        self.assertEquals(self.store.get(Foo, 10).title, "New Title")
+
+    def create_table_aware_store(self):
+        store = Store(self.database, table_aware_flushes=True)
+        self.stores.append(store)
+        return store
+
+    def test_table_aware_find_flushes_used_table(self):
+        store = self.create_table_aware_store()
+        foo = store.get(Foo, 10)
+        foo.title = u"New Title"
+        self.assertEquals(store.find(Foo, title=u"New Title").one(), foo)
+
+    def test_table_aware_find_skips_unused_table(self):
+        store = self.create_table_aware_store()
+        foo = store.get(Foo, 10)
+        foo.title = u"New Title"
+        store.find(Bar).count()
+        self.assertTrue(get_obj_info(foo) in store._dirty)
+        store.get(Bar, 100)
+        self.assertTrue(get_obj_info(foo) in store._dirty)
+        store.flush()
+        self.assertFalse(get_obj_info(foo) in store._dirty)
+
+    def test_table_aware_find_flushes_subselect_table(self):
+        store = self.create_table_aware_store()
+        foo = store.get(Foo, 10)
+        foo.title = u"New Title"
+        result = store.find(Bar, Bar.foo_id.is_in(
+            Select(Foo.id, Foo.title == u"New Title")))
+        self.assertEquals([bar.id for bar in result], [100])
+
+    def test_table_aware_execute_flushes_used_table(self):
+        store = self.create_table_aware_store()
+        foo = store.get(Foo, 10)
+        foo.title = u"New Title"
+        store.execute("SELECT title FROM bar")
+        self.assertTrue(get_obj_info(foo) in store._dirty)
+        result = store.execute("SELECT title FROM foo WHERE id=10")
+        self.assertEquals(result.get_one(), ("New Title",))
+
+    def test_table_aware_find_flushes_predecessors(self):
+        store = self.create_table_aware_store()
+        foo = store.get(Foo, 10)
+        bar = store.get(Bar, 100)
+        foo.title = u"New Title"
+        bar.title = u"New Title"
+        store.add_flush_order(foo, bar)
+        store.find(Bar).count()
+        self.assertFalse(get_obj_info(foo) in store._dirty)
+        self.assertFalse(get_obj_info(bar) in store._dirty)
+
+    def test_table_aware_find_runs_only_used_hooks(self):
+        called = []
+        class MyFoo(Foo):
+            def __storm_pre_flush__(self):
+                called.append(self)
+        store = self.create_table_aware_store()
+        foo = store.get(MyFoo, 10)
+        foo.title = u"New Title"
+        store.find(Bar).count()
+        self.assertEquals(called, [])
+        store.find(Foo).count()
+        self.assertEquals(called, [foo])
+
+    def test_table_aware_lazy_value_flushes_used_table(self):
+        store = self.create_table_aware_store()
+        foo = store.get(Foo, 10)
+        bar = store.get(Bar, 100)
+        bar.title = u"New Title"
+        foo.title = SQL("(SELECT title FROM bar WHERE id=100)")
+        self.assertEquals(foo.title, "New Title")
+
+    def test_table_aware_lazy_value_flushes_only_used_tables(self):
+        store = self.create_table_aware_store()
+        foo = store.get(Foo, 10)
+        bar = store.get(Bar, 100)
+        bar.title = u"New Title"
+        foo.title = SQL("'New Title'")
+        self.assertEquals(foo.title, "New Title")
+        self.assertTrue(get_obj_info(bar) in store._dirty)
+
     def test_close(self):
         store = Store(self.database)
         store.close()
         self.assertRaises(ClosedError, store.execute, "SELECT 1")
 
+    def test_changes_only_tracked_by_own_store(self):
+        store = self.create_store()
+        foo1 = self.store.get(Foo, 10)
+        foo2 = store.get(Foo, 20)
+        foo2.title = u"New title"
+        self.assertEquals(self.store._dirty, {})
+        self.assertEquals(store._dirty.keys(), [get_obj_info(foo2)])
+
+    def test_changes_not_dispatched_to_other_stores(self):
+        called = []
+        stores = [self.create_store() for i in range(3)]
+        for store in stores:
+            store.get(Foo, 20)
+            store._variable_changed = lambda *args: called.append(args)
+        foo = self.store.get(Foo, 10)
+        foo.title = u"New title"
+        self.assertEquals(called, [])
+        self.assertTrue(get_obj_info(foo) in self.store._dirty)
+
+    def test_store_not_kept_alive_by_class_hooks(self):
+        store = Store(self.database)
+        store.get(Foo, 10)
+        store.close()
+        store_ref = weakref.ref(store)
+        del store
+        gc.collect()
+        self.assertEquals(store_ref(), None)
+        foo = self.store.get(Foo, 10)
+        foo.title = u"New title"
+        self.assertTrue(get_obj_info(foo) in self.store._dirty)
+
     def test_get(self):
         foo = self.store.get(Foo, 10)
         self.assertEquals(foo.id, 10)
@@ -332,6 +481,79 @@ class StoreTest(object):
         self.store.get(Foo, 10)
         self.store._connection = connection
 
+    def test_wb_cached_primary_values(self):
+        foo = self.store.get(Foo, 10)
+        obj_info = get_obj_info(foo)
+        self.assertEquals(obj_info["primary_values"], (10,))
+        foo.id = 40
+        # Values the object is cached with are kept until flushed.
+        self.assertEquals(obj_info["primary_values"], (10,))
+        self.assertEquals(
+            [var.get() for var in self.store._get_cached_primary_vars(obj_info)],
+            [10])
+        self.store.flush()
+        self.assertEquals(obj_info["primary_values"], (40,))
+        self.assertTrue(self.store.get(Foo, 40) is foo)
+
+    def test_compact_find(self):
+        foos = list(self.store.find(CompactFoo).order_by(CompactFoo.id))
+        self.assertEquals([(foo.id, foo.title) for foo in foos],
+                          [(10, "Title 30"), (20, "Title 20"),
+                           (30, "Title 10")])
+        for foo in foos:
+            self.assertEquals(get_obj_info(foo).variables.keys(),
+                              [CompactFoo.id])
+
+    def test_compact_alive(self):
+        foo = self.store.find(CompactFoo, id=10).one()
+        self.assertTrue(self.store.get(CompactFoo, 10) is foo)
+        self.assertTrue(self.store.find(CompactFoo, id=10).one() is foo)
+        self.assertEquals(foo.title, "Title 30")
+        self.assertEquals(get_obj_info(foo).variables.keys(), [CompactFoo.id])
+
+    def test_compact_set_and_flush(self):
+        foo = self.store.get(CompactFoo, 10)
+        foo.title = u"New title"
+        self.store.flush()
+        result = self.store.execute("SELECT title FROM foo WHERE id=10")
+        self.assertEquals(result.get_one(), ("New title",))
+        self.assertEquals(foo.title, "New title")
+
+    def test_compact_add(self):
+        foo = CompactFoo()
+        foo.id = 40
+        foo.title = u"Title 40"
+        self.store.add(foo)
+        self.store.flush()
+        self.assertTrue(self.store.get(CompactFoo, 40) is foo)
+        result = self.store.execute("SELECT title FROM foo WHERE id=40")
+        self.assertEquals(result.get_one(), ("Title 40",))
+
+    def test_compact_reload_after_commit(self):
+        foo = self.store.get(CompactFoo, 10)
+        self.store.commit()
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=10")
+        self.assertEquals(foo.title, "New title")
+        self.assertEquals(get_obj_info(foo).variables.keys(), [CompactFoo.id])
+
+    def test_compact_reload_after_commit_lost(self):
+        foo = self.store.get(CompactFoo, 10)
+        self.store.commit()
+        self.store.execute("DELETE FROM foo WHERE id=10")
+        self.assertRaises(LostObjectError, getattr, foo, "title")
+
+    def test_compact_reload(self):
+        foo = self.store.get(CompactFoo, 10)
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=10")
+        self.store.reload(foo)
+        self.assertEquals(foo.title, "New title")
+        self.assertEquals(get_obj_info(foo).variables.keys(), [CompactFoo.id])
+
+    def test_compact_readonly(self):
+        foo = self.store.find(CompactFoo, id=10).config(readonly=True).one()
+        self.assertEquals(foo.title, "Title 30")
+        self.assertRaises(ReadOnlyObjectError, setattr, foo, "title", u"New")
+
     def test_cache_cleanup(self):
         # Disable the cache, which holds strong references.
         self.get_cache(self.store).set_size(0)
@@ -541,6 +763,175 @@ class StoreTest(object):
         foo = self.store.get(MyFoo, (u"Title 20", 10))
         self.assertEquals(foo, None)
 
+    def test_get_alive_doesnt_flush(self):
+        foo = self.store.get(Foo, 10)
+        bar = self.store.get(Bar, 100)
+        bar.title = u"New title"
+        foo.title = u"New title"
+        self.store.add(Bar())
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertTrue(self.store.get(Foo, 10) is foo)
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_get_alive_flushes_pending_removal(self):
+        foo = self.store.get(Foo, 10)
+        self.store.remove(foo)
+        self.assertEquals(self.store.get(Foo, 10), None)
+
+    def test_get_alive_flushes_changed_primary_key(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        foo1.id = 40
+        foo2.id = 10
+        self.assertTrue(self.store.get(Foo, 10) is foo2)
+
+    def test_get_alive_flushes_pending_addition(self):
+        foo = self.store.get(Foo, 10)
+        self.store.remove(foo)
+        self.store.flush()
+        new_foo = Foo()
+        new_foo.id = 10
+        new_foo.title = u"New title"
+        self.store.add(new_foo)
+        self.assertTrue(self.store.get(Foo, 10) is new_foo)
+
+    def test_get_invalidated_flushes(self):
+        foo = self.store.get(Foo, 10)
+        self.store.invalidate(foo)
+        foo.title = u"New title"
+        self.store.remove(self.store.get(Foo, 20))
+        self.assertTrue(self.store.get(Foo, 10) is foo)
+        self.assertEquals(self.store.execute("SELECT COUNT(*) FROM foo "
+                                             "WHERE id=20").get_one(), (0,))
+
+    def test_wb_get_reuses_compiled_statement(self):
+        self.store.get(Foo, 10)
+        statement = self.store._get_statements[Foo]
+        self.assertTrue(isinstance(statement, CompiledQuery))
+        self.assertEquals(self.store.get(Foo, 20).title, "Title 20")
+        self.assertTrue(self.store._get_statements[Foo] is statement)
+        self.assertEquals(self.store.get(Foo, 40), None)
+
+    def test_wb_get_reuses_key_converters(self):
+        self.store.get(Foo, 10)
+        converters = self.store._key_converters[Foo]
+        self.assertEquals(self.store.get(Foo, 20).id, 20)
+        self.assertTrue(self.store._key_converters[Foo] is converters)
+
+    def test_get_deferred(self):
+        deferred1 = self.store.get_deferred(Foo, 10)
+        deferred2 = self.store.get_deferred(Foo, 20)
+        deferred3 = self.store.get_deferred(Foo, 40)
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foo1 = deferred1.get()
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 1)
+        self.assertEquals((foo1.id, foo1.title), (10, "Title 30"))
+        self.assertTrue(deferred2.get() is self.store.get(Foo, 20))
+        self.assertEquals(deferred3.get(), None)
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 1)
+
+    def test_get_deferred_same_key(self):
+        deferred1 = self.store.get_deferred(Foo, 10)
+        deferred2 = self.store.get_deferred(Foo, 10)
+        self.assertTrue(deferred1.get() is deferred2.get())
+
+    def test_get_deferred_tuple(self):
+        class MyFoo(Foo):
+            __storm_primary__ = "title", "id"
+        deferred1 = self.store.get_deferred(MyFoo, (u"Title 30", 10))
+        deferred2 = self.store.get_deferred(MyFoo, (u"Title 20", 10))
+        self.assertEquals(deferred1.get().id, 10)
+        self.assertEquals(deferred2.get(), None)
+
+    def test_get_deferred_uses_alive_objects(self):
+        foo = self.store.get(Foo, 10)
+        deferred = self.store.get_deferred(Foo, 10)
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertTrue(deferred.get() is foo)
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_get_deferred_invalidated(self):
+        foo = self.store.get(Foo, 10)
+        self.store.invalidate()
+        self.store.execute("DELETE FROM foo WHERE id=20")
+        deferred1 = self.store.get_deferred(Foo, 10)
+        deferred2 = self.store.get_deferred(Foo, 20)
+        self.assertTrue(deferred1.get() is foo)
+        self.assertEquals(deferred2.get(), None)
+
+    def test_get_deferred_flushes(self):
+        foo = Foo()
+        foo.id = 40
+        foo.title = u"Title 40"
+        self.store.add(foo)
+        self.store.invalidate(foo)
+        self.assertTrue(self.store.get_deferred(Foo, 40).get() is foo)
+
+    def test_get_deferred_kept_on_failed_flush(self):
+        foo = self.store.get(Foo, 10)
+        foo.title = u"New title"
+        deferred_get = self.store.get_deferred(Foo, 20)
+        def fail():
+            raise ZeroDivisionError()
+        foo.__storm_pre_flush__ = fail
+        self.assertRaises(ZeroDivisionError, deferred_get.get)
+        del foo.__storm_pre_flush__
+        self.assertEquals(deferred_get.get().id, 20)
+
+    def test_get_deferred_remembers_missing(self):
+        self.assertEquals(self.store.get_deferred(Foo, 40).get(), None)
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(self.store.get_deferred(Foo, 40).get(), None)
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_get_deferred_forgets_missing_on_changes(self):
+        self.assertEquals(self.store.get_deferred(Foo, 40).get(), None)
+        foo = Foo()
+        foo.id = 40
+        foo.title = u"Title 40"
+        self.store.add(foo)
+        self.store.flush()
+        self.store.reset()
+        self.assertEquals(self.store.get_deferred(Foo, 40).get().id, 40)
+
+    def test_get_deferred_forgets_missing_on_execute(self):
+        self.assertEquals(self.store.get_deferred(Foo, 40).get(), None)
+        self.store.execute("INSERT INTO foo VALUES (40, 'Title 40')")
+        self.assertEquals(self.store.get_deferred(Foo, 40).get().id, 40)
+
+    def test_get_deferred_forgets_missing_on_rollback(self):
+        self.assertEquals(self.store.get_deferred(Foo, 40).get(), None)
+        self.store.rollback()
+        self.assertEquals(self.store._deferred_missing, set())
+
+    def test_get_loads_deferred(self):
+        deferred = self.store.get_deferred(Foo, 10)
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foo = self.store.get(Foo, 20)
+        self.assertEquals(foo.id, 20)
+        self.assertEquals(deferred.get().id, 10)
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 1)
+
+    def test_wb_get_deferred_batch_size(self):
+        self.store._batch_size = 2
+        deferreds = [self.store.get_deferred(Foo, id) for id in (10, 20, 30)]
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([deferred.get().id for deferred in deferreds],
+                          [10, 20, 30])
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 2)
+
     def test_of(self):
         foo = self.store.get(Foo, 10)
         self.assertEquals(Store.of(foo), self.store)
@@ -596,6 +987,156 @@ class StoreTest(object):
         foo = self.store.get(Foo, 10)
         self.assertTrue(self.store.find(Foo, id=10).one() is foo)
 
+    def test_find_readonly(self):
+        result = self.store.find(Foo).config(readonly=True)
+        lst = [(foo.id, foo.title) for foo in result]
+        lst.sort()
+        self.assertEquals(lst, [
+                          (10, "Title 30"),
+                          (20, "Title 20"),
+                          (30, "Title 10"),
+                         ])
+
+    def test_find_readonly_not_cached(self):
+        foo = self.store.get(Foo, 10)
+        readonly_foo = self.store.find(Foo, id=10).config(readonly=True).one()
+        self.assertTrue(readonly_foo is not foo)
+        self.assertEquals(readonly_foo.title, "Title 30")
+        readonly_foo = self.store.find(Foo, id=20).config(readonly=True).one()
+        self.assertTrue(self.store.get(Foo, 20) is not readonly_foo)
+        self.assertEquals(len(self.store._alive), 2)
+
+    def test_find_readonly_objects_are_collected(self):
+        foo = self.store.find(Foo, id=10).config(readonly=True).one()
+        foo_ref = weakref.ref(foo)
+        del foo
+        gc.collect()
+        self.assertEquals(foo_ref(), None)
+
+    def test_find_readonly_assignment(self):
+        foo = self.store.find(Foo, id=10).config(readonly=True).one()
+        self.assertRaises(ReadOnlyObjectError, setattr, foo, "title", u"New")
+        self.assertRaises(ReadOnlyObjectError, delattr, foo, "title")
+        self.assertRaises(ReadOnlyObjectError, self.store.remove, foo)
+        self.assertEquals(foo.title, "Title 30")
+        self.assertEquals(self.store._dirty, {})
+
+    def test_find_readonly_store_of(self):
+        foo = self.store.find(Foo, id=10).config(readonly=True).one()
+        self.assertTrue(Store.of(foo) is self.store)
+
+    def test_find_readonly_tuple(self):
+        result = self.store.find((Foo, Bar), Bar.foo_id == Foo.id,
+                                 Foo.id == 10).config(readonly=True)
+        foo, bar = result.one()
+        self.assertEquals((foo.id, bar.id), (10, 100))
+        self.assertRaises(ReadOnlyObjectError, setattr, bar, "title", u"New")
+
+    def test_find_readonly_copy(self):
+        result = self.store.find(Foo).config(readonly=True)
+        foo = result.order_by(Foo.id)[0]
+        self.assertRaises(ReadOnlyObjectError, setattr, foo, "title", u"New")
+
+    def test_readonly_store(self):
+        store = Store(self.database, readonly=True)
+        self.stores.append(store)
+        foo = store.find(Foo, id=10).one()
+        self.assertRaises(ReadOnlyObjectError, setattr, foo, "title", u"New")
+        foo = store.find(Foo, id=10).config(readonly=False).one()
+        foo.title = u"New"
+        self.assertTrue(store.find(Foo, id=10).config(readonly=False).one()
+                        is foo)
+
+    def test_find_readonly_set_reference(self):
+        bar = self.store.find(Bar, id=100).config(readonly=True).one()
+        foo = self.store.get(Foo, 20)
+        self.assertRaises(ReadOnlyObjectError, setattr, bar, "foo", foo)
+        self.assertRaises(ReadOnlyObjectError, setattr, bar, "foo", None)
+        self.assertEquals(bar.foo_id, 10)
+        self.assertEquals(bar.foo.id, 10)
+
+    def test_find_readonly_set_reference_to_readonly(self):
+        bar = self.store.get(Bar, 100)
+        foo = self.store.find(FooRef, id=20).config(readonly=True).one()
+        self.assertRaises(ReadOnlyObjectError, setattr, foo, "bar", bar)
+        self.assertEquals(bar.foo_id, 10)
+        self.assertEquals(self.store._dirty, {})
+
+    def test_find_readonly_reference_set(self):
+        foo = self.store.find(FooRefSet, id=10).config(readonly=True).one()
+        bar = self.store.find(Bar, id=100).config(readonly=True).one()
+        self.assertRaises(ReadOnlyObjectError, foo.bars.remove, bar)
+        self.assertEquals(bar.foo_id, 10)
+        bar = self.store.get(Bar, 200)
+        self.assertRaises(ReadOnlyObjectError, foo.bars.add, bar)
+        self.assertEquals(bar.foo_id, 20)
+
+    def test_find_readonly_indirect_reference_set(self):
+        foo = self.store.find(FooIndRefSet, id=20).config(readonly=True).one()
+        bar = self.store.get(Bar, 100)
+        self.assertRaises(ReadOnlyObjectError, foo.bars.add, bar)
+        self.assertRaises(ReadOnlyObjectError, foo.bars.remove, bar)
+        self.assertEquals(self.store._dirty, {})
+
+    def test_find_readonly_reload(self):
+        foo = self.store.find(Foo, id=10).config(readonly=True).one()
+        self.assertRaises(ReadOnlyObjectError, self.store.reload, foo)
+        self.assertRaises(ReadOnlyObjectError, self.store.reload_many, [foo])
+
+    def test_readonly_store_get(self):
+        store = Store(self.database, readonly=True)
+        self.stores.append(store)
+        foo = store.get(Foo, 10)
+        self.assertEquals(foo.title, "Title 30")
+        self.assertRaises(ReadOnlyObjectError, setattr, foo, "title", u"New")
+        self.assertEquals(store.get(Foo, 40), None)
+        self.assertEquals(store._alive.keys(), [])
+
+    def test_readonly_store_get_writable_alive(self):
+        store = Store(self.database, readonly=True)
+        self.stores.append(store)
+        foo = store.find(Foo, id=10).config(readonly=False).one()
+        readonly_foo = store.get(Foo, 10)
+        self.assertTrue(readonly_foo is not foo)
+        self.assertRaises(ReadOnlyObjectError,
+                          setattr, readonly_foo, "title", u"New")
+
+    def test_readonly_store_get_deferred(self):
+        store = Store(self.database, readonly=True)
+        self.stores.append(store)
+        deferred_foo = store.get_deferred(Foo, 10)
+        deferred_missing = store.get_deferred(Foo, 40)
+        foo = deferred_foo.get()
+        self.assertEquals(foo.title, "Title 30")
+        self.assertRaises(ReadOnlyObjectError, setattr, foo, "title", u"New")
+        self.assertEquals(deferred_missing.get(), None)
+        self.assertEquals(store._alive.keys(), [])
+
+    def test_readonly_store_reference(self):
+        store = Store(self.database, readonly=True)
+        self.stores.append(store)
+        bar = store.find(Bar, id=100).one()
+        foo = bar.foo
+        self.assertEquals(foo.id, 10)
+        self.assertRaises(ReadOnlyObjectError, setattr, foo, "title", u"New")
+
+    def test_readonly_store_add(self):
+        store = Store(self.database, readonly=True)
+        self.stores.append(store)
+        foo = Foo()
+        foo.title = u"New"
+        self.assertRaises(ReadOnlyObjectError, store.add, foo)
+        self.assertEquals(Store.of(foo), None)
+
+    def test_readonly_store_find_doesnt_flush(self):
+        store = Store(self.database, readonly=True)
+        self.stores.append(store)
+        foo = store.find(Foo, id=10).config(readonly=False).one()
+        foo.title = u"New title"
+        self.assertEquals(store.find(Foo, title=u"New title").count(), 0)
+        store.flush()
+        self.assertEquals(store.find(Foo, title=u"New title").count(), 1)
+
     def test_find_expr(self):
         result = self.store.find(Foo, Foo.id == 20,
                                  Foo.title == u"Title 20")
@@ -1146,6 +1687,95 @@ class StoreTest(object):
         result3 = result1.union(result2)
         self.assertRaises(FeatureError, list, result3.values(Foo.id))
 
+    def test_find_rows(self):
+        rows = list(self.store.find(Foo).order_by(Foo.id).rows())
+        self.assertEquals([(row.id, row.title) for row in rows],
+                          [(10, "Title 30"),
+                           (20, "Title 20"),
+                           (30, "Title 10")])
+        self.assertEquals([type(row.title) for row in rows],
+                          [unicode, unicode, unicode])
+        self.assertTrue(isinstance(rows[0], Row))
+        self.assertTrue(type(rows[0]) is get_cls_info(Foo).row_class)
+        self.assertEquals(self.store._alive.keys(), [])
+
+    def test_find_rows_converts_values(self):
+        rows = self.store.find(Blob).order_by(Blob.id).rows()
+        self.assertEquals([(row.id, row.bin) for row in rows],
+                          [(10, "Blob 30"), (20, "Blob 20"), (30, "Blob 10")])
+
+    def test_find_rows_with_where_and_slice(self):
+        result = self.store.find(Foo, Foo.id > 10).order_by(Desc(Foo.id))
+        self.assertEquals([row.id for row in result.rows()], [30, 20])
+        self.assertEquals([row.id for row in result[1:].rows()], [20])
+
+    def test_find_rows_tuple(self):
+        result = self.store.find((Foo, Bar.title, Bar),
+                                 Bar.foo_id == Foo.id).order_by(Foo.id)
+        rows = list(result.rows())
+        self.assertEquals([(foo.id, title, bar.id)
+                           for foo, title, bar in rows],
+                          [(10, "Title 300", 100),
+                           (20, "Title 200", 200),
+                           (30, "Title 100", 300)])
+        self.assertEquals(type(rows[0][1]), unicode)
+
+    def test_find_rows_with_left_join(self):
+        bar = self.store.get(Bar, 300)
+        bar.foo_id = None
+        result = self.store.using(Foo, LeftJoin(Bar, Bar.foo_id == Foo.id))
+        result = result.find((Foo, Bar)).order_by(Foo.id)
+        self.assertEquals([(foo.id, bar and bar.id)
+                           for foo, bar in result.rows()],
+                          [(10, 100), (20, 200), (30, None)])
+
+    def test_find_rows_with_set_expression(self):
+        result1 = self.store.find(Foo, Foo.id == 10)
+        result2 = self.store.find(Foo, Foo.id == 20)
+        result3 = result1.union(result2).order_by(Foo.id)
+        self.assertEquals([row.id for row in result3.rows()], [10, 20])
+
+    def test_find_rows_with_class_alias(self):
+        FooAlias = ClassAlias(Foo)
+        result = self.store.find(FooAlias, FooAlias.id == 20)
+        self.assertEquals([(row.id, row.title) for row in result.rows()],
+                          [(20, "Title 20")])
+
+    def test_find_copy_out(self):
+        fileobj = StringIO()
+        self.store.find(Foo).order_by(Foo.id).copy_out(fileobj)
+        self.assertEquals(fileobj.getvalue(),
+                          "10,Title 30\n20,Title 20\n30,Title 10\n")
+
+    def test_find_copy_out_with_parameters(self):
+        fileobj = StringIO()
+        result = self.store.find((Foo.title, Foo.id + 1), Foo.id == 20)
+        result.copy_out(fileobj)
+        self.assertEquals(fileobj.getvalue(), "Title 20,21\n")
+
+    def test_find_copy_out_quoting(self):
+        foo = self.store.get(Foo, 20)
+        foo.title = u"a,\"b\"\nc \xe1"
+        bar = self.store.get(Bar, 100)
+        bar.title = None
+        self.store.flush()
+        fileobj = StringIO()
+        self.store.find((Foo.title, Bar.title),
+                        Foo.id == 20, Bar.id == 100).copy_out(fileobj)
+        self.assertEquals(fileobj.getvalue(),
+                          "\"a,\"\"b\"\"\nc \xc3\xa1\",\n")
+
+    def test_find_copy_out_with_set_expression(self):
+        result1 = self.store.find(Foo.id, Foo.id == 10)
+        result2 = self.store.find(Foo.id, Foo.id == 20)
+        fileobj = StringIO()
+        result1.union(result2).order_by(Foo.id).copy_out(fileobj)
+        self.assertEquals(fileobj.getvalue(), "10\n20\n")
+
+    def test_find_copy_out_unsupported_format(self):
+        self.assertRaises(ValueError, self.store.find(Foo).copy_out,
+                          StringIO(), format="xml")
+
     def test_find_remove(self):
         self.store.find(Foo, Foo.id == 20).remove()
         self.assertEquals(self.get_items(), [
@@ -1713,6 +2343,176 @@ class StoreTest(object):
                           (30, "Title 10"),
                          ])
 
+    def test_insert_many(self):
+        result = self.store.insert_many(Foo, [{"id": 40, "title": u"Title 40"},
+                                              {"id": 50, "title": u"Title 50"}])
+        self.assertEquals(result, None)
+        self.assertEquals(self.store._alive.keys(), [])
+        self.assertEquals(self.get_items(), [
+                          (10, "Title 30"),
+                          (20, "Title 20"),
+                          (30, "Title 10"),
+                          (40, "Title 40"),
+                          (50, "Title 50"),
+                         ])
+
+    def test_insert_many_tuples(self):
+        self.store.insert_many(Foo, [(40, u"Title 40"), (50, u"Title 50")])
+        self.store.insert_many(Foo, [(u"Title 60",)], columns=(Foo.title,))
+        self.assertEquals(self.get_items()[3:], [
+                          (40, "Title 40"),
+                          (50, "Title 50"),
+                          (51, "Title 60"),
+                         ])
+
+    def test_insert_many_tuples_of_wrong_length(self):
+        self.assertRaises(ValueError, self.store.insert_many, Foo,
+                          [(40, u"Title 40"), (50,)])
+        self.assertRaises(ValueError, self.store.insert_many, Foo,
+                          [(40, u"Title 40", 1)])
+        self.assertEquals(self.store.find(Foo).count(), 3)
+
+    def test_insert_many_single_statement(self):
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.insert_many(Foo, [(40, u"Title 40"), (50, u"Title 50")])
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 1)
+
+    def test_insert_many_converts_values(self):
+        self.assertRaises(TypeError, self.store.insert_many,
+                          Foo, [{"id": 40, "title": "Title 40"}])
+
+    def test_insert_many_mixed_columns(self):
+        self.store.insert_many(Foo, [{"id": 40, "title": u"Title 40"},
+                                     {"id": 50},
+                                     {"title": u"Title 60"}])
+        self.assertEquals(self.get_items()[3:], [
+                          (40, "Title 40"),
+                          (50, "Default Title"),
+                          (51, "Title 60"),
+                         ])
+
+    def test_insert_many_default_values(self):
+        class MyFoo(Foo):
+            title = Unicode(default=u"My Default")
+        self.store.insert_many(MyFoo, [{"id": 40}])
+        self.assertEquals(self.get_items()[3:], [(40, "My Default")])
+
+    def test_insert_many_return_objects(self):
+        foos = self.store.insert_many(Foo, [{"id": 50, "title": u"Title 50"},
+                                            {"id": 40, "title": u"Title 40"}],
+                                      return_objects=True)
+        self.assertEquals([(foo.id, foo.title) for foo in foos],
+                          [(50, "Title 50"), (40, "Title 40")])
+        self.assertTrue(self.store.get(Foo, 40) is foos[1])
+        foos[0].title = u"New title"
+        self.store.flush()
+        self.assertEquals(self.get_items()[-1], (50, "New title"))
+
+    def test_insert_many_return_objects_generated_keys(self):
+        foos = self.store.insert_many(Foo, [{"title": u"Title 40"},
+                                            {}, {"title": u"Title 60"},
+                                            {"id": 80}, {}],
+                                      return_objects=True)
+        self.assertEquals([foo.title for foo in foos],
+                          ["Title 40", "Default Title", "Title 60",
+                           "Default Title", "Default Title"])
+        self.assertEquals(sorted(foo.id for foo in foos),
+                          [31, 32, 33, 34, 80])
+        for foo in foos:
+            self.assertTrue(self.store.get(Foo, foo.id) is foo)
+
+    def test_insert_many_flushes_first(self):
+        foo = Foo()
+        foo.id = 40
+        foo.title = u"Title 40"
+        self.store.add(foo)
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.insert_many(Bar, [{"id": 400, "foo_id": 40}])
+        output = stream.getvalue()
+        self.assertTrue(0 <= output.find("INSERT INTO foo") <
+                        output.find("INSERT INTO bar"), output)
+
+    def test_insert_many_found_by_get_deferred(self):
+        self.assertEquals(self.store.get_deferred(Foo, 40).get(), None)
+        self.store.insert_many(Foo, [{"id": 40}])
+        self.assertEquals(self.store.get_deferred(Foo, 40).get().id, 40)
+
+    def test_wb_insert_many_batch_size(self):
+        self.store._batch_size = 2
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foos = self.store.insert_many(Foo, [(40, u"Title 40"),
+                                            (50, u"Title 50"),
+                                            (60, u"Title 60")],
+                                      return_objects=True)
+        self.assertEquals([foo.id for foo in foos], [40, 50, 60])
+        self.assertEquals(stream.getvalue().count("INSERT INTO"), 2)
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+
+    def test_copy_in(self):
+        self.store.copy_in(Foo, [(40, u"Title 40"), (50, u"Title\t50\\")])
+        self.assertEquals(self.store._alive.keys(), [])
+        self.assertEquals(self.get_items()[3:], [
+                          (40, "Title 40"),
+                          (50, "Title\t50\\"),
+                         ])
+
+    def test_copy_in_columns(self):
+        self.store.copy_in(Foo, [(u"Title 40",), (None,)],
+                           columns=(Foo.title,))
+        self.assertEquals(self.get_items()[3:], [
+                          (31, "Title 40"),
+                          (32, None),
+                         ])
+
+    def test_copy_in_generator(self):
+        rows = ((id, u"Title %d" % id) for id in range(40, 100, 10))
+        self.store.copy_in(Foo, rows)
+        self.assertEquals(self.store.find(Foo).count(), 9)
+        self.assertEquals(self.store.get(Foo, 90).title, "Title 90")
+
+    def test_copy_in_converts_values(self):
+        self.assertRaises(TypeError, self.store.copy_in,
+                          Foo, [(40, "Title 40")])
+
+    def test_copy_in_raw_values(self):
+        self.store.copy_in(Blob, [(40, "\x00\\a\tb\nc\xff")],
+                           columns=(Blob.id, Blob.bin))
+        self.assertEquals(self.store.get(Blob, 40).bin, "\x00\\a\tb\nc\xff")
+
+    def test_copy_in_table(self):
+        self.store.copy_in("foo", [(40, u"Title 40")],
+                           columns=("id", "title"))
+        self.assertEquals(self.get_items()[3:], [(40, "Title 40")])
+
+    def test_copy_in_table_needs_columns(self):
+        self.assertRaises(FeatureError, self.store.copy_in,
+                          "foo", [(40, u"Title 40")])
+
+    def test_copy_in_flushes_first(self):
+        foo = Foo()
+        foo.id = 40
+        foo.title = u"Title 40"
+        self.store.add(foo)
+        self.store.copy_in(Bar, [(400, 40, u"Title 400")],
+                           columns=(Bar.id, Bar.foo_id, Bar.title))
+        self.assertEquals(self.store.get(Bar, 400).foo.title, "Title 40")
+
+    def test_copy_in_rollback(self):
+        self.store.copy_in(Foo, [(40, u"Title 40")])
+        self.store.rollback()
+        self.assertEquals(self.store.get(Foo, 40), None)
+
+    def test_copy_in_found_by_get_deferred(self):
+        self.assertEquals(self.store.get_deferred(Foo, 40).get(), None)
+        self.store.copy_in(Foo, [(40, u"Title 40")])
+        self.assertEquals(self.store.get_deferred(Foo, 40).get().id, 40)
+
     def test_add_get(self):
         foo = Foo()
         foo.id = 40
@@ -2473,6 +3273,36 @@ class StoreTest(object):
                           (30, "Title 10"),
                          ])
 
+    def test_wb_changed_variables_are_recorded(self):
+        foo = self.store.get(Foo, 20)
+        obj_info = get_obj_info(foo)
+        self.assertTrue("changes" not in obj_info)
+        foo.title = u"New title"
+        self.assertEquals(obj_info["changes"],
+                          set([obj_info.variables[Foo.title]]))
+        self.store.flush()
+        self.assertTrue("changes" not in obj_info)
+
+    def test_wb_changed_variables_are_forgotten_on_rollback(self):
+        foo = self.store.get(Foo, 20)
+        obj_info = get_obj_info(foo)
+        foo.title = u"New title"
+        self.store.rollback()
+        self.assertTrue("changes" not in obj_info)
+
+    def test_wb_flush_inspects_changed_variables_only(self):
+        foo = self.store.get(Foo, 20)
+        obj_info = get_obj_info(foo)
+        # A change not reported through the "changed" event is ignored.
+        obj_info.variables[Foo.title].set(u"Unseen title", from_db=True)
+        foo.id = 25
+        self.store.flush()
+        self.assertEquals(self.get_items(), [
+                          (10, "Title 30"),
+                          (25, "Title 20"),
+                          (30, "Title 10"),
+                         ])
+
     def test_wb_block_implicit_flushes(self):
         # Make sure calling store.flush() will fail.
         def flush():
@@ -2486,7 +3316,8 @@ class StoreTest(object):
         self.store.execute("SELECT title FROM foo WHERE id = 20")
 
         self.store.unblock_implicit_flushes()
-        self.assertRaises(RuntimeError, self.store.get, Foo, 20)
+        # Objects alive already are returned without flushing.
+        self.assertRaises(RuntimeError, self.store.get, Foo, 30)
 
     def test_wb_block_implicit_flushes_is_recursive(self):
         # Make sure calling store.flush() will fail.
@@ -2500,7 +3331,8 @@ class StoreTest(object):
         # implicit flushes are still blocked, until unblock() is called again.
         foo = self.store.get(Foo, 20)
         self.store.unblock_implicit_flushes()
-        self.assertRaises(RuntimeError, self.store.get, Foo, 20)
+        # Objects alive already are returned without flushing.
+        self.assertRaises(RuntimeError, self.store.get, Foo, 30)
 
     def test_block_access(self):
         """Access to the store is blocked by block_access()."""
@@ -2559,6 +3391,51 @@ class StoreTest(object):
         self.store.reload(foo)
         self.assertTrue(obj_info not in self.store._dirty)
 
+    def test_reload_many(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        self.store.execute("UPDATE foo SET title='Title 40'")
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.reload_many([foo1, foo2])
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 1)
+        self.assertEquals(foo1.title, "Title 40")
+        self.assertEquals(foo2.title, "Title 40")
+
+    def test_reload_many_composed_key(self):
+        link1 = self.store.get(Link, (10, 100))
+        link2 = self.store.get(Link, (20, 200))
+        self.store.reload_many([link1, link2])
+        self.assertEquals((link1.foo_id, link1.bar_id), (10, 100))
+        self.assertEquals((link2.foo_id, link2.bar_id), (20, 200))
+
+    def test_reload_many_not_dirty(self):
+        foo = self.store.get(Foo, 20)
+        obj_info = get_obj_info(foo)
+        foo.title = u"Title 40"
+        self.store.reload_many([foo])
+        self.assertEquals(foo.title, "Title 20")
+        self.assertTrue(obj_info not in self.store._dirty)
+
+    def test_reload_many_removed_behind_our_back(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        self.store.execute("DELETE FROM foo WHERE id=20")
+        self.assertRaises(LostObjectError,
+                          self.store.reload_many, [foo1, foo2])
+
+    def test_reload_many_new_unflushed(self):
+        foo = Foo()
+        foo.id = 40
+        self.store.add(foo)
+        self.assertRaises(NotFlushedError, self.store.reload_many, [foo])
+
+    def test_reload_many_unknown(self):
+        foo = self.store.get(Foo, 20)
+        store = self.create_store()
+        self.assertRaises(WrongStoreError, store.reload_many, [foo])
+
     def test_find_set_empty(self):
         self.store.find(Foo, title=u"Title 20").set()
         foo = self.store.get(Foo, 20)
@@ -4500,6 +5377,73 @@ class StoreTest(object):
         items = [(bar.id, bar.title) for bar in foo.bars]
         self.assertEquals(items, [(200, "Title 200"), (100, "Title 300")])
 
+    def test_flush_object(self):
+        foo = self.store.get(Foo, 10)
+        bar = self.store.get(Bar, 100)
+        foo.title = u"New Title"
+        bar.title = u"New Title"
+        self.store.flush(foo)
+        self.assertFalse(get_obj_info(foo) in self.store._dirty)
+        self.assertTrue(get_obj_info(bar) in self.store._dirty)
+        self.store.block_implicit_flushes()
+        result = self.store.execute("SELECT title FROM foo WHERE id=10")
+        self.assertEquals(result.get_one(), ("New Title",))
+        result = self.store.execute("SELECT title FROM bar WHERE id=100")
+        self.assertEquals(result.get_one(), ("Title 300",))
+        self.store.unblock_implicit_flushes()
+
+    def test_flush_object_with_flush_order(self):
+        foo1 = Foo()
+        foo2 = Foo()
+        foo3 = Foo()
+        for foo in [foo1, foo2, foo3]:
+            foo.title = u"Object"
+            self.store.add(foo)
+        self.store.add_flush_order(foo2, foo1)
+        self.store.flush(foo1)
+        self.assertTrue(foo2.id < foo1.id)
+        self.assertTrue(get_obj_info(foo3) in self.store._dirty)
+
+    def test_flush_object_with_reference_on_added(self):
+        foo = Foo()
+        foo.title = u"Title 40"
+        bar = Bar()
+        bar.title = u"Title 400"
+        bar.foo = foo
+        self.store.add(bar)
+        self.store.flush(bar)
+        self.assertEquals(bar.foo_id, foo.id)
+        self.assertFalse(get_obj_info(foo) in self.store._dirty)
+
+    def test_flush_object_not_dirty(self):
+        foo = self.store.get(Foo, 10)
+        bar = self.store.get(Bar, 100)
+        bar.title = u"New Title"
+        self.store.flush(foo)
+        self.assertTrue(get_obj_info(bar) in self.store._dirty)
+
+    def test_flush_object_from_other_store(self):
+        foo = self.store.get(Foo, 10)
+        store = self.create_store()
+        self.assertRaises(WrongStoreError, store.flush, foo)
+
+    def test_lazy_value_flushes_store(self):
+        foo = self.store.get(Foo, 10)
+        bar = self.store.get(Bar, 100)
+        bar.title = u"New Title"
+        foo.title = SQL("(SELECT title FROM bar WHERE id=100)")
+        self.assertEquals(foo.title, "New Title")
+        self.assertFalse(get_obj_info(bar) in self.store._dirty)
+
+    def test_autoreload_flushes_only_its_object(self):
+        foo = self.store.get(Foo, 10)
+        bar = self.store.get(Bar, 100)
+        bar.title = u"New Title"
+        foo.title = u"New Title"
+        self.store.autoreload(foo)
+        self.assertEquals(foo.title, "Title 30")
+        self.assertTrue(get_obj_info(bar) in self.store._dirty)
+
     def test_flush_order(self):
         foo1 = Foo()
         foo2 = Foo()
@@ -4669,6 +5613,26 @@ class StoreTest(object):
         self.store.reload(blob)
         self.assertEquals(blob.bin, "\x80\x02}q\x01(U\x01aK\x01U\x01bK\x02u.")
 
+    def test_pickle_variable_copy_change_detection(self):
+        class PickleBlob(Blob):
+            bin = Pickle(change_detection="copy")
+
+        blob = self.store.get(Blob, 20)
+        blob.bin = "\x80\x02}q\x01U\x01aK\x01s."
+        self.store.flush()
+
+        pickle_blob = self.store.get(PickleBlob, 20)
+        self.assertEquals(pickle_blob.bin["a"], 1)
+
+        self.store.flush()
+        self.assertTrue(get_obj_info(pickle_blob) not in self.store._dirty)
+
+        pickle_blob.bin["b"] = 2
+
+        self.store.flush()
+        self.store.reload(blob)
+        self.assertEquals(blob.bin, "\x80\x02}q\x01(U\x01aK\x01U\x01bK\x02u.")
+
     def test_pickle_variable_remove(self):
         """
         When an object is removed from a store, it should unhook from the
@@ -5406,6 +6370,162 @@ class StoreTest(object):
         self.store.invalidate()
         self.assertEquals(called, [True, True])
 
+    def test_invalidated_batch_reloaded_together(self):
+        foos = list(self.store.find(Foo).order_by(Foo.id))
+        self.store.commit()
+        self.store.execute("UPDATE foo SET title='Title 40'")
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([foo.title for foo in foos], ["Title 40"] * 3)
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 1)
+        for foo in foos:
+            self.assertEquals(get_obj_info(foo).get("invalidated"), None)
+
+    def test_invalidated_batch_validated_together_on_get(self):
+        foos = list(self.store.find(Foo).order_by(Foo.id))
+        self.store.invalidate()
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([self.store.get(Foo, id) for id in (10, 20, 30)],
+                          foos)
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 1)
+
+    def test_invalidated_batch_with_removed_sibling(self):
+        foo1, foo2 = self.store.find(Foo, Foo.id < 30).order_by(Foo.id)
+        self.store.execute("DELETE FROM foo WHERE id=20")
+        self.store.invalidate()
+        self.assertEquals(foo1.title, "Title 30")
+        self.assertEquals(get_obj_info(foo2).get("invalidated"), True)
+        self.assertEquals(self.store.get(Foo, 20), None)
+
+    def test_invalidated_batch_with_removed_object(self):
+        foo1, foo2 = self.store.find(Foo, Foo.id < 30).order_by(Foo.id)
+        self.store.execute("DELETE FROM foo WHERE id=10")
+        self.store.invalidate()
+        self.assertRaises(LostObjectError, getattr, foo1, "title")
+        self.assertEquals(foo2.title, "Title 20")
+
+    def test_invalidated_batch_keeps_changes(self):
+        foo1, foo2 = self.store.find(Foo, Foo.id < 30).order_by(Foo.id)
+        self.store.invalidate()
+        foo2.title = u"Title 40"
+        self.store.execute("UPDATE foo SET title='Title 50' WHERE id=10")
+        self.assertEquals(foo1.title, "Title 30")
+        self.assertEquals(foo2.title, "Title 40")
+
+    def test_wb_invalidated_batch_size(self):
+        self.store._batch_size = 2
+        foos = list(self.store.find(Foo).order_by(Foo.id))
+        self.store.invalidate()
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([foo.title for foo in foos],
+                          ["Title 30", "Title 20", "Title 10"])
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 2)
+
+    def get_batch_references_store(self):
+        store = Store(self.database, batch_references=True)
+        self.stores.append(store)
+        return store
+
+    def test_batch_references(self):
+        store = self.get_batch_references_store()
+        bars = list(store.find(Bar).order_by(Bar.id))
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([bar.foo.id for bar in bars], [10, 20, 30])
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 1)
+        self.assertTrue(bars[0].foo is store.get(Foo, 10))
+
+    def test_batch_references_disabled_by_default(self):
+        bars = list(self.store.find(Bar).order_by(Bar.id))
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([bar.foo.id for bar in bars], [10, 20, 30])
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 3)
+
+    def test_batch_references_uses_alive_objects(self):
+        store = self.get_batch_references_store()
+        foos = list(store.find(Foo))
+        bars = list(store.find(Bar).order_by(Bar.id))
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([bar.foo.id for bar in bars], [10, 20, 30])
+        self.assertTrue(bars[1].foo is store.get(Foo, 20))
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 0)
+
+    def test_batch_references_on_remote(self):
+        store = self.get_batch_references_store()
+        store.execute("UPDATE bar SET foo_id=NULL WHERE id=300")
+        foos = list(store.find(FooRef).order_by(FooRef.id))
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([foo.bar and foo.bar.id for foo in foos],
+                          [100, 200, None])
+        # Missing remote objects aren't remembered, as with unbatched
+        # references, so the last access is queried again.
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 2)
+
+    def test_batch_references_on_remote_with_many_remotes(self):
+        store = self.get_batch_references_store()
+        store.execute("UPDATE bar SET foo_id=10 WHERE id=200")
+        foos = list(store.find(FooRef).order_by(FooRef.id))
+        self.assertRaises(NotOneError, getattr, foos[0], "bar")
+        self.assertEquals(foos[1].bar, None)
+        self.assertEquals(foos[2].bar.id, 300)
+
+    def test_batch_references_with_null_keys(self):
+        store = self.get_batch_references_store()
+        store.execute("UPDATE bar SET foo_id=NULL WHERE id=200")
+        bars = list(store.find(Bar).order_by(Bar.id))
+        self.assertEquals([bar.foo and bar.foo.id for bar in bars],
+                          [10, None, 30])
+
+    def test_batch_references_keeps_linked_references(self):
+        store = self.get_batch_references_store()
+        bars = list(store.find(Bar).order_by(Bar.id))
+        foo = Foo()
+        foo.id = 40
+        foo.title = u"Title 40"
+        bars[2].foo = foo
+        self.assertEquals([bar.foo.id for bar in bars], [10, 20, 40])
+
+    def test_batch_references_chained(self):
+        store = self.get_batch_references_store()
+        store.execute("INSERT INTO selfref (id, title, selfref_id)"
+                      " VALUES (40, 'SelfRef 40', NULL)")
+        store.execute("INSERT INTO selfref (id, title, selfref_id)"
+                      " VALUES (45, 'SelfRef 45', 25)")
+        store.execute("INSERT INTO selfref (id, title, selfref_id)"
+                      " VALUES (50, 'SelfRef 50', NULL)")
+        store.execute("UPDATE selfref SET selfref_id=40 WHERE id=15")
+        store.execute("UPDATE selfref SET selfref_id=50 WHERE id=25")
+        selfrefs = list(store.find(SelfRef, SelfRef.id.is_in((35, 45)))
+                        .order_by(SelfRef.id))
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([selfref.selfref.selfref.id
+                           for selfref in selfrefs], [40, 50])
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 2)
+
+    def test_wb_batch_references_size(self):
+        store = self.get_batch_references_store()
+        store._batch_size = 2
+        bars = list(store.find(Bar).order_by(Bar.id))
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([bar.foo.id for bar in bars], [10, 20, 30])
+        self.assertEquals(stream.getvalue().count("EXECUTE:"), 2)
+
     def test_reset_recreates_objects(self):
         """
         After resetting the store, all queries return fresh objects, even if
@@ -6133,6 +7253,18 @@ class EmptyResultSetTest(object):
         self.assertEquals(list(self.result.values(Foo.title)), [])
         self.assertEquals(list(self.empty.values(Foo.title)), [])
 
+    def test_rows(self):
+        self.assertEquals(list(self.result.rows()), [])
+        self.assertEquals(list(self.empty.rows()), [])
+
+    def test_copy_out(self):
+        fileobj = StringIO()
+        self.result.copy_out(fileobj)
+        self.empty.copy_out(fileobj)
+        self.assertEquals(fileobj.getvalue(), "")
+        self.assertRaises(ValueError, self.empty.copy_out,
+                          fileobj, format="xml")
+
     def test_set_no_args(self):
         self.assertEquals(self.result.set(), None)
         self.assertEquals(self.empty.set(), None)
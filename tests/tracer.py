@@ -169,6 +169,31 @@ class DebugTracerTest(TestHelper):
         self.tracer.connection_raw_execute_success(connection, raw_cursor,
                                                    statement, params)
 
+    def test_connection_raw_execute_many(self):
+        self.stream.write(
+            "[04:05:06.000007] EXECUTE MANY: 'STATEMENT', 3 times\n")
+        self.stream.flush()
+        self.mocker.replay()
+
+        self.tracer.connection_raw_execute_many("CONNECTION", "RAW_CURSOR",
+                                                "STATEMENT", 3)
+
+    def test_connection_raw_execute_many_error(self):
+        self.stream.write("[04:05:06.000007] ERROR: ERROR\n")
+        self.stream.flush()
+        self.mocker.replay()
+
+        self.tracer.connection_raw_execute_many_error(
+            "CONNECTION", "RAW_CURSOR", "STATEMENT", 3, "ERROR")
+
+    def test_connection_raw_execute_many_success(self):
+        self.stream.write("[04:05:06.000007] DONE\n")
+        self.stream.flush()
+        self.mocker.replay()
+
+        self.tracer.connection_raw_execute_many_success(
+            "CONNECTION", "RAW_CURSOR", "STATEMENT", 3)
+
 
 class TimeoutTracerTestBase(TestHelper):
 
@@ -319,3 +344,26 @@ class TimeoutTracerTest(TimeoutTracerTestBase):
 
         self.execute()
         self.execute()
+
+    def test_execute_many(self):
+        """
+        Batches are bound by the timeout of a single statement.
+        """
+        tracer_mock = self.mocker.patch(self.tracer)
+        tracer_mock.get_remaining_time()
+        self.mocker.result(0)
+        self.mocker.replay()
+
+        try:
+            self.tracer.connection_raw_execute_many(
+                self.connection, self.raw_cursor, self.statement, 3)
+        except TimeoutError, e:
+            self.assertEqual(self.statement, e.statement)
+            self.assertEqual((), e.params)
+        else:
+            self.fail("TimeoutError not raised")
+
+    def test_execute_many_error(self):
+        self.assertRaises(NotImplementedError,
+                          self.tracer.connection_raw_execute_many_error,
+                          None, None, None, 3, None)
@@ -883,6 +883,47 @@ class PickleVariableTest(TestHelper):
         event.emit("object-deleted")
         self.assertEquals(changes, [(variable, None, ["a"], False)])
 
+    def test_copy_change_detection(self):
+        variable = PickleVariable(value={"a": [1]}, change_detection="copy")
+        variable.checkpoint()
+        self.assertFalse(variable.has_changed())
+        variable.get()["a"].append(2)
+        self.assertTrue(variable.has_changed())
+        variable.checkpoint()
+        self.assertFalse(variable.has_changed())
+        variable.set(None)
+        self.assertTrue(variable.has_changed())
+        variable.checkpoint()
+        self.assertFalse(variable.has_changed())
+
+    def test_copy_change_detection_events(self):
+        event = EventSystem(marker)
+
+        variable = PickleVariable(event=event, value_factory=dict,
+                                  change_detection="copy")
+
+        changes = []
+        def changed(owner, variable, old_value, new_value, fromdb):
+            changes.append((variable, old_value, new_value, fromdb))
+
+        event.emit("start-tracking-changes", event)
+        event.hook("changed", changed)
+
+        variable.checkpoint()
+
+        event.emit("flush")
+        self.assertEquals(changes, [])
+
+        variable.get()["a"] = 1
+        self.assertEquals(changes, [])
+
+        event.emit("flush")
+        self.assertEquals(changes, [(variable, None, {"a": 1}, False)])
+
+    def test_invalid_change_detection(self):
+        self.assertRaises(ValueError, PickleVariable,
+                          change_detection="unknown")
+
 
 class ListVariableTest(TestHelper):
 
@@ -954,6 +995,16 @@ class ListVariableTest(TestHelper):
         event.emit("object-deleted")
         self.assertEquals(changes, [(variable, None, ["a"], False)])
 
+    def test_copy_change_detection(self):
+        variable = ListVariable(RawStrVariable, value=["a"],
+                                change_detection="copy")
+        variable.checkpoint()
+        self.assertFalse(variable.has_changed())
+        variable.get().append("b")
+        self.assertTrue(variable.has_changed())
+        variable.checkpoint()
+        self.assertFalse(variable.has_changed())
+
 
 class EnumVariableTest(TestHelper):
 